@@ -0,0 +1,65 @@
+# app/api/admin.py
+from fastapi import APIRouter, HTTPException, Query
+
+from app.services import motel_resolver, vector_outbox
+from app.utils import embedding_cache, parse_cache
+
+router = APIRouter(tags=["admin"])
+
+@router.get("/parse-cache")
+def get_parse_cache_stats():
+    try:
+        return parse_cache.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read parse cache: {e}")
+
+@router.delete("/parse-cache")
+def purge_parse_cache(expired_only: bool = Query(False, description="Only drop entries past the TTL")):
+    try:
+        return {"deleted": parse_cache.purge(expired_only=expired_only)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to purge parse cache: {e}")
+
+@router.get("/embedding-cache")
+def get_embedding_cache_stats():
+    try:
+        return embedding_cache.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read embedding cache: {e}")
+
+@router.delete("/embedding-cache")
+def purge_embedding_cache(live: bool = Query(False, description="Also forget which vectors are live, so every report is upserted again")):
+    try:
+        return {"deleted": embedding_cache.purge(live=live)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to purge embedding cache: {e}")
+
+@router.get("/motel-cache")
+def get_motel_cache_stats():
+    return motel_resolver.stats()
+
+@router.delete("/motel-cache")
+def clear_motel_cache():
+    motel_resolver.invalidate()
+    return {"cleared": True}
+
+@router.get("/vector-outbox")
+def get_vector_outbox_stats():
+    try:
+        return vector_outbox.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read vector outbox: {e}")
+
+@router.post("/vector-outbox/drain")
+def drain_vector_outbox(max_batches: int = Query(1, ge=1, le=100)):
+    try:
+        return vector_outbox.drain(max_batches=max_batches)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to drain vector outbox: {e}")
+
+@router.post("/vector-outbox/requeue")
+def requeue_vector_outbox():
+    try:
+        return {"requeued": vector_outbox.requeue_dead()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to requeue dead rows: {e}")
@@ -139,7 +139,6 @@
 from fastapi import APIRouter, HTTPException
 from openai import OpenAI
 from pydantic import BaseModel
-from pinecone import Pinecone
 from sqlalchemy import func
 import os
 import re
@@ -147,18 +146,17 @@ import logging
 
 from app.repositories.session import get_session
 from app.db.models import MotelMaster, ReportMaster, TokenUsage
+from app.services import rag_filters
 from app.utils.token_costs import estimate_cost
+from app.vectorstore.store import get_store
 
 router = APIRouter(tags=["chat"])
 
 # ---------- ENV CONFIG ----------
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX = os.getenv("PINECONE_INDEX")
 
 client = OpenAI(api_key=OPENAI_API_KEY)
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX)
+store = get_store()  # Pinecone, or the local NumPy store (VECTOR_STORE)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -288,19 +286,31 @@ def run_sql_query(question: str):
 
 # ---------- 3️⃣ RAG Processor ----------
 def run_rag_query(question: str, top_k: int = 5):
-    """Handles semantic retrieval via Pinecone + GPT."""
+    """Handles semantic retrieval via the vector store + GPT."""
+    # motels, locations, departments and dates named in the question narrow retrieval to those reports
+    constraints, metadata_filter = {}, None
+    try:
+        constraints = rag_filters.extract_constraints(question)
+        metadata_filter = rag_filters.vector_filter(constraints)
+        if metadata_filter:
+            logger.info(f"🔎 RAG filter: {rag_filters.describe(constraints)}")
+    except Exception as e:
+        logger.error(f"Constraint extraction failed: {e}")
+
     query_emb = client.embeddings.create(
         model="text-embedding-3-small",
         input=question
     ).data[0].embedding
 
-    results = index.query(vector=query_emb, top_k=top_k, include_metadata=True)
+    matches = store.query(query_emb, top_k=top_k, filter=metadata_filter, include_metadata=True)
 
-    if not results or not results.get("matches"):
+    if not matches:
+        if metadata_filter:
+            return f"No reports found for {rag_filters.describe(constraints)}."
         return "No relevant context found."
 
     contexts = []
-    for m in results["matches"]:
+    for m in matches:
         meta = m["metadata"]
         content = meta.get("content", "")
         context = (
@@ -1,9 +1,12 @@
 # app/api/motels.py
 from fastapi import APIRouter, Query, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
 from typing import Optional
 
 from app.repositories.session import get_session
 from app.db.models import MotelMaster
+from app.services import motel_resolver
 
 router = APIRouter(tags=["motels"])
 
@@ -18,3 +21,33 @@ def list_motels():
             ]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list motels: {e}")
+
+
+class MotelUpdate(BaseModel):
+    motel_name: Optional[str] = None
+    location: Optional[str] = None
+
+
+@router.patch("/{motel_id}")
+def update_motel(motel_id: int, body: MotelUpdate):
+    try:
+        with get_session() as db:
+            m = db.get(MotelMaster, motel_id)
+            if not m:
+                raise HTTPException(status_code=404, detail="Motel not found")
+            if body.motel_name is not None:
+                m.motel_name = body.motel_name.strip()
+            if body.location is not None:
+                m.location = body.location.strip() or None
+            db.commit()
+            result = {"id": m.id, "motel_name": m.motel_name, "location": m.location}
+    except HTTPException:
+        raise
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Another motel already has that name")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update motel: {e}")
+    finally:
+        # ingest resolves report property names through this cache
+        motel_resolver.invalidate()
+    return result
@@ -26,16 +26,17 @@ router = APIRouter(tags=["reports"])
 
 @router.get("/fetch")
 def fetch_reports(
-    mode: str = Query("recent", enum=["recent", "all"]),
+    mode: str = Query("recent", enum=["recent", "all", "incremental"]),
     limit: int = Query(5, ge=1, le=50),
     pages: Optional[int] = Query(None, ge=1, le=50),
     after: Optional[str] = Query(None, description="YYYY/MM/DD"),
     before: Optional[str] = Query(None, description="YYYY/MM/DD"),
+    force: bool = Query(False, description="Reprocess messages/attachments already in the ledger"),
 ):
     if not os.environ.get("AWS_EXECUTION_ENV"):
         # ✅ Local run — directly execute synchronously
         try:
-            result = ingest_reports_from_gmail(mode=mode, limit=limit, pages=pages, after=after, before=before)
+            result = ingest_reports_from_gmail(mode=mode, limit=limit, pages=pages, after=after, before=before, force=force)
             return {"ok": True, **result}
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to fetch reports: {e}")
@@ -54,7 +55,7 @@ def fetch_reports(
         payload = {
             "action": "fetch_reports",
             "job_id": job_id,
-            "params": {"mode": mode, "limit": limit, "after": after, "before": before},
+            "params": {"mode": mode, "limit": limit, "after": after, "before": before, "force": force},
         }
         lambda_client.invoke(
             FunctionName=os.environ["AWS_LAMBDA_FUNCTION_NAME"],
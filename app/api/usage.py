@@ -2,11 +2,13 @@ from fastapi import APIRouter
 from sqlalchemy import func
 from app.repositories.session import get_session
 from app.db.models import TokenUsage
+from app.utils import usage_recorder
 
 router = APIRouter(tags=["usage"])
 
 @router.get("/summary")
 def get_usage_summary():
+    usage_recorder.flush()  # include rows still buffered in this process
     with get_session() as db:
         total_cost = db.query(func.sum(TokenUsage.cost_usd)).scalar() or 0
         total_tokens = db.query(func.sum(TokenUsage.total_tokens)).scalar() or 0
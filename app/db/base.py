@@ -6,5 +6,15 @@ from app.db.models import (
     ReportVacantDirtyRoom,
     ReportOutOfOrderRoom,
     ReportCompRoom,
-    ReportIncident
+    ReportIncident,
+    GmailSyncState,
+    ProcessedMessage,
+    ProcessedAttachment,
+    ExtractedTextCache,
+    ParseCache,
+    BackfillBatch,
+    EmbeddingCache,
+    ReportVector,
+    VectorOutbox,
+    EmbedBackfillCheckpoint
 )
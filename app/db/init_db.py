@@ -1,8 +1,39 @@
 # app/repositories/init_db.py
+from sqlalchemy import inspect, text
+
 from app.repositories.session import engine
-from app.db.models import Base
+from app.db.models import Base, ProcessedMessage, ReportMaster
+
+# columns added to existing tables after their first release
+_LATER_COLUMNS = [ProcessedMessage.__table__.c.status]
+
+def _ensure_columns():
+    # create_all never alters an existing table; add the columns introduced later
+    insp = inspect(engine)
+    for column in _LATER_COLUMNS:
+        table = column.table.name
+        if not insp.has_table(table) or column.name in {c["name"] for c in insp.get_columns(table)}:
+            continue
+        ddl = f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(ddl))
+        except Exception as e:
+            print(f"⚠️ Could not add column {table}.{column.name}: {e}")
+
+def _ensure_indexes():
+    # create_all only adds indexes along with new tables; add the ones introduced later
+    for index in ReportMaster.__table__.indexes:
+        if not index.unique:
+            continue
+        try:
+            index.create(bind=engine, checkfirst=True)
+        except Exception as e:
+            print(f"⚠️ Could not create index {index.name} (duplicate reports already stored?): {e}")
 
 def init_db():
     print("📦 Creating all tables...")
     Base.metadata.create_all(bind=engine)
+    _ensure_columns()
+    _ensure_indexes()
     print("✅ All tables created successfully!")
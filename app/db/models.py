@@ -1,7 +1,8 @@
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func, Text, JSON, Index, LargeBinary
 from sqlalchemy import Enum as SQLEnum
 from enum import Enum
+from datetime import datetime
 
 Base = declarative_base()
 
@@ -46,6 +47,11 @@ class ReportMaster(Base):
     comp_room_records = relationship("ReportCompRoom", back_populates="report", cascade="all, delete-orphan")
     incident_records = relationship("ReportIncident", back_populates="report", cascade="all, delete-orphan")
 
+    # ✅ one report per motel per day; ingest inserts with ON CONFLICT against it
+    __table_args__ = (
+        Index("uq_report_motel_date", "motel_id", "report_date", unique=True),
+    )
+
 
 # 🧹 Vacant or dirty rooms
 class ReportVacantDirtyRoom(Base):
@@ -124,4 +130,130 @@ class TokenUsage(Base):
     completion_tokens = Column(Integer, default=0)
     total_tokens = Column(Integer, default=0)
     cost_usd = Column(Float, default=0.0)
-    created_at = Column(DateTime, default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime, default=func.now())
+
+
+# 🔁 Gmail incremental sync checkpoint (one row per mailbox)
+class GmailSyncState(Base):
+    __tablename__ = "gmail_sync_state"
+
+    mailbox = Column(String, primary_key=True)  # "me" for the authorized account
+    history_id = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+# 🧾 Ledger of Gmail messages already ingested (skipped before download)
+class ProcessedMessage(Base):
+    __tablename__ = "processed_message"
+
+    gmail_message_id = Column(String, primary_key=True)
+    processed_at = Column(DateTime, default=func.now())
+    status = Column(String(32), nullable=True)  # "processed" / "skipped_subject" / "skipped_sender" / "skipped_empty"
+
+
+# 🧾 Ledger of attachment contents already ingested, keyed by SHA-256
+class ProcessedAttachment(Base):
+    __tablename__ = "processed_attachment"
+
+    sha256 = Column(String(64), primary_key=True)
+    gmail_message_id = Column(String, nullable=True)
+    filename = Column(String, nullable=True)
+    report_id = Column(Integer, nullable=True)
+    status = Column(String(20), nullable=True)  # "stored" / "duplicate"
+    processed_at = Column(DateTime, default=func.now())
+
+
+# 🗂️ Extracted document text keyed by attachment SHA-256 + extractor version
+class ExtractedTextCache(Base):
+    __tablename__ = "extracted_text_cache"
+
+    cache_key = Column(String, primary_key=True)
+    text = Column(Text, nullable=False)
+    size_bytes = Column(Integer, default=0)
+    created_at = Column(DateTime, default=func.now())
+    last_used_at = Column(DateTime, default=func.now(), index=True)
+
+
+# 🧠 Memoized LLM report parses (text hash + model + prompt version)
+class ParseCache(Base):
+    __tablename__ = "llm_parse_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    model = Column(String(50))
+    prompt_version = Column(String(30))
+    result = Column(JSON, nullable=False)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    total_tokens = Column(Integer, default=0)
+    hits = Column(Integer, default=0)
+    tokens_saved = Column(Integer, default=0)
+    created_at = Column(DateTime, default=func.now(), index=True)
+    last_used_at = Column(DateTime, default=func.now(), index=True)
+
+
+# 🧮 Embedding vectors keyed by SHA-256 of the model + canonical embedding text
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+
+    content_hash = Column(String(64), primary_key=True)
+    model = Column(String(50))
+    dims = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # little-endian float32
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=func.now())
+    last_used_at = Column(DateTime, default=func.now(), index=True)
+
+
+# 📌 The vector currently live in the index for each report, and what it was built from
+class ReportVector(Base):
+    __tablename__ = "report_vector"
+
+    report_id = Column(Integer, ForeignKey("motel_daily_report.id", ondelete="CASCADE"), primary_key=True)
+    vector_id = Column(String, nullable=False)
+    index_name = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=False)  # embedding text + model
+    metadata_hash = Column(String(64), nullable=False)
+    upserted_at = Column(DateTime, default=func.now())
+
+
+# 📮 Reports waiting to be embedded and upserted; written in the same transaction as the report
+class VectorOutbox(Base):
+    __tablename__ = "vector_outbox"
+
+    id = Column(Integer, primary_key=True)
+    report_id = Column(Integer, ForeignKey("motel_daily_report.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String(10), default="pending", index=True)  # "pending" / "done" / "dead"
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    # naive UTC from the app clock, like the datetime.utcnow() the drain compares them with
+    # (func.now() would be the server's local time on a Postgres not running in UTC)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    locked_until = Column(DateTime, nullable=True)  # claimed by a drain worker until then
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+
+# 🔖 Embedding backfill checkpoint: every report up to last_report_id is indexed (one row per index + filters)
+class EmbedBackfillCheckpoint(Base):
+    __tablename__ = "embed_backfill_checkpoint"
+
+    name = Column(String, primary_key=True)
+    last_report_id = Column(Integer, default=0)
+    reports_done = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+# 📦 OpenAI Batch API jobs submitted by the backfill script (resumable by batch_id)
+class BackfillBatch(Base):
+    __tablename__ = "backfill_batch"
+
+    batch_id = Column(String, primary_key=True)
+    kind = Column(String(10), nullable=False)  # "parse" / "embed"
+    status = Column(String(20), nullable=True)  # last status seen from the Batch API
+    input_file_id = Column(String, nullable=True)
+    output_file_id = Column(String, nullable=True)
+    request_count = Column(Integer, default=0)
+    manifest = Column(JSON, nullable=False)  # custom_id -> what to do with its result
+    result_summary = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    applied_at = Column(DateTime, nullable=True)  # results written back to the DB
@@ -2,7 +2,12 @@
 import io
 from docx import Document
 
+from app.utils.text_cache import cached_text
+
 def extract_text_from_docx(data: bytes) -> str:
+    return cached_text("docx", data, _docx_text)
+
+def _docx_text(data: bytes) -> str:
     try:
         doc = Document(io.BytesIO(data))
         return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
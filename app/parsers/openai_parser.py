@@ -2,48 +2,186 @@
 import os
 import re
 import json
-from openai import OpenAI
+import random
+import asyncio
+import threading
+import weakref
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
+
+from app.utils import parse_cache
+from app.utils.rate_limiter import RateLimiter
+from . import text_compactor
+from .text_compactor import TEXT_COMPACTION, compact_report_text
+
+MODEL = "gpt-4.1-mini"
+# Bump when the expected JSON schema changes; the prompt text itself is
+# also part of the parse-cache key, so editing it invalidates old entries.
+PROMPT_VERSION = "report-json-1"
+
+# Concurrency and rate limits for LLM parses (shared by every caller in the process)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "200000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))  # seconds
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+# completion tokens reserved per call on top of the prompt estimate
+LLM_COMPLETION_ESTIMATE = int(os.getenv("LLM_COMPLETION_ESTIMATE", "800"))
+
+SYSTEM_PROMPT = (
+    "You are an expert OCR text parser for motel daily reports. "
+    "Return ONLY a valid JSON object with the following keys:\n"
+    "- property_name\n- report_date\n- department\n- auditor\n"
+    "- revenue\n- adr\n- occupancy\n- vacant_clean\n- vacant_dirty\n- out_of_order_rooms_storage\n"
+    "- vacant_dirty_rooms (list of {room_number, reason, days, action})\n"
+    "- out_of_order_rooms (list of {room_number, reason, days, action})\n"
+    "- comp_rooms (list of {room_number, notes})\n"
+    "- incidents (list of {description})\n\n"
+    "Do NOT include any explanations, prose, or markdown — only pure JSON."
+)
+USER_PROMPT = "Parse and return structured JSON from the following motel daily report text:\n\n{text}"
+
+limiter = RateLimiter(rpm=LLM_RPM, tpm=LLM_TPM)
+
+# AsyncOpenAI's HTTP pool and asyncio.Semaphore are bound to one event loop
+_loop_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+_state_lock = threading.Lock()
+_bg_loop = None
+_stats = {"llm_calls": 0, "cache_hits": 0, "rate_limited": 0, "api_errors": 0, "retries": 0, "failed": 0,
+          "compaction_tokens_saved": 0}
+_stats_lock = threading.Lock()
+
+# worth another try: 429s, dropped connections and timeouts (APITimeoutError), 5xx
+_RETRYABLE = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+class LLMParseError(Exception):
+    """The LLM call still failed after every retry; the report was not parsed."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size (~4 characters per token) plus the expected completion."""
+    return (len(SYSTEM_PROMPT) + len(USER_PROMPT) + len(text or "")) // 4 + LLM_COMPLETION_ESTIMATE
+
+
+def request_body(text: str) -> dict:
+    """Chat-completions body for one report; also used for Batch API request lines."""
+    return {
+        "model": MODEL,
+        "temperature": 0.2,
+        "messages": [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": USER_PROMPT.format(text=text)
+            }
+        ],
+    }
+
+
+def prepare_text(text: str) -> str:
+    """Compact report text for the prompt (see text_compactor) and log the tokens saved."""
+    if not TEXT_COMPACTION:
+        return text
+    compacted, st = compact_report_text(text)
+    if st["tokens_saved"] > 0:
+        pct = 100 * st["tokens_saved"] / st["tokens_before"]
+        print(f"✂️ Compacted report text: {st['tokens_before']} → {st['tokens_after']} tokens (saved {st['tokens_saved']}, {pct:.0f}%)")
+        _count("compaction_tokens_saved", st["tokens_saved"])
+    return compacted
+
+
+def _prep_settings() -> str:
+    """How prepare_text shapes the prompt; the key is built from the raw text."""
+    if not TEXT_COMPACTION:
+        return "raw"
+    return f"{text_compactor.COMPACTOR_VERSION}:{text_compactor.LLM_INPUT_TOKEN_BUDGET}"
+
+
+def cache_key(text: str) -> str:
+    return parse_cache.cache_key(text, MODEL, PROMPT_VERSION, SYSTEM_PROMPT + USER_PROMPT, _prep_settings())
+
+
+def _count(field: str, n: int = 1):
+    with _stats_lock:
+        _stats[field] += n
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return {**_stats, **limiter.stats()}
+
+
+def _async_state():
+    loop = asyncio.get_running_loop()
+    with _state_lock:
+        state = _loop_state.get(loop)
+        if state is None:
+            # retries are handled here so they go through the limiter and jittered backoff
+            state = (
+                AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0),
+                asyncio.Semaphore(max(1, LLM_MAX_CONCURRENCY)),
+            )
+            _loop_state[loop] = state
+        return state
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """One long-lived loop that sync callers (pipeline threads) share."""
+    global _bg_loop
+    with _state_lock:
+        if _bg_loop is None or _bg_loop.is_closed():
+            _bg_loop = asyncio.new_event_loop()
+            threading.Thread(target=_bg_loop.run_forever, name="llm-loop", daemon=True).start()
+        return _bg_loop
+
+
+def _backoff(attempt: int, retry_after: float | None) -> float:
+    # full jitter, but never sooner than the server asked for
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+    return max(delay, retry_after or 0.0)
+
+
+def _retry_after(e: Exception) -> float | None:
+    try:
+        return float(e.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 class OpenAIReportParser:
     def parse(self, text: str, metadata=None) -> dict:
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4.1-mini",
-                temperature=0.2,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are an expert OCR text parser for motel daily reports. "
-                            "Return ONLY a valid JSON object with the following keys:\n"
-                            "- property_name\n- report_date\n- department\n- auditor\n"
-                            "- revenue\n- adr\n- occupancy\n- vacant_clean\n- vacant_dirty\n- out_of_order_rooms_storage\n"
-                            "- vacant_dirty_rooms (list of {room_number, reason, days, action})\n"
-                            "- out_of_order_rooms (list of {room_number, reason, days, action})\n"
-                            "- comp_rooms (list of {room_number, notes})\n"
-                            "- incidents (list of {description})\n\n"
-                            "Do NOT include any explanations, prose, or markdown — only pure JSON."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Parse and return structured JSON from the following motel daily report text:\n\n{text}"
-                    }
-                ]
-            )
+        """
+        Blocking parse. Runs on the shared background loop so calls from
+        many threads share one concurrency cap and rate limiter.
+        """
+        return asyncio.run_coroutine_threadsafe(self.aparse(text, metadata), _background_loop()).result()
 
-            raw = response.choices[0].message.content.strip()
-            print("📦 GPT Raw Output Preview:", raw[:400])
+    async def aparse(self, text: str, metadata=None) -> dict:
+        """
+        The report dict ({} when the model returns no usable JSON). Raises
+        LLMParseError when the API call fails after LLM_MAX_RETRIES retries.
+        """
+        key = cache_key(text)
+        cached = await asyncio.to_thread(parse_cache.get, key)
+        if cached is not None:
+            print("♻️ Parse cache hit — skipping LLM call")
+            _count("cache_hits")
+            return cached
 
-            # --- Clean & extract JSON ---
-            json_str = self._extract_json_from_text(raw)
-            if not json_str:
-                print("⚠️ No valid JSON detected in GPT response.")
-                return {}
+        aclient, semaphore = _async_state()
+        prompt_text = prepare_text(text)
+        estimated = estimate_tokens(prompt_text)
+        try:
+            async with semaphore:
+                response = await self._create(aclient, prompt_text, estimated)
 
-            parsed = json.loads(json_str)
+            parsed = self.parse_content(response.choices[0].message.content)
+            if parsed:
+                await asyncio.to_thread(parse_cache.put, key, MODEL, PROMPT_VERSION, parsed, response.usage)
             return parsed
 
         except json.JSONDecodeError as e:
@@ -51,7 +189,44 @@ class OpenAIReportParser:
             return {}
         except Exception as e:
             print(f"[OpenAI Parser Error] {e}")
+            _count("failed")
+            raise LLMParseError(str(e)) from e
+
+    async def aparse_many(self, texts: list[str]) -> list[dict]:
+        """Parse several reports concurrently (bounded by LLM_MAX_CONCURRENCY); keeps input order."""
+        return await asyncio.gather(*(self.aparse(t) for t in texts))
+
+    async def _create(self, aclient: AsyncOpenAI, text: str, estimated: int):
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await limiter.acquire_async(estimated)
+            try:
+                _count("llm_calls")
+                response = await aclient.chat.completions.create(**request_body(text))
+            except _RETRYABLE as e:
+                _count("rate_limited" if isinstance(e, RateLimitError) else "api_errors")
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                delay = _backoff(attempt, _retry_after(e))
+                what = "429" if isinstance(e, RateLimitError) else type(e).__name__
+                print(f"⏳ OpenAI {what}; retrying in {delay:.1f}s (attempt {attempt + 1}/{LLM_MAX_RETRIES})")
+                _count("retries")
+                await asyncio.sleep(delay)
+                continue
+            usage = getattr(response, "usage", None)
+            limiter.settle(estimated, getattr(usage, "total_tokens", 0) or 0)
+            return response
+
+    def parse_content(self, content: str) -> dict:
+        """Turn the model's message content into the report dict ({} when there is no JSON)."""
+        raw = (content or "").strip()
+        print("📦 GPT Raw Output Preview:", raw[:400])
+
+        # --- Clean & extract JSON ---
+        json_str = self._extract_json_from_text(raw)
+        if not json_str:
+            print("⚠️ No valid JSON detected in GPT response.")
             return {}
+        return json.loads(json_str)
 
     def _extract_json_from_text(self, text: str) -> str:
         """
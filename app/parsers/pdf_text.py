@@ -1,33 +1,333 @@
 # app/parsers/pdf_text.py
 import io
+import itertools
+import multiprocessing
 import os
+import shutil
+import tempfile
+import time
+import threading
+import weakref
 import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, NamedTuple, Optional
 from PyPDF2 import PdfReader
 from openai import OpenAI
 import base64
 
+from app.utils.text_cache import cached_text
+
 # ✅ initialize once globally
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def _basic_pdf_text(pdf_bytes: bytes) -> str:
-    text = ""
+# Process pool for CPU-bound pdfplumber work (1 = always in-process)
+PDF_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", "60"))  # seconds per pool task, from when it starts
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "4"))
+# path objects (lines/rects) on a page before it is treated as a ruled table
+PDF_TABLE_MIN_RULES = int(os.getenv("PDF_TABLE_MIN_RULES", "8"))
+# Page-level OCR for pages without a text layer
+PDF_PAGE_OCR = os.getenv("PDF_PAGE_OCR", "1").lower() in ("1", "true", "yes")
+OCR_DPI = int(os.getenv("OCR_DPI", "150"))
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2000"))  # pixels, caps the render of oversized pages
+OCR_JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "70"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "4"))
+OCR_MODEL = "gpt-4.1-mini"
+OCR_PROMPT = (
+    "You are an OCR assistant. Extract ALL visible text "
+    "from the uploaded motel daily report PDF. Preserve table structures "
+    "as readable text. Do NOT summarize — return full raw text."
+)
+
+_PDFIUM_LOCK = threading.Lock()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_pool_unavailable = False
+# pool -> directory its workers drop a file named after their pid in, so a
+# replaced pool's workers can be terminated (no public API lists them)
+_pool_pid_dirs: "weakref.WeakKeyDictionary[ProcessPoolExecutor, str]" = weakref.WeakKeyDictionary()
+_POLL = 0.25  # seconds between checks whether a queued task has started
+
+
+class PdfExtractionTimeout(Exception):
+    pass
+
+
+class PageText(NamedTuple):
+    index: int
+    text: str
+    method: str  # "text" (pdfium), "table" (pdfplumber) or "ocr" (no text layer)
+
+
+def _plumber_text(pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> str:
+    """pdfplumber text for pages [start, stop); one line break per page."""
+    parts = []
     try:
         with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text() or ""
-                text += page_text + "\n"
+            for page in pdf.pages[start:stop]:
+                parts.append((page.extract_text() or "") + "\n")
     except Exception:
         pass
+    return "".join(parts)
 
+def _pypdf2_text(pdf_bytes: bytes) -> str:
+    parts = []
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        for page in reader.pages:
+            parts.append(page.extract_text() or "")
+    except Exception:
+        pass
+    return "".join(parts)
+
+def _legacy_pdf_text(pdf_bytes: bytes) -> str:
+    """Old path (pdfplumber on every page, then PyPDF2); used when pdfium can't open a file."""
+    text = _plumber_text(pdf_bytes)
     if len(text.strip()) < 50:
-        try:
-            reader = PdfReader(io.BytesIO(pdf_bytes))
-            for page in reader.pages:
-                text += page.extract_text() or ""
-        except Exception:
-            pass
+        text += _pypdf2_text(pdf_bytes)
     return text.strip()
 
+def _page_count(pdf_bytes: bytes) -> int:
+    try:
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(pdf_bytes)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+    except Exception:
+        return 0
+
+def _has_ruled_table(page) -> bool:
+    # ruled tables are drawn as many line/rect path objects; plain text pages have few
+    rules = page.get_objects(filter=(pdfium_c.FPDF_PAGEOBJ_PATH,), max_depth=2)
+    return sum(1 for _ in itertools.islice(rules, PDF_TABLE_MIN_RULES)) >= PDF_TABLE_MIN_RULES
+
+def _layered_pages(pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> Optional[List[PageText]]:
+    """
+    Per-page extraction for pages [start, stop): pdfium text layer first,
+    pdfplumber only for pages that look like they hold a ruled table, and
+    pages without a text layer marked "ocr". Returns None when pdfium
+    cannot open the document.
+    """
+    pages: List[PageText] = []
+    table_pages: List[int] = []
+    try:
+        with _PDFIUM_LOCK:  # pdfium is not thread-safe
+            pdf = pdfium.PdfDocument(pdf_bytes)
+            try:
+                stop = len(pdf) if stop is None else min(stop, len(pdf))
+                for i in range(start, stop):
+                    page = pdf[i]
+                    try:
+                        textpage = page.get_textpage()
+                        try:
+                            text = textpage.get_text_bounded() if textpage.count_chars() else ""
+                        finally:
+                            textpage.close()
+                        text = text.replace("\r\n", "\n").replace("\r", "\n").strip()
+                        if not text:
+                            pages.append(PageText(i, "", "ocr"))
+                        elif _has_ruled_table(page):
+                            table_pages.append(len(pages))
+                            pages.append(PageText(i, text, "table"))
+                        else:
+                            pages.append(PageText(i, text, "text"))
+                    finally:
+                        page.close()
+            finally:
+                pdf.close()
+    except Exception as e:
+        print(f"⚠️ pdfium could not read PDF ({e}); using pdfplumber")
+        return None
+
+    if table_pages:
+        try:
+            with pdfplumber.open(io.BytesIO(pdf_bytes)) as plumber:
+                for pos in table_pages:
+                    p = pages[pos]
+                    layout_text = (plumber.pages[p.index].extract_text() or "").strip()
+                    if layout_text:
+                        pages[pos] = p._replace(text=layout_text)
+        except Exception as e:
+            print(f"⚠️ pdfplumber failed on table pages ({e}); keeping pdfium text")
+    return pages
+
+def _join_pages(pages: List[PageText]) -> str:
+    # form feed between pages so later stages can tell page headers/footers
+    # apart; pages without a text layer stay as empty slots for page OCR
+    return "\f".join(p.text for p in pages)
+
+def _basic_pdf_text(pdf_bytes: bytes) -> str:
+    pages = _layered_pages(pdf_bytes)
+    if pages is None:
+        return _legacy_pdf_text(pdf_bytes)
+    _log_ocr_pages(pages)
+    return _join_pages(pages)
+
+def _log_ocr_pages(pages: List[PageText]):
+    ocr = [p.index + 1 for p in pages if p.method == "ocr"]
+    if ocr and len(ocr) < len(pages):
+        print(f"🖼️ {len(ocr)}/{len(pages)} PDF pages have no text layer (pages {ocr[:10]}{'…' if len(ocr) > 10 else ''})")
+
+
+# ---------- Process-pool extraction ----------
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool, _pool_unavailable
+    if PDF_WORKERS <= 1 or _pool_unavailable:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            try:
+                # not fork: this process runs Gmail and pipeline threads, and a forked
+                # child could inherit _PDFIUM_LOCK held by one of them
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                pid_dir = tempfile.mkdtemp(prefix="pdf-pool-")
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_WORKERS,
+                    mp_context=multiprocessing.get_context(method),
+                    initializer=_register_worker,
+                    initargs=(pid_dir,),
+                )
+                _pool_pid_dirs[_pool] = pid_dir
+                weakref.finalize(_pool, shutil.rmtree, pid_dir, True)
+            except (OSError, NotImplementedError, ImportError, ValueError) as e:
+                # e.g. Lambda has no /dev/shm for multiprocessing semaphores
+                print(f"⚠️ No process pool for PDF extraction ({e}); extracting in-process")
+                _pool_unavailable = True
+        return _pool
+
+_RETIRED = "retired"
+
+def _register_worker(pid_dir: str):
+    # write the pid before looking for the marker: a worker starting while its
+    # pool is retired is either listed by _terminate_workers or sees the marker
+    try:
+        open(os.path.join(pid_dir, str(os.getpid())), "w").close()
+    except OSError:
+        os._exit(0)  # the directory goes with the pool: it is already gone
+    if os.path.exists(os.path.join(pid_dir, _RETIRED)):
+        os._exit(0)
+
+def _terminate_workers(pool: ProcessPoolExecutor):
+    """
+    Terminate every worker of a replaced pool. All of them: one killed while
+    it holds the result queue's lock would leave the others blocked on it.
+    """
+    pid_dir = _pool_pid_dirs.pop(pool, None)
+    if pid_dir is None:
+        return
+    try:
+        open(os.path.join(pid_dir, _RETIRED), "w").close()
+        pids = {int(name) for name in os.listdir(pid_dir) if name.isdigit()}
+    except OSError as e:
+        print(f"⚠️ Could not list PDF pool workers ({e}); leaving them to finish")
+        return
+    for proc in multiprocessing.active_children():
+        if proc.pid in pids:
+            proc.terminate()
+
+def _reset_pool(pool: Optional[ProcessPoolExecutor] = None):
+    """
+    Replace the pool (or ``pool``, if it is still the current one) and
+    terminate its workers, so a worker stuck in pdfplumber does not keep
+    its CPU. Other documents' tasks on the old pool (queued ones cancelled,
+    running ones broken by the termination) are resubmitted by their
+    callers to the new pool.
+    """
+    global _pool
+    with _pool_lock:
+        if pool is not None and pool is not _pool:
+            return  # already replaced
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+        _terminate_workers(pool)
+
+def _task_result(future, timeout: float):
+    """
+    The task's result, allowing ``timeout`` seconds from when it starts
+    running, so time spent queued behind other documents' tasks does not
+    count. (A future shows as running once it is handed to the workers'
+    call queue, which holds at most one task more than there are workers.)
+    """
+    started = None
+    while True:
+        if started is None and future.running():
+            started = time.monotonic()
+        remaining = timeout if started is None else timeout - (time.monotonic() - started)
+        if remaining <= 0:
+            raise FutureTimeout()
+        try:
+            return future.result(timeout=min(_POLL, remaining) if started is None else remaining)
+        except FutureTimeout:
+            continue
+
+def _pooled_pdf_text(pool: ProcessPoolExecutor, pdf_bytes: bytes, timeout: float) -> str:
+    def run(calls):
+        futures = [pool.submit(fn, *args) for fn, *args in calls]
+        results = []
+        for (fn, *args), f in zip(calls, futures):
+            owner = pool
+            while True:
+                try:
+                    results.append(_task_result(f, timeout))
+                    break
+                except (CancelledError, BrokenProcessPool):
+                    if owner is _pool:
+                        _reset_pool(owner)
+                        raise BrokenProcessPool("PDF process pool broke")  # not replaced by a timeout: it really broke
+                    # the pool was replaced after another document timed out; run it on the new one
+                    owner = _get_pool()
+                    if owner is None:
+                        results.append(fn(*args))
+                        break
+                    f = owner.submit(fn, *args)
+                except FutureTimeout:
+                    for other in futures:
+                        other.cancel()
+                    # new work goes to a fresh pool and the stuck worker is terminated
+                    _reset_pool(owner)
+                    raise PdfExtractionTimeout(f"PDF extraction task exceeded {timeout:g}s")
+        return results
+
+    count = _page_count(pdf_bytes)
+    step = max(1, PAGES_PER_TASK)
+    if count > step:
+        # split a long document into page ranges extracted side by side
+        chunks = run([(_layered_pages, pdf_bytes, i, i + step) for i in range(0, count, step)])
+    else:
+        chunks = run([(_layered_pages, pdf_bytes)])
+
+    if any(c is None for c in chunks):
+        return run([(_legacy_pdf_text, pdf_bytes)])[0]
+    pages = [p for chunk in chunks for p in chunk]
+    _log_ocr_pages(pages)
+    return _join_pages(pages)
+
+def basic_pdf_text(pdf_bytes: bytes, timeout: Optional[float] = None) -> str:
+    """
+    Layered text-layer extraction (pdfium per page, pdfplumber for table
+    pages) in the process pool,
+    falling back to in-process extraction when no pool is available.
+    Raises PdfExtractionTimeout when one of the document's pool tasks runs
+    longer than ``timeout`` seconds.
+    """
+    pool = _get_pool()
+    if pool is None:
+        return _basic_pdf_text(pdf_bytes)
+    try:
+        return _pooled_pdf_text(pool, pdf_bytes, timeout or PDF_TIMEOUT)
+    except BrokenProcessPool:
+        print("⚠️ PDF process pool broke; extracting in-process")
+        _reset_pool(pool)
+        return _basic_pdf_text(pdf_bytes)
+
 def _gpt_vision_extract(pdf_bytes: bytes) -> str:
     """
     OCR scanned PDFs using GPT-4.1-mini.
@@ -35,6 +335,7 @@ def _gpt_vision_extract(pdf_bytes: bytes) -> str:
     ✅ Properly sets filename and MIME type
     ✅ Handles scanned tables too
     """
+    uploaded_file = None
     try:
         # ✅ Upload PDF with filename and correct MIME type
         uploaded_file = client.files.create(
@@ -46,16 +347,9 @@ def _gpt_vision_extract(pdf_bytes: bytes) -> str:
 
         # ✅ Use the uploaded file in chat completion
         response = client.chat.completions.create(
-            model="gpt-4.1-mini",
+            model=OCR_MODEL,
             messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an OCR assistant. Extract ALL visible text "
-                        "from the uploaded motel daily report PDF. Preserve table structures "
-                        "as readable text. Do NOT summarize — return full raw text."
-                    )
-                },
+                {"role": "system", "content": OCR_PROMPT},
                 {
                     "role": "user",
                     "content": [
@@ -73,10 +367,123 @@ def _gpt_vision_extract(pdf_bytes: bytes) -> str:
     except Exception as e:
         print(f"[GPT OCR Fallback Error] {e}")
         return ""
+    finally:
+        # don't leave one uploaded copy per OCR call lying around
+        if uploaded_file is not None:
+            try:
+                client.files.delete(uploaded_file.id)
+            except Exception as e:
+                print(f"⚠️ Could not delete uploaded file {uploaded_file.id}: {e}")
+
+
+# ---------- Page-level OCR ----------
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    text = _basic_pdf_text(pdf_bytes)
-    if len(text) < 100:
-        print("⚠️ PDF appears to be scanned. Falling back to GPT OCR...")
-        text = _gpt_vision_extract(pdf_bytes)
+def _render_pages(pdf_bytes: bytes, indexes: List[int]) -> Optional[List[bytes]]:
+    """Grayscale JPEGs of the given pages at OCR_DPI (longest side capped at OCR_MAX_SIDE)."""
+    images = []
+    try:
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(pdf_bytes)
+            try:
+                for i in indexes:
+                    page = pdf[i]
+                    try:
+                        width, height = page.get_size()  # points, 72 per inch
+                        scale = min(OCR_DPI / 72, OCR_MAX_SIDE / max(width, height, 1))
+                        bitmap = page.render(scale=scale, grayscale=True)
+                        try:
+                            image = bitmap.to_pil()
+                        finally:
+                            bitmap.close()
+                    finally:
+                        page.close()
+                    buf = io.BytesIO()
+                    image.convert("L").save(buf, format="JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+                    images.append(buf.getvalue())
+            finally:
+                pdf.close()
+    except Exception as e:
+        print(f"⚠️ Could not render PDF pages for OCR ({e})")
+        return None
+    return images
+
+def _gpt_vision_page(image: bytes) -> str:
+    """OCR one rendered page image (JPEG bytes)."""
+    try:
+        response = client.chat.completions.create(
+            model=OCR_MODEL,
+            messages=[
+                {"role": "system", "content": OCR_PROMPT},
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": "Extract text from this scanned page:"},
+                        {"type": "image_url", "image_url": {
+                            "url": "data:image/jpeg;base64," + base64.b64encode(image).decode("ascii"),
+                            "detail": "high",
+                        }},
+                    ]
+                }
+            ]
+        )
+        return (response.choices[0].message.content or "").strip()
+    except Exception as e:
+        print(f"[GPT page OCR Error] {e}")
+        return ""
+
+def ocr_missing_pages(pdf_bytes: bytes, pages: List[str]) -> Optional[List[str]]:
+    """
+    Fill the empty entries of ``pages`` (pages with no text layer) with OCR
+    text. Only those pages are rendered and sent, in parallel; the result
+    keeps page order. Returns None when the pages cannot be rendered or OCR
+    finds no text on any of them.
+    """
+    missing = [i for i, text in enumerate(pages) if not text.strip()]
+    if not missing:
+        return pages
+    images = _render_pages(pdf_bytes, missing)
+    if images is None:
+        return None
+
+    sent = sum(len(img) for img in images)
+    print(f"🖼️ OCR {len(missing)}/{len(pages)} pages without a text layer "
+          f"({sent // 1024} KB of page images vs {len(pdf_bytes) // 1024} KB PDF)")
+    ocr = lambda img: cached_text("ocr_page", img, _gpt_vision_page)
+    with ThreadPoolExecutor(max_workers=max(1, min(OCR_WORKERS, len(images)))) as pool:
+        texts = list(pool.map(ocr, images))
+    if not any(t.strip() for t in texts):
+        print("⚠️ Page OCR returned no text")
+        return None
+
+    merged = list(pages)
+    for i, text in zip(missing, texts):
+        merged[i] = text
+    return merged
+
+def extract_text_from_pdf(pdf_bytes: bytes, timeout: Optional[float] = None) -> str:
+    try:
+        text = cached_text("pdf", pdf_bytes, lambda b: basic_pdf_text(b, timeout))
+    except PdfExtractionTimeout as e:
+        print(f"⏱️ {e}; skipping document")
+        return ""
+
+    # pdf text keeps an empty slot per page with no text layer; OCR just those
+    pages = text.split("\f")
+    page_ocr = None
+    if PDF_PAGE_OCR and any(not p.strip() for p in pages):
+        page_ocr = ocr_missing_pages(pdf_bytes, pages)
+        if page_ocr is not None:
+            text = "\f".join(p for p in page_ocr if p)
+    if page_ocr is None:
+        text = "\f".join(p for p in pages if p)
+        if len(text) < 100:
+            print("⚠️ PDF appears to be scanned. Falling back to GPT OCR...")
+            text = cached_text("ocr", pdf_bytes, _gpt_vision_extract)
     return text
+
+def extract_texts_from_pdfs(docs: List[bytes], timeout: Optional[float] = None) -> List[str]:
+    """Extract several PDFs in parallel; results keep the order of ``docs``."""
+    if len(docs) <= 1:
+        return [extract_text_from_pdf(d, timeout) for d in docs]
+    with ThreadPoolExecutor(max_workers=max(1, min(PDF_WORKERS, len(docs)))) as pool:
+        return list(pool.map(lambda d: extract_text_from_pdf(d, timeout), docs))
@@ -0,0 +1,257 @@
+# app/parsers/template_parser.py
+"""
+Deterministic, template-driven report parser.
+
+Properties send the same layout every day, so most reports can be parsed
+with per-property regex templates instead of an LLM call. Templates live
+in report_templates.json (REPORT_TEMPLATES_PATH); a built-in generic
+template handles "Label: value" layouts with lower confidence.
+
+Every field gets a confidence in [0, 1]; ``parse`` returns the usual
+report dict plus a ``_confidence`` entry so callers can decide whether
+to fall back to the LLM. ``report_date`` is read with the template's
+``date_format`` (US month-first unless the template says otherwise) and
+returned as ISO YYYY-MM-DD, so the store never has to guess the order.
+"""
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from .base_parser import BaseParser
+
+REPORT_TEMPLATES_PATH = os.getenv("REPORT_TEMPLATES_PATH", "report_templates.json")
+
+SCALAR_FIELDS = [
+    "property_name", "report_date", "department", "auditor",
+    "revenue", "adr", "occupancy", "vacant_clean", "vacant_dirty", "out_of_order_rooms_storage",
+]
+TABLE_FIELDS = ["vacant_dirty_rooms", "out_of_order_rooms", "comp_rooms", "incidents"]
+
+FLOAT_FIELDS = {"revenue", "adr"}
+INT_FIELDS = {"occupancy", "vacant_clean", "vacant_dirty", "out_of_order_rooms_storage"}
+
+_NUM = r"\$?\s*(-?[\d,]+(?:\.\d+)?)\s*%?"
+_DATE_RX = re.compile(r"^(\d{1,2}[./-]\d{1,2}[./-]\d{2,4}|\d{4}-\d{2}-\d{2})$")
+_DATE_SEP_RX = re.compile(r"[./-]")
+DEFAULT_DATE_FORMAT = "%m/%d/%Y"
+_NONE_RX = re.compile(r"^(none|n/?a|nil|-+)\.?$", re.IGNORECASE)
+_FOOTER_RX = re.compile(r"^(page\s+\d+(\s+of\s+\d+)?|printed\s+(on|at)\b.*)$", re.IGNORECASE)
+
+ROOM_ROW = (
+    r"^(?P<room_number>\d{2,4}[A-Za-z]?)\s+(?P<reason>.+?)\s+(?P<days>\d{1,3})\s*(?:days?)?"
+    r"(?:\s+(?P<action>.+))?$"
+)
+COMP_ROW = r"^(?P<room_number>\d{2,4}[A-Za-z]?)(?:\s+(?P<notes>.+))?$"
+INCIDENT_ROW = r"^(?P<description>.{3,})$"
+
+
+@dataclass
+class TableSpec:
+    start: re.Pattern
+    row: re.Pattern
+
+
+@dataclass
+class LayoutTemplate:
+    name: str
+    match: Optional[re.Pattern]
+    fields: Dict[str, List[re.Pattern]]
+    tables: Dict[str, TableSpec]
+    required: List[str]
+    property_name: Optional[str] = None
+    base_confidence: float = 1.0
+    date_format: str = DEFAULT_DATE_FORMAT  # strptime format, written with "/" separators
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+def _rx(pattern: str, flags: int = re.IGNORECASE | re.MULTILINE) -> re.Pattern:
+    return re.compile(pattern, flags)
+
+
+def _label(label: str, value: str = _NUM) -> re.Pattern:
+    # "Label: value", "Label value" or "Label\nvalue"
+    return _rx(rf"^\s*{label}\s*[:\-]?\s*{value}")
+
+
+GENERIC_TEMPLATE = LayoutTemplate(
+    name="generic",
+    match=None,
+    fields={
+        "report_date": [_rx(r"\b(?:report\s+)?date\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4}|\d{4}-\d{2}-\d{2})")],
+        "department": [_label(r"department", r"([^\r\n]+)")],
+        "auditor": [_label(r"(?:night\s+)?auditor", r"([^\r\n]+)")],
+        "revenue": [_label(r"(?:total\s+)?(?:room\s+)?revenue")],
+        "adr": [_label(r"adr")],
+        "occupancy": [_label(r"occupancy(?:\s*%)?")],
+        "vacant_clean": [_label(r"vacant\s*[/&-]?\s*clean")],
+        "vacant_dirty": [_label(r"vacant\s*[/&-]?\s*dirty")],
+        "out_of_order_rooms_storage": [_label(r"out\s*of\s*order\s*(?:/|&|and)?\s*storage(?:\s+rooms)?")],
+    },
+    tables={
+        "vacant_dirty_rooms": TableSpec(_rx(r"^\s*vacant\s*[/&-]?\s*dirty\s+rooms\s*:?\s*$"), _rx(ROOM_ROW)),
+        "out_of_order_rooms": TableSpec(_rx(r"^\s*out\s*of\s*order\s+rooms\s*:?\s*$"), _rx(ROOM_ROW)),
+        "comp_rooms": TableSpec(_rx(r"^\s*comp(?:limentary)?\s+rooms\s*:?\s*$"), _rx(COMP_ROW)),
+        "incidents": TableSpec(_rx(r"^\s*incidents?\s*:?\s*$"), _rx(INCIDENT_ROW)),
+    },
+    required=[f for f in SCALAR_FIELDS if f not in ("department", "auditor")],
+    # a generic match is never as trustworthy as a property's own template
+    base_confidence=0.8,
+)
+
+
+def _template_from_dict(d: Dict[str, Any]) -> LayoutTemplate:
+    fields = dict(GENERIC_TEMPLATE.fields)
+    for name, patterns in (d.get("fields") or {}).items():
+        fields[name] = [_rx(p) for p in ([patterns] if isinstance(patterns, str) else patterns)]
+    tables = dict(GENERIC_TEMPLATE.tables)
+    for name, spec in (d.get("tables") or {}).items():
+        default = GENERIC_TEMPLATE.tables.get(name)
+        tables[name] = TableSpec(
+            _rx(spec["start"]) if spec.get("start") else default.start,
+            _rx(spec["row"]) if spec.get("row") else default.row,
+        )
+    return LayoutTemplate(
+        name=d["name"],
+        match=_rx(d["match"]),
+        fields=fields,
+        tables=tables,
+        required=d.get("required") or GENERIC_TEMPLATE.required,
+        property_name=d.get("property_name"),
+        base_confidence=float(d.get("base_confidence", 1.0)),
+        date_format=d.get("date_format") or DEFAULT_DATE_FORMAT,
+    )
+
+
+@lru_cache(maxsize=1)
+def load_templates() -> Tuple[LayoutTemplate, ...]:
+    if not os.path.exists(REPORT_TEMPLATES_PATH):
+        return ()
+    with open(REPORT_TEMPLATES_PATH, "r") as f:
+        data = json.load(f)
+    return tuple(_template_from_dict(t) for t in data.get("templates", []))
+
+
+def _iso_date(raw: str, date_format: str) -> Optional[str]:
+    """``raw`` in the template's day/month order (any of . / - separators, 2- or 4-digit year) as YYYY-MM-DD."""
+    if re.match(r"^\d{4}-\d{2}-\d{2}$", raw):
+        fmts = ["%Y-%m-%d"]
+    else:
+        raw = _DATE_SEP_RX.sub("/", raw)
+        fmts = [date_format, date_format.replace("%Y", "%y") if "%Y" in date_format else date_format.replace("%y", "%Y")]
+    for fmt in fmts:
+        try:
+            return datetime.strptime(raw, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _clean_number(raw: str, as_int: bool):
+    try:
+        v = float(raw.replace(",", "").replace("$", "").strip())
+    except (TypeError, ValueError):
+        return None
+    return int(round(v)) if as_int else v
+
+
+class TemplateReportParser(BaseParser):
+    def __init__(self, templates: Optional[List[LayoutTemplate]] = None):
+        self.templates = list(templates) if templates is not None else list(load_templates())
+
+    def select_template(self, text: str) -> LayoutTemplate:
+        head = "\n".join(text.splitlines()[:15])
+        for t in self.templates:
+            if t.match is not None and t.match.search(head):
+                return t
+        return GENERIC_TEMPLATE
+
+    def parse(self, text: str, metadata: dict | None = None) -> dict:
+        template = self.select_template(text or "")
+        lines = [ln.strip() for ln in (text or "").splitlines()]
+        result: Dict[str, Any] = {}
+        conf: Dict[str, float] = {}
+
+        for name in SCALAR_FIELDS:
+            value, c = self._scalar(template, name, text or "", lines)
+            result[name] = value
+            conf[name] = c
+
+        section_starts = [spec.start for spec in template.tables.values()]
+        for name in TABLE_FIELDS:
+            spec = template.tables.get(name)
+            rows, c = self._table(spec, lines, section_starts, template) if spec else ([], None)
+            result[name] = rows
+            if c is not None:
+                conf[name] = c
+
+        scored = [conf.get(f, 0.0) for f in template.required] + \
+                 [conf[f] for f in TABLE_FIELDS if f in conf]
+        overall = (sum(scored) / len(scored)) if scored else 0.0
+        result["_confidence"] = {
+            "template": template.name,
+            "overall": round(overall * template.base_confidence, 3),
+            "fields": {k: round(v, 3) for k, v in conf.items()},
+        }
+        return result
+
+    def _scalar(self, template: LayoutTemplate, name: str, text: str, lines: List[str]):
+        if name == "property_name":
+            if template.property_name:
+                return template.property_name, 1.0
+            for ln in lines[:5]:
+                low = ln.lower()
+                if "inn" in low or "hotel" in low or "motel" in low:
+                    return ln, 0.6
+            return None, 0.0
+
+        for rx in template.fields.get(name, []):
+            m = rx.search(text)
+            if not m:
+                continue
+            raw = (m.group(1) or "").strip()
+            if name in FLOAT_FIELDS or name in INT_FIELDS:
+                value = _clean_number(raw, as_int=name in INT_FIELDS)
+                if value is not None:
+                    return value, 1.0
+            elif name == "report_date":
+                value = _iso_date(raw, template.date_format) if _DATE_RX.match(raw) else None
+                if value is not None:
+                    return value, 1.0
+            elif raw:
+                return raw, 1.0
+        return None, 0.0
+
+    def _table(self, spec: TableSpec, lines: List[str], section_starts: List[re.Pattern], template: LayoutTemplate):
+        try:
+            start = next(i for i, ln in enumerate(lines) if spec.start.match(ln))
+        except StopIteration:
+            return [], None  # section absent: nothing to score
+
+        rows: List[Dict[str, Any]] = []
+        unparsed = 0
+        for ln in lines[start + 1:]:
+            if not ln:
+                if rows or unparsed:
+                    break
+                continue
+            if any(rx.match(ln) for rx in section_starts):
+                break
+            if any(rx.search(ln) for rxs in template.fields.values() for rx in rxs):
+                break
+            if _NONE_RX.match(ln) or _FOOTER_RX.match(ln) or re.match(r"^room\b", ln, re.IGNORECASE):
+                continue  # "None" placeholder, page footer or column header
+            m = spec.row.match(ln)
+            if not m:
+                unparsed += 1
+                continue
+            row = {k: (v.strip() if isinstance(v, str) else v) for k, v in m.groupdict().items()}
+            if "days" in row:
+                row["days"] = int(row["days"] or 0)
+            rows.append(row)
+
+        total = len(rows) + unparsed
+        return rows, (len(rows) / total if total else 1.0)
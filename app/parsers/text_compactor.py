@@ -0,0 +1,181 @@
+# app/parsers/text_compactor.py
+"""
+Shrinks extracted report text before it is sent to the LLM.
+
+Extracted PDFs are full of tokens the parser never needs: whitespace runs,
+table ruling characters, and the same page header and footer repeated on
+every page. ``compact_report_text``:
+
+  1. normalizes whitespace and strips control characters,
+  2. collapses table borders (``|----+----|``, box drawing, ``____``, dot leaders),
+  3. drops page-number lines and headers/footers repeated across pages
+     (pages are separated by form feeds in pdf_text output). The first copy
+     of a header is kept since it usually carries the property name and
+     date; pages are joined without a break so tables can continue,
+  4. caps the result at a token budget. Lines the schema needs (the
+     header, "Label: value" lines, section headings and their rows) are
+     kept first, and other lines are dropped from the end.
+"""
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from .template_parser import GENERIC_TEMPLATE
+
+TEXT_COMPACTION = os.getenv("TEXT_COMPACTION", "1").lower() in ("1", "true", "yes")
+LLM_INPUT_TOKEN_BUDGET = int(os.getenv("LLM_INPUT_TOKEN_BUDGET", "6000"))
+CHARS_PER_TOKEN = 4  # same rough estimate the rate limiter uses
+# Bump when compaction output changes; it is part of the parse-cache key
+COMPACTOR_VERSION = "compact-1"
+
+HEADER_LINES = 3  # lines at the top/bottom of a page that may be a header/footer
+HEAD_KEEP = 8  # leading lines always kept (property name, date, department)
+
+_CONTROL_RX = re.compile(r"[\x00-\x08\x0b\x0e-\x1f\x7f\u200b\ufeff]")
+_SPACES_RX = re.compile(r"[ \t\u00a0\u2000-\u200a\u3000]+")
+_RULE_ONLY_RX = re.compile(r"^[\s|+\-=_:.~*#\u2500-\u257f]+$")
+_BOX_RX = re.compile(r"[\u2500-\u257f]+")
+_PIPES_RX = re.compile(r"\s*(?:\|\s*)+")
+_RULE_RUN_RX = re.compile(r"(?:[-=_~*]{3,}|\.{4,})")
+_PAGE_RX = re.compile(r"^(?:page\s*\d+(?:\s*(?:of|/)\s*\d+)?|-\s*\d+\s*-|printed\s+(?:on|at)\b.*)$", re.IGNORECASE)
+# a bare "3/12" is only a page number on a page's first or last line; elsewhere it is content ("45/60")
+_PAGE_FRACTION_RX = re.compile(r"^\d+\s*/\s*\d+$")
+_PAGE_NO_RX = re.compile(r"\bpage\s*\d+(?:\s*(?:of|/)\s*\d+)?", re.IGNORECASE)
+MIN_HEADER_CHARS = 8  # shorter repeats ("None", "N/A") are content, not headers
+
+_LABELS = [rx for patterns in GENERIC_TEMPLATE.fields.values() for rx in patterns]
+_SECTIONS = [spec.start for spec in GENERIC_TEMPLATE.tables.values()]
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _clean_line(line: str) -> str:
+    line = _CONTROL_RX.sub("", line)
+    line = _BOX_RX.sub("|", line)
+    line = _RULE_RUN_RX.sub(" ", line)
+    line = _PIPES_RX.sub(" | ", line)
+    line = _SPACES_RX.sub(" ", line).strip(" |")
+    return line
+
+
+def _pages(text: str) -> List[List[str]]:
+    pages = []
+    for raw_page in text.replace("\r\n", "\n").replace("\r", "\n").split("\f"):
+        lines = []
+        for raw in raw_page.split("\n"):
+            if not raw.strip():
+                if lines and lines[-1]:
+                    lines.append("")  # keep one break per run of blank lines
+                continue
+            if _RULE_ONLY_RX.match(raw):
+                continue  # table border
+            line = _clean_line(raw)
+            if line and not _PAGE_RX.match(line):
+                lines.append(line)
+        while lines and not lines[-1]:
+            lines.pop()
+        if lines and _PAGE_FRACTION_RX.match(lines[-1]):
+            lines.pop()
+        if lines and _PAGE_FRACTION_RX.match(lines[0]):
+            lines.pop(0)
+        pages.append(lines)
+    return [p for p in pages if p]
+
+
+def _drop_repeated_headers(pages: List[List[str]]) -> List[List[str]]:
+    if len(pages) < 2:
+        return pages
+
+    def key(line: str) -> str:
+        # only the page number may differ between copies of a header
+        return _PAGE_NO_RX.sub("", line.lower()).strip()
+
+    def edges(page: List[str]) -> Tuple[List[str], List[str]]:
+        body = [ln for ln in page if len(ln) >= MIN_HEADER_CHARS]
+        return body[:HEADER_LINES], body[-HEADER_LINES:]
+
+    def repeated(counts: Counter) -> set:
+        return {k for k, n in counts.items() if n >= max(2, (len(pages) + 1) // 2)}
+
+    heads = repeated(Counter(k for page in pages for k in {key(ln) for ln in edges(page)[0]}))
+    feet = repeated(Counter(k for page in pages for k in {key(ln) for ln in edges(page)[1]}))
+
+    out = []
+    for n, page in enumerate(pages):
+        top, bottom = edges(page)
+        kept = []
+        for ln in page:
+            k = key(ln)
+            if ln in bottom and k in feet and k not in heads:
+                continue  # footers carry nothing the parser needs, drop every copy
+            if ln in top and k in heads:
+                if n:
+                    continue
+                ln = _SPACES_RX.sub(" ", _PAGE_NO_RX.sub("", ln)).strip()  # keep the first header
+            kept.append(ln)
+        out.append(kept)
+    return out
+
+
+def _priority(lines: List[str]) -> List[int]:
+    """0 = header/labels/section headings, 1 = rows inside a schema section, 2 = anything else."""
+    prio, in_section = [], False
+    for i, ln in enumerate(lines):
+        if any(rx.match(ln) for rx in _SECTIONS):
+            prio.append(0)
+            in_section = True
+        elif i < HEAD_KEEP or any(rx.search(ln) for rx in _LABELS):
+            prio.append(0)
+            in_section = False
+        elif not ln:
+            prio.append(2)
+        else:
+            prio.append(1 if in_section else 2)
+    return prio
+
+
+def _fit_budget(lines: List[str], budget_chars: int) -> List[str]:
+    if sum(len(ln) + 1 for ln in lines) <= budget_chars:
+        return lines
+    keep = [False] * len(lines)
+    used = 0
+    prio = _priority(lines)
+    for level in (0, 1, 2):
+        for i, ln in enumerate(lines):
+            if prio[i] != level or keep[i]:
+                continue
+            cost = len(ln) + 1
+            if used + cost > budget_chars:
+                continue
+            keep[i] = True
+            used += cost
+    return [ln for ln, k in zip(lines, keep) if k]
+
+
+def compact_report_text(text: str, budget_tokens: int | None = None) -> Tuple[str, Dict[str, int]]:
+    """Return (compacted text, {"tokens_before", "tokens_after", "tokens_saved"})."""
+    text = text or ""
+    budget = LLM_INPUT_TOKEN_BUDGET if budget_tokens is None else budget_tokens
+
+    pages = _drop_repeated_headers(_pages(text))
+    lines: List[str] = []
+    for page in pages:
+        # no break at page boundaries: tables often continue on the next page
+        while page and not page[0]:
+            page = page[1:]
+        for ln in page:
+            if ln or (lines and lines[-1]):
+                lines.append(ln)
+        while lines and not lines[-1]:
+            lines.pop()
+    while lines and not lines[-1]:
+        lines.pop()
+    if budget > 0:
+        lines = _fit_budget(lines, budget * CHARS_PER_TOKEN)
+
+    compacted = "\n".join(lines)
+    before, after = estimate_tokens(text), estimate_tokens(compacted)
+    return compacted, {"tokens_before": before, "tokens_after": after, "tokens_saved": before - after}
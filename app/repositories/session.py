@@ -1,7 +1,7 @@
 # app/repositories/session.py
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from app.db.models import Base  # ✅ This must match where your models.py is
 
@@ -11,9 +11,32 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./motel_reports.db")
 
 connect_args = {}
 if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+    connect_args = {"check_same_thread": False, "timeout": 30}
 
 engine = create_engine(DATABASE_URL, pool_pre_ping=True, connect_args=connect_args)
+
+if DATABASE_URL.startswith("sqlite"):
+    # pysqlite begins a transaction lazily, before the first INSERT/UPDATE/
+    # DELETE, so plain reads hold no lock between statements. A SAVEPOINT
+    # issued first would open the transaction itself and its RELEASE commit
+    # it; begin one explicitly then so savepoints nest. Sessions that must
+    # hold the write lock from their first read ask for IMMEDIATE (see
+    # write_transaction) and queue on the busy timeout instead.
+    @event.listens_for(engine, "connect")
+    def _sqlite_connect(dbapi_connection, connection_record):
+        # WAL: a long-running reader (a streamed query) must not block writers
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "begin")
+    def _sqlite_begin(conn):
+        if conn.get_execution_options().get("sqlite_immediate"):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    @event.listens_for(engine, "savepoint")
+    def _sqlite_savepoint(conn, name):
+        if not conn.connection.driver_connection.in_transaction:
+            conn.exec_driver_sql("BEGIN")
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 class DBSessionCtx:
@@ -32,3 +55,7 @@ class DBSessionCtx:
 
 def get_session():
     return DBSessionCtx()
+
+def write_transaction(db):
+    """Start ``db``'s transaction holding the SQLite write lock (no-op on other databases)."""
+    db.connection(execution_options={"sqlite_immediate": True})
@@ -0,0 +1,483 @@
+"""
+Offline backfill through the OpenAI Batch API (half the price of live calls).
+
+Collects report attachments from Gmail (or a local folder with --from-dir),
+extracts their text and tries the template parser. Reports that still need
+the LLM are written as chat-completion requests to a JSONL file and
+submitted as one batch. Once the batch completes, the results are parsed and
+stored exactly like live ingestion: ReportMaster, child rows and the
+attachment ledger. A second batch then embeds the stored reports, and its
+vectors are upserted into Pinecone.
+
+Every batch is recorded in the backfill_batch table together with a
+manifest (custom_id -> what to do with the result), so a crashed or
+interrupted run resumes from its batch ID:
+
+    python -m app.scripts.backfill_reports run --after 2024/10/01 --before 2025/10/01
+    python -m app.scripts.backfill_reports submit --from-dir ./exports/monticello
+    python -m app.scripts.backfill_reports resume batch_abc123
+    python -m app.scripts.backfill_reports status
+
+Reports whose parse request failed are not in the ledger, so the next run
+picks them up again. Failed embeddings can be filled in with
+embed_existing_reports.py.
+
+Point --base-url (or OPENAI_BASE_URL) at app/scripts/stub_batch_api.py to
+exercise the whole flow locally.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from openai import OpenAI
+
+from app.parsers import openai_parser
+from app.repositories.session import get_session
+from app.db.models import BackfillBatch
+from app.services.report_service import (
+    IngestItem,
+    _extract_stage,
+    _find_processed_attachment,
+    _processed_message_ids,
+    _record_message,
+    merge_parsed,
+    STORE_BATCH_SIZE,
+    store_parsed_report,
+    store_parsed_reports,
+    template_parse,
+)
+from app.utils import embedding_cache, parse_cache, usage_recorder
+from app.utils.token_costs import estimate_cost
+from app.vectorstore.store import store_name
+
+EMBED_MODEL = "text-embedding-3-small"
+BATCH_DIR = os.getenv("BACKFILL_BATCH_DIR", os.path.join(os.getcwd(), ".cache", "batches"))
+BATCH_MAX_REQUESTS = int(os.getenv("BACKFILL_BATCH_MAX_REQUESTS", "50000"))  # Batch API limit per file
+BATCH_DISCOUNT = 0.5  # batch calls are billed at half the live price
+UPSERT_CHUNK = 100
+TERMINAL = ("completed", "failed", "expired", "cancelled")
+
+
+def _client(base_url: Optional[str] = None) -> OpenAI:
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=base_url or os.getenv("OPENAI_BASE_URL") or None)
+
+
+# -----------------------------------------------
+# 📥 Collecting documents
+# -----------------------------------------------
+
+def _gmail_documents(after: Optional[str], before: Optional[str], pages: Optional[int], force: bool) -> Iterator[Dict[str, Any]]:
+    from app.utils.gmail_client import iter_all_emails
+
+    q_parts = ["has:attachment"]
+    if after:
+        q_parts.append(f"after:{after}")
+    if before:
+        q_parts.append(f"before:{before}")
+    exclude = None if force else _processed_message_ids
+    for email in iter_all_emails(pages, " ".join(q_parts), exclude=exclude):
+        for att in email.get("attachments") or []:
+            yield {
+                "msg_id": email.get("gmail_message_id"),
+                "subject": email.get("subject") or "",
+                "filename": (att.get("filename") or "").lower(),
+                "data": att.pop("data", None),
+            }
+
+
+def _dir_documents(path: str) -> Iterator[Dict[str, Any]]:
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name), "rb") as f:
+            yield {"msg_id": None, "subject": os.path.splitext(name)[0], "filename": name.lower(), "data": f.read()}
+
+
+def _extracted(docs: Iterator[Dict[str, Any]], force: bool) -> Iterator[IngestItem]:
+    for doc in docs:
+        fn = doc["filename"]
+        if not (fn.endswith(".pdf") or fn.endswith(".docx")) or not doc["data"]:
+            continue
+        sha256 = hashlib.sha256(doc["data"]).hexdigest()
+        if not force and _find_processed_attachment(sha256):
+            print(f"⏩ Already processed (sha256={sha256[:12]}…): {fn}")
+            continue
+        item = _extract_stage(IngestItem(doc["msg_id"], doc["subject"], fn, sha256, data=doc["data"]))
+        if not item.text:
+            print(f"⚠️ Skipping {fn} because no text was extracted")
+            continue
+        yield item
+
+
+# -----------------------------------------------
+# 📦 Batch files
+# -----------------------------------------------
+
+def _submit(client: OpenAI, kind: str, endpoint: str, lines: List[dict], manifest: Dict[str, Any]) -> str:
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    path = os.path.join(BATCH_DIR, f"{kind}-{datetime.utcnow():%Y%m%dT%H%M%S%f}.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+
+    with open(path, "rb") as f:
+        uploaded = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=endpoint,
+        completion_window="24h",
+        metadata={"source": "backfill_reports", "kind": kind},
+    )
+    with get_session() as db:
+        db.add(BackfillBatch(
+            batch_id=batch.id,
+            kind=kind,
+            status=batch.status,
+            input_file_id=uploaded.id,
+            request_count=len(lines),
+            manifest=manifest,
+        ))
+        db.commit()
+    print(f"📤 Submitted {kind} batch {batch.id} ({len(lines)} requests, {path})")
+    return batch.id
+
+
+def _submit_chunked(client: OpenAI, kind: str, endpoint: str, lines: List[dict], manifest: Dict[str, Any]) -> List[str]:
+    ids = []
+    for i in range(0, len(lines), BATCH_MAX_REQUESTS):
+        chunk = lines[i:i + BATCH_MAX_REQUESTS]
+        ids.append(_submit(client, kind, endpoint, chunk, {ln["custom_id"]: manifest[ln["custom_id"]] for ln in chunk}))
+    return ids
+
+
+def _read_jsonl(client: OpenAI, file_id: Optional[str]) -> Iterator[dict]:
+    if not file_id:
+        return
+    for line in client.files.content(file_id).text.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+
+def _record_usage(model: str, operation: str, prompt: int, completion: int):
+    if not prompt and not completion:
+        return
+    usage_recorder.record(model, operation, prompt, completion,
+                          cost_usd=round(estimate_cost(model, prompt, completion) * BATCH_DISCOUNT, 6))
+
+
+# -----------------------------------------------
+# 🧠 Parse batch
+# -----------------------------------------------
+
+def submit_parse_batches(client: OpenAI, items: Iterator[IngestItem], embed: bool = True) -> Dict[str, Any]:
+    """
+    Store what the template parser or the parse cache can answer right away;
+    everything else goes into parse batches. Returns the batch IDs plus the
+    reports stored directly.
+    """
+    lines, manifest, stored = [], {}, []
+    pending_messages = set()
+    direct_messages = set()
+
+    for item in items:
+        ai, confidence = template_parse(item.text)
+        parsed_by = f"template:{confidence['template']}"
+        if ai is None:
+            ai, parsed_by = parse_cache.get(openai_parser.cache_key(item.text)), "llm"
+        if ai is not None:
+            result, payload = store_parsed_report(
+                merge_parsed(item.text, ai, parsed_by, confidence["overall"]),
+                item.subject, item.filename, item.sha256, item.msg_id,
+            )
+            stored.append((result, payload))
+            direct_messages.add(item.msg_id)
+            continue
+
+        custom_id = f"parse-{item.sha256}"
+        if custom_id in manifest:
+            continue  # same attachment twice in this run
+        lines.append({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": openai_parser.request_body(openai_parser.prepare_text(item.text)),
+        })
+        manifest[custom_id] = {
+            "msg_id": item.msg_id,
+            "subject": item.subject,
+            "filename": item.filename,
+            "sha256": item.sha256,
+            "confidence": confidence["overall"],
+            "text": item.text,
+            "embed": embed,
+        }
+        pending_messages.add(item.msg_id)
+
+    # messages with nothing left in a batch are done now
+    for msg_id in direct_messages - pending_messages:
+        _record_message(msg_id)
+
+    batch_ids = _submit_chunked(client, "parse", "/v1/chat/completions", lines, manifest) if lines else []
+    print(f"⚡ Stored without the LLM: {sum(1 for r, _ in stored if r['status'] == 'stored')} | 📦 Batched: {len(lines)}")
+    return {"batch_ids": batch_ids, "stored": stored}
+
+
+def apply_parse_batch(client: OpenAI, row: BackfillBatch, error_file_id: Optional[str] = None) -> Dict[str, Any]:
+    parser = openai_parser.OpenAIReportParser()
+    manifest = row.manifest
+    summary = {"stored": 0, "duplicate": 0, "already_applied": 0, "failed": 0}
+    embeds = []
+    done_messages, failed_messages = set(), set()
+    prompt_tokens = completion_tokens = 0
+    pending, pending_reports = [], []
+
+    def store_pending():
+        # many reports per transaction, one savepoint each
+        if not pending:
+            return
+        for entry, outcome in zip(pending, store_parsed_reports(pending_reports)):
+            if isinstance(outcome, Exception):
+                summary["failed"] += 1
+                failed_messages.add(entry["msg_id"])
+                continue
+            result, payload = outcome
+            summary[result["status"]] += 1
+            done_messages.add(entry["msg_id"])
+            if payload is not None and entry.get("embed", True):
+                embeds.append((result, payload))
+        pending.clear()
+        pending_reports.clear()
+
+    for line in _read_jsonl(client, row.output_file_id):
+        entry = manifest.get(line.get("custom_id"))
+        if entry is None:
+            continue
+        response = line.get("response") or {}
+        body = response.get("body") or {}
+        if response.get("status_code") != 200 or not body.get("choices"):
+            summary["failed"] += 1
+            failed_messages.add(entry["msg_id"])
+            print(f"❌ {line.get('custom_id')}: {line.get('error') or body.get('error')}")
+            continue
+
+        usage = body.get("usage") or {}
+        prompt_tokens += usage.get("prompt_tokens", 0)
+        completion_tokens += usage.get("completion_tokens", 0)
+
+        if _find_processed_attachment(entry["sha256"]):
+            summary["already_applied"] += 1  # resumed after a partial apply
+            done_messages.add(entry["msg_id"])
+            continue
+
+        try:
+            ai = parser.parse_content(body["choices"][0]["message"]["content"])
+        except json.JSONDecodeError as e:
+            print(f"⚠️ JSON decoding failed for {entry['filename']}: {e}")
+            ai = {}
+        if ai:
+            parse_cache.put(openai_parser.cache_key(entry["text"]), openai_parser.MODEL,
+                            openai_parser.PROMPT_VERSION, ai, SimpleNamespace(**usage))
+
+        pending.append(entry)
+        pending_reports.append((
+            merge_parsed(entry["text"], ai or {}, "llm-batch", entry["confidence"]),
+            entry["subject"], entry["filename"], entry["sha256"], entry["msg_id"],
+        ))
+        if len(pending) >= STORE_BATCH_SIZE:
+            store_pending()
+    store_pending()
+
+    for line in _read_jsonl(client, error_file_id):
+        summary["failed"] += 1
+        entry = manifest.get(line.get("custom_id")) or {}
+        failed_messages.add(entry.get("msg_id"))
+
+    for msg_id in done_messages - failed_messages:
+        _record_message(msg_id)
+    _record_usage(openai_parser.MODEL, "chat-batch", prompt_tokens, completion_tokens)
+    summary["embeds"] = embeds
+    return summary
+
+
+# -----------------------------------------------
+# 🔢 Embedding batch
+# -----------------------------------------------
+
+def submit_embed_batches(client: OpenAI, stored: List[tuple]) -> List[str]:
+    lines, manifest = [], {}
+    live = embedding_cache.live_hashes([result["id"] for result, _ in stored], store_name())
+    for result, (_, text, metadata) in stored:
+        hashes = (embedding_cache.content_hash(text, EMBED_MODEL), embedding_cache.metadata_hash(metadata))
+        if live.get(result["id"]) == hashes:
+            continue  # this exact vector is already in the index
+        custom_id = f"embed-report-{result['id']}"
+        lines.append({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/embeddings",
+            "body": {"model": EMBED_MODEL, "input": text},
+        })
+        manifest[custom_id] = {
+            "report_id": result["id"],
+            "metadata": metadata,
+            "content_hash": hashes[0],
+            "metadata_hash": hashes[1],
+        }
+    return _submit_chunked(client, "embed", "/v1/embeddings", lines, manifest) if lines else []
+
+
+def apply_embed_batch(client: OpenAI, row: BackfillBatch, error_file_id: Optional[str] = None, upsert: bool = True) -> Dict[str, Any]:
+    summary = {"vectors": 0, "failed": 0}
+    vectors, prompt_tokens = [], 0
+    cache_entries, live_rows = [], []
+
+    def flush():
+        if vectors and upsert:
+            from app.vectorstore.pinecone_client import store, upsert_vectors
+            upsert_vectors(list(vectors))
+            embedding_cache.mark_live(list(live_rows), store.name)
+        summary["vectors"] += len(vectors)
+        vectors.clear()
+        live_rows.clear()
+
+    for line in _read_jsonl(client, row.output_file_id):
+        entry = row.manifest.get(line.get("custom_id"))
+        response = line.get("response") or {}
+        body = response.get("body") or {}
+        if entry is None or response.get("status_code") != 200 or not body.get("data"):
+            summary["failed"] += 1
+            continue
+        prompt_tokens += (body.get("usage") or {}).get("prompt_tokens", 0)
+        vector_id = f"report-{entry['report_id']}"
+        vectors.append({
+            "id": vector_id,
+            "values": body["data"][0]["embedding"],
+            "metadata": entry["metadata"],
+        })
+        if entry.get("content_hash"):  # manifests written before the embedding cache have no hashes
+            cache_entries.append((entry["content_hash"], EMBED_MODEL, body["data"][0]["embedding"]))
+            live_rows.append((entry["report_id"], vector_id, entry["content_hash"], entry["metadata_hash"]))
+        if len(vectors) >= UPSERT_CHUNK:
+            flush()
+    flush()
+    embedding_cache.put_many(cache_entries)
+    summary["failed"] += sum(1 for _ in _read_jsonl(client, error_file_id))
+
+    _record_usage(EMBED_MODEL, "embedding-batch", prompt_tokens, 0)
+    return summary
+
+
+# -----------------------------------------------
+# 🔁 Polling and resuming
+# -----------------------------------------------
+
+def wait_for_batch(client: OpenAI, batch_id: str, poll: float = 60.0):
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = getattr(batch, "request_counts", None)
+        progress = f" {counts.completed}/{counts.total}" if counts else ""
+        print(f"⏳ Batch {batch_id}: {batch.status}{progress}")
+        with get_session() as db:
+            row = db.get(BackfillBatch, batch_id)
+            if row:
+                row.status = batch.status
+                row.output_file_id = batch.output_file_id
+                db.commit()
+        if batch.status in TERMINAL:
+            return batch
+        time.sleep(poll)
+
+
+def resume(client: OpenAI, batch_id: str, poll: float = 60.0, upsert: bool = True) -> Dict[str, Any]:
+    """Wait for a batch, apply its results once, and chain the embedding batch after a parse batch."""
+    with get_session() as db:
+        row = db.get(BackfillBatch, batch_id)
+        if row is None:
+            raise SystemExit(f"Unknown batch {batch_id}; see `status`")
+        db.expunge(row)
+    if row.applied_at:
+        print(f"✅ Batch {batch_id} already applied: {row.result_summary}")
+        return row.result_summary or {}
+
+    batch = wait_for_batch(client, batch_id, poll)
+    row.output_file_id = batch.output_file_id
+    if batch.status != "completed":
+        # expired/cancelled batches still return the requests that finished
+        print(f"❌ Batch {batch_id} ended as {batch.status}; unfinished reports can be resubmitted with `submit`")
+
+    if row.kind == "parse":
+        summary = apply_parse_batch(client, row, getattr(batch, "error_file_id", None))
+        summary["embed_batches"] = submit_embed_batches(client, summary.pop("embeds"))
+    else:
+        summary = apply_embed_batch(client, row, getattr(batch, "error_file_id", None), upsert=upsert)
+
+    with get_session() as db:
+        stored_row = db.get(BackfillBatch, batch_id)
+        stored_row.status = batch.status
+        stored_row.output_file_id = batch.output_file_id
+        stored_row.result_summary = summary
+        stored_row.applied_at = datetime.utcnow()
+        db.commit()
+    print(f"✅ Applied {row.kind} batch {batch_id}: {summary}")
+    return summary
+
+
+def status():
+    with get_session() as db:
+        rows = db.query(BackfillBatch).order_by(BackfillBatch.created_at.desc()).all()
+        for r in rows:
+            applied = r.applied_at.isoformat(timespec="seconds") if r.applied_at else "not applied"
+            print(f"{r.batch_id}  {r.kind:<5} {r.status or '?':<11} {r.request_count:>6} requests  {applied}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=["run", "submit", "resume", "status"])
+    ap.add_argument("batch_id", nargs="?", help="batch to resume")
+    ap.add_argument("--after", help="Gmail after: date, e.g. 2024/10/01")
+    ap.add_argument("--before", help="Gmail before: date")
+    ap.add_argument("--pages", type=int, default=None, help="max Gmail list pages")
+    ap.add_argument("--from-dir", help="read report files from a folder instead of Gmail")
+    ap.add_argument("--force", action="store_true", help="ignore the processed ledger")
+    ap.add_argument("--no-embed", action="store_true", help="don't submit an embedding batch")
+    ap.add_argument("--no-upsert", action="store_true", help="fetch embeddings but don't write to Pinecone")
+    ap.add_argument("--poll", type=float, default=60.0, help="seconds between status checks")
+    ap.add_argument("--base-url", help="OpenAI API base URL (e.g. a local stand-in)")
+    args = ap.parse_args()
+
+    if args.command == "status":
+        return status()
+
+    client = _client(args.base_url)
+    upsert = not args.no_upsert
+    if args.command == "resume":
+        if not args.batch_id:
+            ap.error("resume needs a batch_id")
+        summary = resume(client, args.batch_id, args.poll, upsert)
+        for embed_id in summary.get("embed_batches") or []:
+            resume(client, embed_id, args.poll, upsert)
+        return
+
+    docs = _dir_documents(args.from_dir) if args.from_dir else \
+        _gmail_documents(args.after, args.before, args.pages, args.force)
+    submitted = submit_parse_batches(client, _extracted(docs, args.force), embed=not args.no_embed)
+    direct = [s for s in submitted["stored"] if s[1] is not None]
+    embed_ids = submit_embed_batches(client, direct) if direct and not args.no_embed else []
+
+    if args.command == "submit":
+        for batch_id in submitted["batch_ids"] + embed_ids:
+            print(f"📝 Resume later with: resume {batch_id}")
+        return
+
+    for batch_id in submitted["batch_ids"]:
+        summary = resume(client, batch_id, args.poll, upsert)
+        embed_ids += summary.get("embed_batches") or []
+    for embed_id in embed_ids:
+        resume(client, embed_id, args.poll, upsert)
+
+
+if __name__ == "__main__":
+    main()
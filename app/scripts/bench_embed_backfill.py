@@ -0,0 +1,120 @@
+"""
+Benchmark the embedding backfill (embed_existing_reports) on a seeded
+database: a first run interrupted part-way, a resumed run that picks up
+from the checkpoint, and an unchanged re-run that should make no API
+calls at all.
+
+Reports are bulk-inserted into DATABASE_URL (a throwaway SQLite file by
+default). The OpenAI and Pinecone clients are the stand-ins from
+bench_embeddings (``--rtt`` ms per request plus ``--per-input`` ms per
+text); the shared rate limiter is real, with --rpm / --tpm budgets.
+
+    python -m app.scripts.bench_embed_backfill --reports 20000 --workers 8
+"""
+import _thread
+import argparse
+import contextlib
+import io
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:////tmp/bench_backfill_{uuid.uuid4().hex[:8]}.db")
+os.environ.setdefault("OPENAI_API_KEY", "unused-by-this-benchmark")
+os.environ.setdefault("VECTOR_STORE", "local")  # replaced by StubIndex below; keeps Pinecone out of it
+os.environ.setdefault("VECTOR_STORE_PATH", f"/tmp/bench_backfill_store_{uuid.uuid4().hex[:8]}")
+
+from sqlalchemy import insert, select
+
+from app.db.init_db import init_db
+from app.db.models import MotelMaster, ReportIncident, ReportMaster, ReportVacantDirtyRoom
+from app.repositories.session import get_session
+from app.scripts import embed_existing_reports
+from app.scripts.bench_embeddings import StubIndex, StubOpenAI
+from app.utils.rate_limiter import RateLimiter
+from app.vectorstore import pinecone_client
+
+
+def seed(n: int, rng: random.Random):
+    with get_session() as db:
+        motel_ids = [
+            db.execute(insert(MotelMaster).values(motel_name=f"Backfill Inn {k}", location=f"Town {k}")
+                       .returning(MotelMaster.id)).scalar()
+            for k in range(20)
+        ]
+        start = date(2020, 1, 1)
+        for lo in range(0, n, 5000):
+            rows = [
+                {"motel_id": motel_ids[i % 20], "property_name": f"Backfill Inn {i % 20}",
+                 "report_date": start + timedelta(days=i // 20), "department": "Front Office",
+                 "auditor": "J. Smith", "revenue": round(rng.uniform(3000, 20000), 2), "adr": 120.0,
+                 "occupancy": rng.randint(40, 100)}
+                for i in range(lo, min(n, lo + 5000))
+            ]
+            ids = db.scalars(insert(ReportMaster).returning(ReportMaster.id), rows).all()
+            db.execute(insert(ReportVacantDirtyRoom), [
+                {"report_id": rid, "room_number": str(100 + k), "reason": "Late checkout", "days": 1, "action": "Clean"}
+                for rid in ids for k in range(3)
+            ])
+            db.execute(insert(ReportIncident), [{"report_id": rid, "description": "Noise complaint"} for rid in ids])
+        db.commit()
+
+
+def run(label: str, args, interrupt_after: float = None) -> dict:
+    pinecone_client.client = openai = StubOpenAI(args.rtt / 1000, args.per_input / 1000)
+    pinecone_client.store = index = StubIndex(args.rtt / 1000)
+    pinecone_client.limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm)
+    timer = threading.Timer(interrupt_after, _thread.interrupt_main) if interrupt_after else None
+    if timer:
+        timer.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        totals = embed_existing_reports.embed_all_reports(batch_size=args.batch_size, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    if timer:
+        timer.cancel()
+    print(f"{label:>10} {elapsed:>7.1f}s {totals['checked']:>8} {totals.get('embedded', 0):>9} "
+          f"{totals.get('unchanged', 0):>10} {openai.requests:>9} {index.requests:>8} {totals['checkpoint']:>11} "
+          f"{'yes' if totals['complete'] else 'no':>9}")
+    return totals
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reports", type=int, default=20000)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--batch-size", type=int, default=100)
+    ap.add_argument("--rtt", type=float, default=300, help="simulated ms per OpenAI/Pinecone request")
+    ap.add_argument("--per-input", type=float, default=2, help="simulated ms per embedded text")
+    ap.add_argument("--rpm", type=int, default=pinecone_client.EMBED_RPM)
+    ap.add_argument("--tpm", type=int, default=pinecone_client.EMBED_TPM)
+    ap.add_argument("--interrupt", type=float, default=3.0, help="seconds into the first run to press Ctrl-C")
+    args = ap.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db()
+    t = time.perf_counter()
+    seed(args.reports, random.Random(9))
+    with get_session() as db:
+        sample = db.scalars(select(ReportMaster).limit(1)).first()
+        chars = len(embed_existing_reports._embedding_payload(
+            embed_existing_reports.MotelRef(sample.motel_id, sample.property_name, "Town"), sample)[1])
+    print(f"seeded {args.reports} reports in {time.perf_counter() - t:.1f}s (~{chars // 4} tokens each); "
+          f"{args.workers} workers × batches of {args.batch_size}; {args.rtt:g} ms per request; "
+          f"limits {args.rpm} RPM / {args.tpm} TPM")
+    print(f"{'run':>10} {'wall':>8} {'checked':>8} {'embedded':>9} {'unchanged':>10} {'embed req':>9} "
+          f"{'upserts':>8} {'checkpoint':>11} {'complete':>9}")
+    first = run("first", args, interrupt_after=args.interrupt)
+    second = run("resumed", args)
+    run("re-run", args)
+
+    rate = (first["checked"] + second["checked"]) / (first["seconds"] + second["seconds"])
+    print(f"throughput {rate:.0f} reports/s → 50k reports in ~{50000 / rate / 60:.1f} min at these limits "
+          f"(the previous script slept {50000 * 1.1 / 3600:.0f} h for 50k reports before any API time)")
+
+
+if __name__ == "__main__":
+    main()
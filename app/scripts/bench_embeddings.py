@@ -0,0 +1,133 @@
+"""
+Compare the previous embedding path (one embeddings request, one Pinecone
+upsert, one usage row and a 2 s sleep per report) with
+``upsert_report_embeddings`` (many inputs per request, chunked upserts, one
+usage row per request, optional read-after-write check), then run it
+again unchanged (nothing to do) and with new metadata only (vectors come
+from the embedding cache, nothing is embedded).
+
+The OpenAI and Pinecone clients are replaced by stand-ins that sleep
+``--rtt`` ms per request plus ``--per-input`` ms per embedded text, so
+timings are simulated; usage rows go to DATABASE_URL (a throwaway SQLite
+file by default).
+
+    python -m app.scripts.bench_embeddings --reports 100 --rtt 150
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+import uuid
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:////tmp/bench_embed_{uuid.uuid4().hex[:8]}.db")
+os.environ.setdefault("OPENAI_API_KEY", "unused-by-this-benchmark")
+os.environ.setdefault("VECTOR_STORE", "local")  # replaced by StubIndex below; keeps Pinecone out of it
+os.environ.setdefault("VECTOR_STORE_PATH", f"/tmp/bench_embed_store_{uuid.uuid4().hex[:8]}")
+
+from sqlalchemy import func, select
+
+from app.db.models import Base, TokenUsage
+from app.repositories.session import engine, get_session
+from app.utils import usage_recorder
+from app.vectorstore.store import VectorStore
+from app.vectorstore import pinecone_client
+
+
+class StubOpenAI:
+    def __init__(self, rtt: float, per_input: float):
+        self.rtt, self.per_input, self.requests = rtt, per_input, 0
+        self.embeddings = SimpleNamespace(create=self._create)
+
+    def _create(self, model, input):
+        inputs = [input] if isinstance(input, str) else input
+        self.requests += 1
+        time.sleep(self.rtt + self.per_input * len(inputs))
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=[0.001 * len(t)] * 1536) for i, t in enumerate(inputs)],
+            usage=SimpleNamespace(prompt_tokens=sum(len(t) // 4 for t in inputs)),
+        )
+
+
+class StubIndex(VectorStore):
+    name = "bench-stub"
+
+    def __init__(self, rtt: float):
+        self.rtt, self.requests, self.upserted, self.vectors = rtt, 0, 0, {}
+
+    def upsert(self, vectors):
+        self.requests += 1
+        self.upserted += len(vectors)
+        time.sleep(self.rtt)
+        self.vectors.update({v["id"]: v for v in vectors})
+
+    def fetch(self, ids):
+        self.requests += 1
+        time.sleep(self.rtt)
+        return {i: self.vectors[i] for i in ids if i in self.vectors}
+
+    def query(self, vector, top_k=5, filter=None, include_metadata=True):
+        return []  # not benchmarked
+
+    def delete(self, ids):
+        for i in ids:
+            self.vectors.pop(i, None)
+
+
+def _items(n: int, rng: random.Random) -> list:
+    items = []
+    for i in range(n):
+        text = f"Motel: Bench Inn\nReport Date: 2025-10-{i % 28 + 1:02d}\nRevenue: {rng.uniform(3000, 20000):.2f}\n" * 8
+        items.append((i + 1, text, {"motel_name": "Bench Inn", "content": text[:4000]}))
+    return items
+
+
+def _legacy(items, sleep: float):
+    """The previous path: embed, upsert and log each report on its own, then sleep."""
+    for report_id, text, metadata in items:
+        vector = pinecone_client.generate_embedding(text)
+        pinecone_client.store.upsert([{"id": f"report-{report_id}", "values": vector, "metadata": metadata}])
+        time.sleep(sleep)
+
+
+def _usage_rows() -> int:
+    usage_recorder.flush()
+    with get_session() as db:
+        return db.scalar(select(func.count()).select_from(TokenUsage))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reports", type=int, default=100)
+    ap.add_argument("--rtt", type=float, default=150, help="simulated ms per OpenAI/Pinecone request")
+    ap.add_argument("--per-input", type=float, default=2, help="simulated ms per embedded text")
+    ap.add_argument("--legacy-sleep", type=float, default=2.0, help="the old fixed sleep after each upsert")
+    args = ap.parse_args()
+    Base.metadata.create_all(bind=engine)
+    items = _items(args.reports, random.Random(7))
+
+    print(f"{args.reports} reports; {args.rtt:g} ms per request, {args.per_input:g} ms per input; "
+          f"batch {pinecone_client.EMBED_BATCH_SIZE} inputs, upsert chunk {pinecone_client.PINECONE_UPSERT_CHUNK}")
+    print(f"{'path':>14} {'wall':>8} {'embed reqs':>11} {'upsert reqs':>12} {'usage rows':>11} {'upserted':>9}")
+    relabeled = [(report_id, text, {**metadata, "department": "Housekeeping"}) for report_id, text, metadata in items]
+    runs = [("legacy", lambda: _legacy(items, args.legacy_sleep)),
+            ("batched", lambda: pinecone_client.upsert_report_embeddings(items, verify=False, force=True)),
+            ("batched+verify", lambda: pinecone_client.upsert_report_embeddings(items, verify=True, force=True)),
+            ("rerun", lambda: pinecone_client.upsert_report_embeddings(items)),
+            ("new metadata", lambda: pinecone_client.upsert_report_embeddings(relabeled))]
+    for name, fn in runs:
+        pinecone_client.client = openai = StubOpenAI(args.rtt / 1000, args.per_input / 1000)
+        pinecone_client.store = index = StubIndex(args.rtt / 1000)
+        rows = _usage_rows()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>14} {elapsed:>7.2f}s {openai.requests:>11} {index.requests:>12} "
+              f"{_usage_rows() - rows:>11} {index.upserted:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark sequential vs pooled Gmail fetching against a stubbed service.
+
+Every stubbed ``execute()`` sleeps for ``--latency`` seconds to stand in for
+an HTTPS round trip, so the numbers show how much of the wall time the
+worker pool hides.
+
+    python -m app.scripts.bench_gmail_fetch --sizes 50 500 5000 --latency 0.005
+"""
+import argparse
+import base64
+import time
+
+from app.utils import gmail_client
+from app.utils.gmail_client import _fetch_messages, _list_message_ids
+
+SENDER = "Front Desk <niha25111@gmail.com>"  # must be in whitelist.json
+
+
+def _pdf_stub(size: int) -> str:
+    return base64.urlsafe_b64encode(b"%PDF-1.4 " + b"0" * max(0, size - 9)).decode("utf-8")
+
+
+class _Call:
+    def __init__(self, result, latency: float):
+        self._result = result
+        self._latency = latency
+
+    def execute(self):
+        time.sleep(self._latency)
+        return self._result
+
+
+class _StubAttachments:
+    def __init__(self, latency: float, data: str):
+        self.latency = latency
+        self.data = data
+
+    def get(self, userId, messageId, id):
+        return _Call({"data": self.data}, self.latency)
+
+
+class _StubMessages:
+    def __init__(self, count: int, latency: float, attachment_bytes: int):
+        self.count = count
+        self.latency = latency
+        self.attachment_data = _pdf_stub(attachment_bytes)
+
+    def list(self, userId, q, pageToken=None, maxResults=100):
+        start = int(pageToken or 0)
+        end = min(start + maxResults, self.count)
+        resp = {"messages": [{"id": f"m{i}"} for i in range(start, end)]}
+        if end < self.count:
+            resp["nextPageToken"] = str(end)
+        return _Call(resp, self.latency)
+
+    def get(self, userId, id, format="full"):
+        return _Call({
+            "id": id,
+            "threadId": id,
+            "internalDate": "0",
+            "snippet": "",
+            "payload": {
+                "headers": [
+                    {"name": "Subject", "value": f"Daily Report {id}"},
+                    {"name": "From", "value": SENDER},
+                ],
+                "parts": [
+                    {"filename": f"{id}-audit.pdf", "mimeType": "application/pdf", "body": {"attachmentId": "a1"}},
+                    {"filename": f"{id}-hk.pdf", "mimeType": "application/pdf", "body": {"attachmentId": "a2"}},
+                ],
+            },
+        }, self.latency)
+
+    def attachments(self):
+        return _StubAttachments(self.latency, self.attachment_data)
+
+
+class StubGmailService:
+    def __init__(self, count: int, latency: float, attachment_bytes: int = 16):
+        self._messages = _StubMessages(count, latency, attachment_bytes)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self._messages
+
+
+def run(count: int, latency: float, concurrency: int, attach_concurrency: int) -> float:
+    gmail_client.ATTACH_CONCURRENCY = attach_concurrency
+    service = StubGmailService(count, latency)
+    ids = _list_message_ids(service, query=None, max_pages=None)
+    start = time.perf_counter()
+    emails = _fetch_messages(lambda: service, ids, concurrency)
+    elapsed = time.perf_counter() - start
+    assert [e["gmail_message_id"] for e in emails] == [m["id"] for m in ids], "order not preserved"
+    return elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    ap.add_argument("--latency", type=float, default=0.005, help="seconds per stubbed round trip")
+    ap.add_argument("--concurrency", type=int, default=gmail_client.FETCH_CONCURRENCY)
+    args = ap.parse_args()
+
+    # the per-message debug prints would swamp the timings
+    gmail_client.print = lambda *a, **k: None
+    attach_concurrency = gmail_client.ATTACH_CONCURRENCY
+
+    print(f"{'messages':>9} {'sequential':>12} {'pooled':>10} {'speedup':>8}")
+    for n in args.sizes:
+        seq = run(n, args.latency, 1, 1)
+        pooled = run(n, args.latency, args.concurrency, attach_concurrency)
+        print(f"{n:>9} {seq:>11.2f}s {pooled:>9.2f}s {seq / pooled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
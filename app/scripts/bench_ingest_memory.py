@@ -0,0 +1,66 @@
+"""
+Peak-memory check for the streaming Gmail fetch API.
+
+Streams a synthetic mailbox through ``_iter_messages`` the way
+``ingest_reports_from_gmail`` consumes it (take each attachment buffer,
+hash it, drop it) and measures the peak with ``tracemalloc``. Peak memory
+must not depend on the number of messages.
+
+    python -m app.scripts.bench_ingest_memory --messages 1000 --attachment-kb 256
+"""
+import argparse
+import hashlib
+import tracemalloc
+
+from app.scripts.bench_gmail_fetch import StubGmailService
+from app.utils import gmail_client
+from app.utils.gmail_client import _iter_messages, _list_message_ids
+
+
+def peak_bytes(count: int, attachment_bytes: int, concurrency: int) -> int:
+    service = StubGmailService(count, latency=0.0, attachment_bytes=attachment_bytes)
+    ids = _list_message_ids(service, query=None, max_pages=None)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    seen = 0
+    for email in _iter_messages(lambda: service, ids, concurrency):
+        for att in email["attachments"]:
+            data = att.pop("data", None)
+            hashlib.sha256(data).hexdigest()
+            data = None
+        seen += 1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert seen == count, f"expected {count} messages, got {seen}"
+    return peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=1000)
+    ap.add_argument("--attachment-kb", type=int, default=256)
+    ap.add_argument("--concurrency", type=int, default=gmail_client.FETCH_CONCURRENCY)
+    args = ap.parse_args()
+
+    gmail_client.print = lambda *a, **k: None
+    size = args.attachment_kb * 1024
+    per_message = 2 * size  # the stub sends two attachments per message
+
+    small = peak_bytes(max(1, args.messages // 10), size, args.concurrency)
+    large = peak_bytes(args.messages, size, args.concurrency)
+    buffered = args.messages * per_message
+
+    print(f"messages={args.messages // 10:<6} peak={small / 1e6:8.1f} MB")
+    print(f"messages={args.messages:<6} peak={large / 1e6:8.1f} MB  (a full list would hold ≥ {buffered / 1e6:.0f} MB)")
+
+    # in flight: 2 * workers messages, plus one attachment pool per worker
+    budget = (2 * args.concurrency + 2) * per_message * 2
+    assert large <= budget, f"peak {large} exceeds bounded-window budget {budget}"
+    assert large <= small * 1.5 + per_message, "peak memory grows with mailbox size"
+    print("✅ peak memory is independent of mailbox size")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark concurrent LLM parsing against a simulated rate-limited endpoint.
+
+A stand-in for ``AsyncOpenAI`` answers after ``--latency`` seconds and
+enforces RPM/TPM as continuously refilling budgets, replying 429 (with
+Retry-After) when a call would exceed them. Three runs:
+
+  sequential   one call at a time, the old behaviour (only with --sequential;
+               otherwise estimated as docs × latency)
+  unlimited    LLM_MAX_CONCURRENCY calls, no client-side limiter
+  limited      LLM_MAX_CONCURRENCY calls behind the token-bucket limiter
+
+    python -m app.scripts.bench_llm_parse --docs 60 --latency 2 --tpm 60000
+"""
+import argparse
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "unused-by-this-benchmark")
+
+import httpx
+from openai import RateLimitError
+
+from app.parsers import openai_parser
+from app.utils import parse_cache
+from app.utils.rate_limiter import RateLimiter
+
+parse_cache.PARSE_CACHE_ENABLED = False  # measure LLM calls, not cache hits
+
+
+class StubServer:
+    def __init__(self, rpm: int, tpm: int, latency: float):
+        self.rpm, self.tpm, self.latency = rpm, tpm, latency
+        self.requests, self.tokens = float(rpm), float(tpm)
+        self.updated = time.monotonic()
+        self.calls = 0
+        self.rejected = 0
+
+    def admit(self, tokens: int) -> bool:
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+        if self.requests < 1 or self.tokens < tokens:
+            return False
+        self.requests -= 1
+        self.tokens -= tokens
+        return True
+
+
+class StubAsyncOpenAI:
+    server: StubServer = None
+
+    def __init__(self, **_):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, **_):
+        server = self.server
+        server.calls += 1
+        tokens = sum(len(m["content"]) for m in messages) // 4 + 300
+        if not server.admit(tokens):
+            server.rejected += 1
+            request = httpx.Request("POST", "https://api.openai.invalid/v1/chat/completions")
+            response = httpx.Response(429, request=request, headers={"retry-after": "1"})
+            raise RateLimitError("Rate limit reached", response=response, body=None)
+        await asyncio.sleep(server.latency)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content='{"property_name": "Stub Inn"}'))],
+            usage=SimpleNamespace(prompt_tokens=tokens - 300, completion_tokens=300, total_tokens=tokens),
+        )
+
+
+def _report(i: int) -> str:
+    lines = [f"Monticello Inn, Framingham  DAILY REPORT 10/{i % 28 + 1:02d}/2025"]
+    lines += [f"Room {100 + n} vacant dirty, late checkout, {n % 3 + 1} days" for n in range(120)]
+    return "\n".join(lines)
+
+
+def run(name: str, texts, args, concurrency: int, limited: bool):
+    StubAsyncOpenAI.server = server = StubServer(args.rpm, args.tpm, args.latency)
+    openai_parser.AsyncOpenAI = StubAsyncOpenAI
+    openai_parser.LLM_MAX_CONCURRENCY = concurrency
+    # keep the client-side budget a little under the server's
+    openai_parser.limiter = RateLimiter(rpm=args.rpm * 0.95, tpm=args.tpm * 0.95) if limited else RateLimiter()
+    for k in openai_parser._stats:
+        openai_parser._stats[k] = 0
+
+    start = time.perf_counter()
+    results = asyncio.run(openai_parser.OpenAIReportParser().aparse_many(texts))
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for r in results if r)
+    print(f"{name:>11} {elapsed:>7.1f}s {ok:>4}/{len(texts):<4} {server.calls:>6} {server.rejected:>5}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=60)
+    ap.add_argument("--latency", type=float, default=2.0, help="simulated seconds per completion")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--rpm", type=int, default=500)
+    ap.add_argument("--tpm", type=int, default=60000)
+    ap.add_argument("--sequential", action="store_true", help="actually run the one-at-a-time baseline")
+    args = ap.parse_args()
+
+    texts = [_report(i) for i in range(args.docs)]
+    est = sum(map(openai_parser.estimate_tokens, texts))
+    print(f"{args.docs} reports, ~{est} estimated tokens; server limits {args.rpm} RPM / {args.tpm} TPM")
+    print(f"{'run':>11} {'wall':>8} {'parsed':>9} {'calls':>6} {'429s':>5}")
+    if args.sequential:
+        run("sequential", texts, args, 1, limited=True)
+    else:
+        print(f"{'sequential':>11} {args.docs * args.latency:>7.1f}s (estimated)")
+    run("unlimited", texts, args, args.concurrency, limited=False)
+    run("limited", texts, args, args.concurrency, limited=True)
+
+
+if __name__ == "__main__":
+    main()
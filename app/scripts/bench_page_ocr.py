@@ -0,0 +1,130 @@
+"""
+Compare page-level OCR (render only the pages without a text layer and OCR
+them in parallel) with the previous whole-document OCR upload.
+
+PDFs are built with a given number of scanned pages (an image, no text
+layer) among text pages. The OpenAI client is replaced by a stand-in that
+counts uploaded bytes and sleeps for ``--page-latency`` seconds per page it
+reads plus the upload time at ``--mbps``, so timings are simulated but page
+rendering and JPEG encoding are real.
+
+    python -m app.scripts.bench_page_ocr --pages 12 --scanned 1 3 6 12
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "unused-by-this-benchmark")
+os.environ["TEXT_CACHE_BACKEND"] = "off"  # measure OCR calls, not cache hits
+
+import pypdfium2 as pdfium
+from PIL import Image, ImageDraw
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from app.parsers import pdf_text
+from app.scripts.bench_pdf_layered import _text_page
+
+
+class StubClient:
+    def __init__(self, page_latency: float, mbps: float):
+        self.page_latency, self.mbps = page_latency, mbps
+        self.uploads = {}
+        self.sent = 0
+        self.calls = 0
+        self.files = SimpleNamespace(create=self._upload, delete=lambda file_id: None)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _transfer(self, nbytes: int):
+        self.sent += nbytes
+        time.sleep(nbytes * 8 / (self.mbps * 1e6))
+
+    def _upload(self, file, purpose):
+        data = file[1].getvalue()
+        self._transfer(len(data))
+        file_id = f"file-{len(self.uploads)}"
+        self.uploads[file_id] = data
+        return SimpleNamespace(id=file_id)
+
+    def _create(self, model, messages, **_):
+        self.calls += 1
+        pages = 0
+        for part in messages[-1]["content"]:
+            if part["type"] == "file":
+                pdf = pdfium.PdfDocument(self.uploads[part["file"]["file_id"]])
+                pages += len(pdf)  # the model reads every page of an uploaded PDF
+                pdf.close()
+            elif part["type"] == "image_url":
+                self._transfer(len(part["image_url"]["url"]))
+                pages += 1
+        time.sleep(pages * self.page_latency)
+        content = "\n".join(f"Scanned line {n} room {100 + n}" for n in range(40 * pages))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _scanned_page(c, rng: random.Random):
+    # a 200 DPI grayscale scan with paper noise, embedded as JPEG like a copier would
+    img = Image.effect_noise((1700, 2200), 12).point(lambda v: 235 + v // 16)
+    draw = ImageDraw.Draw(img)
+    for line in range(40):
+        draw.text((120, 120 + line * 48), f"Scanned line {line} room {100 + line}", fill=rng.randint(0, 40))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    c.drawImage(ImageReader(io.BytesIO(buf.getvalue())), 0, 0, width=612, height=792)
+
+
+def build_pdf(pages: int, scanned: int, rng: random.Random) -> bytes:
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=letter)
+    scanned_at = set(rng.sample(range(pages), scanned))
+    for page in range(pages):
+        if page in scanned_at:
+            _scanned_page(c, rng)
+        else:
+            _text_page(c, 0, page)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def run(mode: str, pdf: bytes, args):
+    pdf_text.client = stub = StubClient(args.page_latency, args.mbps)
+    pdf_text.PDF_PAGE_OCR = mode == "page"
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "page":
+            text = pdf_text.extract_text_from_pdf(pdf)
+        else:
+            # what the old path did once OCR was needed: upload the whole PDF
+            text = pdf_text._gpt_vision_extract(pdf)
+    return time.perf_counter() - start, stub.sent, stub.calls, text.count("Scanned line")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=12)
+    ap.add_argument("--scanned", type=int, nargs="+", default=[1, 3, 6, 12])
+    ap.add_argument("--page-latency", type=float, default=0.5, help="simulated model seconds per page read")
+    ap.add_argument("--mbps", type=float, default=20, help="simulated upload bandwidth")
+    ap.add_argument("--seed", type=int, default=3)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{args.pages}-page PDFs; {args.page_latency}s per page read, {args.mbps:g} Mbit/s upload, "
+          f"{pdf_text.OCR_WORKERS} OCR workers, {pdf_text.OCR_DPI} DPI JPEG q{pdf_text.OCR_JPEG_QUALITY}")
+    print(f"{'scanned':>8} {'mode':>6} {'wall':>7} {'uploaded':>9} {'calls':>6} {'OCR lines':>10}")
+    for scanned in args.scanned:
+        pdf = build_pdf(args.pages, scanned, rng)
+        print(f"{scanned:>8} {'pdf':>6} {'':>7} {len(pdf) / 1024:>7.0f}KB")
+        for mode in ("whole", "page"):
+            elapsed, sent, calls, lines = run(mode, pdf, args)
+            print(f"{scanned:>8} {mode:>6} {elapsed:>6.2f}s {sent / 1024:>7.0f}KB {calls:>6} {lines:>10}")
+
+
+if __name__ == "__main__":
+    main()
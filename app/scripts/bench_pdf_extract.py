@@ -0,0 +1,85 @@
+"""
+Benchmark PDF text extraction at 1, 2 and 4 pool workers.
+
+Builds a synthetic corpus of multi-page daily-report PDFs with reportlab
+(text blocks plus a ruled room table per page) and extracts it with
+``extract_texts_from_pdfs``. Output must be identical at every worker count.
+
+    python -m app.scripts.bench_pdf_extract --docs 6 --pages 16
+"""
+import argparse
+import io
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "unused-by-this-benchmark")
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from app.parsers import pdf_text
+from app.utils import text_cache
+
+text_cache.TEXT_CACHE_BACKEND = "off"  # measure extraction, not cache hits
+
+
+def build_pdf(doc_no: int, pages: int) -> bytes:
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=letter)
+    for page in range(pages):
+        y = 750
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(40, y, f"Monticello Inn, Framingham   DAILY REPORT   Date 10-{doc_no % 28 + 1:02d}-25   Page {page + 1}")
+        c.setFont("Helvetica", 9)
+        y -= 24
+        for line in range(12):
+            c.drawString(40, y, f"Revenue {1000 + line * 17}.50   ADR {89 + line}.25   Occupancy {60 + line}%   Auditor J. Smith")
+            y -= 12
+        y -= 12
+        for row in range(25):
+            c.line(40, y + 10, 560, y + 10)
+            for col, x in enumerate((40, 120, 260, 400, 560)):
+                c.line(x, y + 10, x, y - 2)
+            c.drawString(44, y, f"{100 + row}")
+            c.drawString(124, y, "Vacant Dirty" if row % 2 else "Out of Order")
+            c.drawString(264, y, f"{row % 5} days")
+            c.drawString(404, y, "Maintenance ticket open")
+            y -= 12
+        c.line(40, y + 10, 560, y + 10)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def run(docs, workers: int):
+    pdf_text._reset_pool()
+    pdf_text.PDF_WORKERS = workers
+    start = time.perf_counter()
+    texts = pdf_text.extract_texts_from_pdfs(docs)
+    elapsed = time.perf_counter() - start
+    pdf_text._reset_pool()
+    return elapsed, texts
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=6)
+    ap.add_argument("--pages", type=int, default=16)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = ap.parse_args()
+
+    docs = [build_pdf(i, args.pages) for i in range(args.docs)]
+    print(f"corpus: {args.docs} PDFs × {args.pages} pages ({sum(map(len, docs)) / 1e6:.1f} MB), {os.cpu_count()} CPUs")
+
+    baseline = None
+    print(f"{'workers':>8} {'wall':>8} {'speedup':>8}")
+    for w in args.workers:
+        elapsed, texts = run(docs, w)
+        if baseline is None:
+            baseline = (elapsed, texts)
+        assert texts == baseline[1], f"output differs at {w} workers"
+        print(f"{w:>8} {elapsed:>7.2f}s {baseline[0] / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Compare the layered PDF extractor (pdfium per page, pdfplumber only on
+table pages) with the previous pdfplumber-everywhere path.
+
+The corpus mixes plain text pages, pages with a ruled room table and
+scanned pages (an image, no text layer). Each extractor runs in its own
+child process so wall time, Python heap peak (tracemalloc) and RSS peak
+are measured independently. Word content of both outputs is compared.
+
+    python -m app.scripts.bench_pdf_layered --docs 20 --pages 12
+"""
+import argparse
+import io
+import multiprocessing as mp
+import os
+import random
+import resource
+import time
+import tracemalloc
+from collections import Counter
+
+os.environ.setdefault("OPENAI_API_KEY", "unused-by-this-benchmark")
+
+from PIL import Image, ImageDraw
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from app.parsers import pdf_text
+
+
+def _text_page(c, doc_no: int, page: int):
+    c.setFont("Helvetica", 10)
+    y = 750
+    c.drawString(40, y, f"Monticello Inn, Framingham   DAILY REPORT   Date 10-{doc_no % 28 + 1:02d}-25   Page {page + 1}")
+    for line in range(40):
+        y -= 16
+        c.drawString(40, y, f"Note {line}: guest in {100 + line} requested late checkout; revenue {1000 + line * 17}.50")
+
+
+def _table_page(c, doc_no: int, page: int):
+    c.setFont("Helvetica", 9)
+    y = 750
+    c.drawString(40, y, f"VACANT DIRTY ROOMS   Page {page + 1}")
+    y -= 24
+    for row in range(30):
+        c.line(40, y + 10, 560, y + 10)
+        for x in (40, 120, 260, 400, 560):
+            c.line(x, y + 10, x, y - 2)
+        c.drawString(44, y, f"{100 + row}")
+        c.drawString(124, y, "Late checkout" if row % 2 else "Out of Order")
+        c.drawString(264, y, f"{row % 5} days")
+        c.drawString(404, y, "Maintenance ticket")
+        y -= 12
+    c.line(40, y + 10, 560, y + 10)
+
+
+def _scanned_page(c, doc_no: int, page: int):
+    img = Image.new("L", (850, 1100), 255)
+    draw = ImageDraw.Draw(img)
+    for line in range(40):
+        draw.text((60, 60 + line * 24), f"Scanned line {line} room {100 + line}", fill=0)
+    c.drawImage(ImageReader(img), 0, 0, width=612, height=792)
+
+
+def build_pdf(doc_no: int, pages: int, rng: random.Random, mix) -> bytes:
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=letter)
+    kinds = rng.choices([_text_page, _table_page, _scanned_page], weights=mix, k=pages)
+    for page, draw_page in enumerate(kinds):
+        draw_page(c, doc_no, page)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def _measure(name: str, docs, out):
+    fn = pdf_text._legacy_pdf_text if name == "legacy" else pdf_text._basic_pdf_text
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    start = time.perf_counter()
+    texts = [fn(d) for d in docs]
+    elapsed = time.perf_counter() - start
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    out.put((elapsed, heap_peak, (rss_peak - base_rss) * 1024, texts))
+
+
+def run(name: str, docs):
+    ctx = mp.get_context("fork")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(name, docs, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def _page_methods(docs) -> Counter:
+    counts = Counter()
+    for d in docs:
+        counts.update(p.method for p in pdf_text._layered_pages(d) or [])
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=20)
+    ap.add_argument("--pages", type=int, default=12)
+    ap.add_argument("--mix", type=float, nargs=3, default=[0.6, 0.3, 0.1],
+                    help="share of text / table / scanned pages")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = [build_pdf(i, args.pages, rng, args.mix) for i in range(args.docs)]
+    print(f"corpus: {args.docs} PDFs × {args.pages} pages ({sum(map(len, docs)) / 1e6:.1f} MB)")
+    print(f"page strategies: {dict(_page_methods(docs))}")
+
+    results = {name: run(name, docs) for name in ("legacy", "layered")}
+    print(f"{'extractor':>10} {'wall':>8} {'heap peak':>10} {'rss growth':>11}")
+    for name, (elapsed, heap, rss, _) in results.items():
+        print(f"{name:>10} {elapsed:>7.2f}s {heap / 1e6:>8.1f}MB {rss / 1e6:>9.1f}MB")
+    print(f"speedup: {results['legacy'][0] / results['layered'][0]:.2f}x")
+
+    same = sum(
+        Counter(a.split()) == Counter(b.split())
+        for a, b in zip(results["legacy"][3], results["layered"][3])
+    )
+    print(f"documents with identical word content: {same}/{len(docs)}")
+
+
+if __name__ == "__main__":
+    main()
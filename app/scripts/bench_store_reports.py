@@ -0,0 +1,155 @@
+"""
+Benchmark report persistence: the previous path (one transaction per
+report, one ORM add per child row) against ``store_parsed_reports``
+(child rows as executemany batches, many reports per transaction with a
+savepoint each).
+
+Runs against DATABASE_URL (a throwaway SQLite file by default). Every
+statement and commit sleeps ``--rtt`` ms to stand in for the network round
+trip between Lambda and Postgres. One report in each batch is made to fail
+in the database so savepoint isolation is checked too.
+
+    python -m app.scripts.bench_store_reports --reports 200 --rtt 2
+"""
+import argparse
+import os
+import random
+import time
+import uuid
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:////tmp/bench_store_{uuid.uuid4().hex[:8]}.db")
+os.environ.setdefault("OPENAI_API_KEY", "unused-by-this-benchmark")
+
+from sqlalchemy import event, func, select
+
+from app.db.models import Base, MotelMaster, ReportIncident, ReportMaster, ReportVacantDirtyRoom
+from app.repositories.session import engine, get_session
+from app.services import report_service
+from app.services.report_service import _embedding_payload, _record_attachment, store_parsed_reports
+
+COUNTS = {"statements": 0, "commits": 0}
+RTT = 0.0
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _statement(conn, cursor, statement, params, context, executemany):
+    COUNTS["statements"] += 1
+    time.sleep(RTT)
+
+
+@event.listens_for(engine, "commit")
+def _commit(conn):
+    COUNTS["commits"] += 1
+    time.sleep(RTT)
+
+
+def _report(i: int, run: str, rng: random.Random, bad: bool = False) -> tuple:
+    parsed = {
+        "property_name": f"Bench Inn {run}{i % 7}, Framingham",
+        "report_date": f"2025-{i // 28 % 12 + 1:02d}-{i % 28 + 1:02d}",
+        "department": "Front Office",
+        "auditor": "J. Smith",
+        "revenue": round(rng.uniform(3000, 20000), 2),
+        "adr": round(rng.uniform(80, 180), 2),
+        "occupancy": rng.randint(40, 100),
+        "vacant_clean": rng.randint(0, 30),
+        "vacant_dirty": rng.randint(0, 10),
+        "out_of_order_rooms_storage": rng.randint(0, 5),
+        "vacant_dirty_rooms": [
+            {"room_number": str(100 + n), "reason": "Late checkout", "days": 1, "action": "Clean AM"} for n in range(12)
+        ],
+        "out_of_order_rooms": [
+            {"room_number": str(200 + n), "reason": "Broken AC", "days": 2, "action": "Ticket"} for n in range(4)
+        ],
+        "comp_rooms": [{"room_number": "301", "notes": "Manager stay"}],
+        # a dict can't be bound as a column value, so this report fails inside the database
+        "incidents": [{"description": {"oops": 1} if bad else "Noise complaint"} for _ in range(3)],
+        "parsed_by": "bench",
+    }
+    return parsed, "", f"report-{run}-{i}.pdf", uuid.uuid4().hex + uuid.uuid4().hex, None
+
+
+def _legacy_motel(db, property_name: str) -> MotelMaster:
+    motel_name, location = [p.strip() for p in property_name.split(",")]
+    m = db.query(MotelMaster).filter(MotelMaster.motel_name == motel_name, MotelMaster.location == location).first()
+    if m is None:
+        m = MotelMaster(motel_name=motel_name, location=location)
+        db.add(m)
+        db.flush()
+    return m
+
+
+def _legacy_store(parsed, subject, filename, sha256, msg_id):
+    """The previous store path: one transaction and one ORM add per row."""
+    with get_session() as db:
+        motel = _legacy_motel(db, parsed["property_name"])
+        report_dt = report_service._normalize_date(parsed["report_date"])
+        existing = db.query(ReportMaster).filter(ReportMaster.motel_id == motel.id,
+                                                 ReportMaster.report_date == report_dt).first()
+        if existing:
+            _record_attachment(db, sha256, msg_id, filename, existing.id, "duplicate")
+            db.commit()
+            return
+        master = ReportMaster(motel_id=motel.id, property_name=motel.motel_name, report_date=report_dt,
+                              department=parsed["department"], auditor=parsed["auditor"], revenue=parsed["revenue"],
+                              adr=parsed["adr"], occupancy=parsed["occupancy"], vacant_clean=parsed["vacant_clean"],
+                              vacant_dirty=parsed["vacant_dirty"],
+                              out_of_order_storage_rooms=parsed["out_of_order_rooms_storage"])
+        db.add(master)
+        db.flush()
+        for model, rows in report_service._child_rows(master.id, parsed).items():
+            for row in rows:
+                db.add(model(**row))
+        _record_attachment(db, sha256, msg_id, filename, master.id, "stored")
+        db.commit()
+        _embedding_payload(motel, master)
+
+
+def _reset():
+    for k in COUNTS:
+        COUNTS[k] = 0
+
+
+def main():
+    global RTT
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reports", type=int, default=200)
+    ap.add_argument("--batch", type=int, default=report_service.STORE_BATCH_SIZE)
+    ap.add_argument("--rtt", type=float, default=2.0, help="simulated ms per statement/commit")
+    args = ap.parse_args()
+    RTT = args.rtt / 1000
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(5)
+
+    print(f"{args.reports} reports, 20 child rows each; {args.rtt:g} ms per round trip; {engine.url}")
+    print(f"{'path':>8} {'wall':>8} {'statements':>11} {'commits':>8} {'stored':>7} {'failed':>7}")
+
+    legacy = [_report(i, "a", rng) for i in range(args.reports)]
+    _reset()
+    start = time.perf_counter()
+    for r in legacy:
+        _legacy_store(*r)
+    elapsed = time.perf_counter() - start
+    print(f"{'legacy':>8} {elapsed:>7.2f}s {COUNTS['statements']:>11} {COUNTS['commits']:>8} {len(legacy):>7} {0:>7}")
+
+    bulk = [_report(i, "b", rng, bad=(i % args.batch == args.batch // 2)) for i in range(args.reports)]
+    _reset()
+    start = time.perf_counter()
+    stored = failed = 0
+    for i in range(0, len(bulk), args.batch):
+        for outcome in store_parsed_reports(bulk[i:i + args.batch]):
+            failed += isinstance(outcome, Exception)
+            stored += not isinstance(outcome, Exception)
+    elapsed = time.perf_counter() - start
+    print(f"{'bulk':>8} {elapsed:>7.2f}s {COUNTS['statements']:>11} {COUNTS['commits']:>8} {stored:>7} {failed:>7}")
+
+    RTT = 0.0
+    with get_session() as db:
+        kept = db.scalar(select(func.count()).select_from(ReportMaster).where(ReportMaster.property_name.like("Bench Inn%")))
+        rooms = db.scalar(select(func.count()).select_from(ReportVacantDirtyRoom))
+        bad = db.scalar(select(func.count()).select_from(ReportIncident).where(ReportIncident.description.like("%oops%")))
+    print(f"rows in DB: {kept} reports, {rooms} vacant/dirty rooms, {bad} rows from failed reports")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark the template fast-path parser against an LLM-only baseline.
+
+Generates a synthetic corpus: reports in a layout that has a property
+template, reports in a plain "Label: value" layout (generic template) and
+free-form reports no template understands. For each document it times
+``TemplateReportParser.parse``, decides fast path vs LLM fallback with
+TEMPLATE_CONFIDENCE_THRESHOLD, and checks fast-path fields against the
+generator's ground truth. LLM latency is simulated (``--llm-latency``).
+
+    python -m app.scripts.bench_template_parser --docs 300
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date
+
+from app.parsers.template_parser import TemplateReportParser
+
+THRESHOLD = 0.9
+
+
+def _truth(rng: random.Random, i: int) -> dict:
+    return {
+        "report_date": f"10/{i % 28 + 1:02d}/2025",
+        "auditor": rng.choice(["J. Smith", "A. Patel", "M. Garcia"]),
+        "department": "Front Office",
+        "revenue": round(rng.uniform(3000, 20000), 2),
+        "adr": round(rng.uniform(80, 180), 2),
+        "occupancy": rng.randint(40, 100),
+        "vacant_clean": rng.randint(0, 30),
+        "vacant_dirty": rng.randint(0, 10),
+        "out_of_order_rooms_storage": rng.randint(0, 5),
+        "vacant_dirty_rooms": [
+            {"room_number": str(100 + n), "reason": "Late checkout", "days": n % 3 + 1, "action": "Clean AM"}
+            for n in range(rng.randint(0, 4))
+        ],
+        "out_of_order_rooms": [
+            {"room_number": str(200 + n), "reason": "Broken AC unit", "days": n + 2, "action": "Maintenance ticket"}
+            for n in range(rng.randint(0, 3))
+        ],
+        "incidents": [{"description": "Noise complaint from guest in 210"}] if rng.random() < 0.4 else [],
+    }
+
+
+def templated_doc(t: dict) -> str:
+    lines = [
+        "Monticello Inn, Framingham",
+        f"DAILY REPORT {t['report_date']}",
+        f"Department: {t['department']}",
+        f"Night Auditor: {t['auditor']}",
+        f"Revenue: ${t['revenue']:,.2f}",
+        f"ADR: {t['adr']:.2f}",
+        f"Occupancy: {t['occupancy']}%",
+        f"Vacant Clean: {t['vacant_clean']}",
+        f"Vacant Dirty: {t['vacant_dirty']}",
+        f"Out of Order/Storage Rooms: {t['out_of_order_rooms_storage']}",
+        "VACANT DIRTY ROOMS",
+        "Room Reason Days Action",
+    ]
+    lines += [f"{r['room_number']} {r['reason']} {r['days']} days {r['action']}" for r in t["vacant_dirty_rooms"]] or ["None"]
+    lines += ["OUT OF ORDER ROOMS"]
+    lines += [f"{r['room_number']} {r['reason']} {r['days']} {r['action']}" for r in t["out_of_order_rooms"]] or ["None"]
+    lines += ["INCIDENTS"] + ([i["description"] for i in t["incidents"]] or ["None"])
+    lines += ["Page 1 of 1"]
+    return "\n".join(lines)
+
+
+def generic_doc(t: dict) -> str:
+    return "\n".join([
+        "Lakeside Motel",
+        f"Date: {t['report_date']}",
+        f"Revenue {t['revenue']:.2f}",
+        f"ADR {t['adr']:.2f}",
+        f"Occupancy {t['occupancy']}",
+        f"Vacant Clean {t['vacant_clean']}",
+        f"Vacant Dirty {t['vacant_dirty']}",
+        f"Out of Order Storage {t['out_of_order_rooms_storage']}",
+    ])
+
+
+def freeform_doc(t: dict) -> str:
+    return (
+        f"Hi team, last night we closed at {t['occupancy']} percent with about "
+        f"{t['revenue']:.0f} dollars in the drawer; rate averaged {t['adr']:.0f}. "
+        "A few rooms still need attention, see notes."
+    )
+
+
+def _report_date(value) -> date | None:
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _matches(parsed: dict, truth: dict) -> bool:
+    # the date the report would be stored under, not the string as printed
+    month, day, year = (int(x) for x in truth["report_date"].split("/"))
+    if _report_date(parsed.get("report_date")) != date(year, month, day):
+        return False
+    for k in ("occupancy", "vacant_clean", "vacant_dirty", "out_of_order_rooms_storage"):
+        if parsed.get(k) != truth[k]:
+            return False
+    for k in ("revenue", "adr"):
+        if parsed.get(k) is None or abs(parsed[k] - truth[k]) > 0.005:
+            return False
+    for k in ("vacant_dirty_rooms", "out_of_order_rooms", "incidents"):
+        if parsed.get(k) != truth[k]:
+            return False
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=300)
+    ap.add_argument("--mix", type=float, nargs=3, default=[0.8, 0.1, 0.1],
+                    help="share of templated / generic / free-form documents")
+    ap.add_argument("--llm-latency", type=float, default=4.0, help="simulated seconds per LLM parse")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    kinds = rng.choices(["templated", "generic", "freeform"], weights=args.mix, k=args.docs)
+    builders = {"templated": templated_doc, "generic": generic_doc, "freeform": freeform_doc}
+
+    parser = TemplateReportParser()
+    latencies, llm_calls, fast_ok, fast_total = [], 0, 0, 0
+    by_kind = {k: [0, 0] for k in builders}  # [docs, llm calls]
+
+    for i, kind in enumerate(kinds):
+        truth = _truth(rng, i)
+        text = builders[kind](truth)
+        start = time.perf_counter()
+        parsed = parser.parse(text)
+        latencies.append(time.perf_counter() - start)
+
+        by_kind[kind][0] += 1
+        if parsed["_confidence"]["overall"] >= THRESHOLD:
+            fast_total += 1
+            fast_ok += _matches(parsed, truth)
+        else:
+            llm_calls += 1
+            by_kind[kind][1] += 1
+
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"documents: {args.docs}  threshold: {THRESHOLD}")
+    print(f"template parse latency: mean {statistics.mean(latencies) * 1e3:.2f} ms, p95 {p95 * 1e3:.2f} ms")
+    for kind, (n, calls) in by_kind.items():
+        print(f"  {kind:<10} docs={n:<5} llm calls={calls:<5} ({(calls / n * 100) if n else 0:.0f}%)")
+    print(f"LLM call rate: {llm_calls / args.docs * 100:.1f}% (baseline 100%)")
+    print(f"fast-path field accuracy vs ground truth: {fast_ok}/{fast_total}")
+    est = sum(latencies) + llm_calls * args.llm_latency
+    print(f"estimated parse time: {est:.1f}s vs {args.docs * args.llm_latency:.1f}s LLM-only")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare writing one TokenUsage row per API call (a session and a commit
+each, the previous behaviour) with the buffered usage_recorder, from
+several threads at once, and check that /usage/summary reports the same
+totals either way.
+
+Rows go to DATABASE_URL (a throwaway SQLite file by default).
+
+    python -m app.scripts.bench_usage_recorder --calls 5000 --threads 8
+"""
+import argparse
+import os
+import random
+import threading
+import time
+import uuid
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:////tmp/bench_usage_{uuid.uuid4().hex[:8]}.db")
+
+from app.api.usage import get_usage_summary
+from app.db.models import Base, TokenUsage
+from app.repositories.session import engine, get_session
+from app.utils import usage_recorder
+from app.utils.token_costs import estimate_cost
+
+MODELS = [("text-embedding-3-small", "embedding"), ("gpt-4o-mini", "chat-batch")]
+
+
+def _per_call(model: str, operation: str, prompt: int, completion: int):
+    """The previous path: one session and one commit per API call."""
+    with get_session() as db:
+        db.add(TokenUsage(
+            model=model,
+            operation=operation,
+            prompt_tokens=prompt,
+            completion_tokens=completion,
+            total_tokens=prompt + completion,
+            cost_usd=estimate_cost(model, prompt, completion),
+        ))
+        db.commit()
+
+
+def _buffered(model: str, operation: str, prompt: int, completion: int):
+    usage_recorder.record(model, operation, prompt, completion)
+
+
+def run(fn, calls: list, threads: int) -> float:
+    chunks = [calls[i::threads] for i in range(threads)]
+    workers = [threading.Thread(target=lambda c=c: [fn(*call) for call in c]) for c in chunks]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    usage_recorder.flush()
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=5000)
+    ap.add_argument("--threads", type=int, default=8)
+    args = ap.parse_args()
+    Base.metadata.create_all(bind=engine)
+
+    rng = random.Random(5)
+    calls = []
+    for _ in range(args.calls):
+        model, operation = rng.choice(MODELS)
+        calls.append((model, operation, rng.randint(50, 4000), 0 if operation == "embedding" else rng.randint(50, 800)))
+
+    print(f"{args.calls} usage rows from {args.threads} threads; flush every {usage_recorder.USAGE_FLUSH_SIZE} rows "
+          f"or {usage_recorder.USAGE_FLUSH_INTERVAL:g} s")
+    print(f"{'path':>10} {'wall':>8} {'rows/s':>9} {'rows':>7}")
+    summaries = []
+    for name, fn in (("per-call", _per_call), ("buffered", _buffered)):
+        with get_session() as db:
+            db.query(TokenUsage).delete()
+            db.commit()
+        elapsed = run(fn, calls, args.threads)
+        with get_session() as db:
+            rows = db.query(TokenUsage).count()
+        summaries.append(get_usage_summary())
+        print(f"{name:>10} {elapsed:>7.2f}s {args.calls / elapsed:>9.0f} {rows:>7}")
+    print(f"{'✅' if summaries[0] == summaries[1] else '❌'} /usage/summary identical: {summaries[1]}")
+
+
+if __name__ == "__main__":
+    main()
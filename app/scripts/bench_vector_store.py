@@ -0,0 +1,105 @@
+"""
+Benchmark the local vector store (app/vectorstore/local_store.py): upsert
+N report-like vectors, then time top-k queries with and without a
+metadata filter, and check the results against a plain NumPy sort of the
+same data. Also checks that a fresh instance (another process) sees the
+same vectors and that deletes and overwrites stick.
+
+    python -m app.scripts.bench_vector_store --vectors 5000 --queries 500
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from app.vectorstore.local_store import LocalStore
+
+DIM = 1536
+DAY = 86400
+START = 1704067200  # 2024-01-01 UTC
+
+
+def _metadata(i: int, motels: int) -> dict:
+    return {"motel_name": f"Inn {i % motels}", "department": "Front Office" if i % 3 else "Housekeeping",
+            "report_date_ts": START + (i // motels) * DAY, "content": f"report {i}"}
+
+
+def _expected(matrix: np.ndarray, metas: list, q: np.ndarray, k: int, keep) -> list:
+    idx = [i for i, m in enumerate(metas) if keep(m)]
+    sub = matrix[idx]
+    scores = sub @ q / (np.linalg.norm(sub, axis=1) * np.linalg.norm(q))
+    return [f"v-{idx[i]}" for i in np.argsort(-scores, kind="stable")[:k]]
+
+
+def _timed(store: LocalStore, queries: np.ndarray, k: int, flt) -> tuple:
+    times, results = [], []
+    for q in queries:
+        t = time.perf_counter()
+        results.append(store.query(q, top_k=k, filter=flt))
+        times.append(time.perf_counter() - t)
+    ms = np.array(times) * 1000
+    return float(np.percentile(ms, 50)), float(np.percentile(ms, 99)), results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--vectors", type=int, default=5000)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--motels", type=int, default=20)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(3)
+    centers = rng.normal(size=(args.motels, DIM)).astype(np.float32)
+    matrix = (centers[np.arange(args.vectors) % args.motels] + rng.normal(scale=0.8, size=(args.vectors, DIM))).astype(np.float32)
+    metas = [_metadata(i, args.motels) for i in range(args.vectors)]
+    queries = (centers[rng.integers(0, args.motels, args.queries)] + rng.normal(size=(args.queries, DIM))).astype(np.float32)
+
+    path = tempfile.mkdtemp(prefix="bench_vector_store_")
+    try:
+        store = LocalStore(path)
+        t = time.perf_counter()
+        for lo in range(0, args.vectors, 100):
+            store.upsert([{"id": f"v-{i}", "values": matrix[i], "metadata": metas[i]}
+                          for i in range(lo, min(args.vectors, lo + 100))])
+        print(f"upserted {args.vectors} × {DIM}-dim vectors in chunks of 100: {time.perf_counter() - t:.2f}s")
+
+        mid = START + (args.vectors // args.motels // 2) * DAY
+        cases = [
+            ("no filter", None, lambda m: True),
+            ("motel", {"motel_name": "Inn 3"}, lambda m: m["motel_name"] == "Inn 3"),
+            ("motel+date", {"$and": [{"motel_name": {"$in": ["Inn 3", "Inn 4"]}}, {"report_date_ts": {"$gte": mid}}]},
+             lambda m: m["motel_name"] in ("Inn 3", "Inn 4") and m["report_date_ts"] >= mid),
+        ]
+        print(f"{'query':>12} {'p50 ms':>8} {'p99 ms':>8} {'exact':>6}")
+        for name, flt, keep in cases:
+            p50, p99, results = _timed(store, queries, args.top_k, flt)
+            exact = all(
+                [m["id"] for m in got] == _expected(matrix, metas, q, args.top_k, keep)
+                for q, got in zip(queries[:50], results[:50])
+            )
+            print(f"{name:>12} {p50:>8.3f} {p99:>8.3f} {'✅' if exact else '❌':>6}")
+
+        store.delete(["v-0", "v-1"])
+        store.upsert([{"id": "v-2", "values": matrix[2], "metadata": {**metas[2], "department": "Maintenance"}}])
+        other = LocalStore(path)
+        checks = [
+            ("reopened store has every vector", len(other) == args.vectors - 2),
+            ("deleted ids are gone", not other.fetch(["v-0", "v-1"])),
+            ("overwritten metadata wins", other.fetch(["v-2"])["v-2"]["metadata"]["department"] == "Maintenance"),
+            ("same answers after reopening", [m["id"] for m in other.query(queries[0], top_k=args.top_k)]
+             == [m["id"] for m in store.query(queries[0], top_k=args.top_k)]),
+        ]
+        other.upsert([{"id": "v-new", "values": matrix[5], "metadata": {"motel_name": "New Inn"}}])
+        checks.append(("writes from another instance are picked up",
+                       store.query(matrix[5], top_k=1, filter={"motel_name": "New Inn"})[0]["id"] == "v-new"))
+        for label, ok in checks:
+            print(f"{'✅' if ok else '❌'} {label}")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Concurrent-writer check for report storage.
+
+Starts ``--workers`` processes that all store the same ``--reports``
+reports (same motels, dates and attachment hashes, each worker in its own
+shuffled order, in batches of INGEST_STORE_BATCH_SIZE) at the same moment,
+the way overlapping ingest Lambdas would. Passes when:
+
+  * every (motel, report_date) is stored exactly once, with its child rows
+    written once;
+  * across workers, "stored" results add up to the number of reports and
+    every other result is "duplicate" pointing at the stored id;
+  * no worker hit an error.
+
+Runs against DATABASE_URL (a fresh SQLite file by default; point it at a
+scratch Postgres database to check the ON CONFLICT path there). Exits 1 on
+failure.
+
+    python -m app.scripts.check_concurrent_store --workers 8 --reports 60
+"""
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sys
+import uuid
+from collections import Counter
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:////tmp/concurrent_store_{uuid.uuid4().hex[:8]}.db")
+os.environ.setdefault("OPENAI_API_KEY", "unused-by-this-check")
+
+from sqlalchemy import func, select
+
+from app.db.init_db import init_db
+from app.db.models import MotelMaster, ProcessedAttachment, ReportIncident, ReportMaster, ReportVacantDirtyRoom
+from app.repositories.session import engine, get_session
+
+ROOMS, INCIDENTS = 5, 2
+
+
+def _reports(n: int) -> list:
+    reports = []
+    for i in range(n):
+        parsed = {
+            "property_name": f"Race Inn {i % 4}, Town {i % 4}",
+            "report_date": f"2025-{i // 28 % 12 + 1:02d}-{i % 28 + 1:02d}",
+            "revenue": 1000 + i,
+            "vacant_dirty_rooms": [
+                {"room_number": str(100 + r), "reason": "Late checkout", "days": 1, "action": "Clean"} for r in range(ROOMS)
+            ],
+            "incidents": [{"description": f"Incident {k} on report {i}"} for k in range(INCIDENTS)],
+            "parsed_by": "check",
+        }
+        reports.append((parsed, "", f"report-{i}.pdf", f"{i:064x}", None))
+    return reports
+
+
+def _worker(args) -> list:
+    seed, reports, start = args
+    from app.services.report_service import STORE_BATCH_SIZE, store_parsed_reports
+
+    engine.dispose()  # connections must not be shared with the parent process
+    random.Random(seed).shuffle(reports)
+    start.wait()
+    results = []
+    for i in range(0, len(reports), STORE_BATCH_SIZE):
+        for outcome in store_parsed_reports(reports[i:i + STORE_BATCH_SIZE]):
+            if isinstance(outcome, Exception):
+                results.append(("error", None, None, f"{type(outcome).__name__}: {outcome}"))
+            else:
+                result = outcome[0]
+                results.append((result["status"], result["file"], result["id"], None))
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--reports", type=int, default=60)
+    args = ap.parse_args()
+
+    init_db()
+    reports = _reports(args.reports)
+    ctx = mp.get_context("fork")
+    with ctx.Manager() as manager:
+        start = manager.Barrier(args.workers)
+        with ctx.Pool(args.workers) as pool:
+            per_worker = pool.map(_worker, [(seed, list(reports), start) for seed in range(args.workers)])
+
+    results = [r for rs in per_worker for r in rs]
+    statuses = Counter(r[0] for r in results)
+    errors = [r[3] for r in results if r[0] == "error"]
+    ids = {}
+    mismatched = 0
+    for status, filename, report_id, _ in results:
+        if status in ("stored", "duplicate"):
+            mismatched += ids.setdefault(filename, report_id) != report_id
+
+    with get_session() as db:
+        rows = db.execute(
+            select(ReportMaster.motel_id, ReportMaster.report_date, func.count())
+            .join(MotelMaster, MotelMaster.id == ReportMaster.motel_id)
+            .where(MotelMaster.motel_name.like("Race Inn%"))
+            .group_by(ReportMaster.motel_id, ReportMaster.report_date)
+        ).all()
+        rooms = db.scalar(select(func.count()).select_from(ReportVacantDirtyRoom))
+        incidents = db.scalar(select(func.count()).select_from(ReportIncident))
+        ledger = db.scalar(select(func.count()).select_from(ProcessedAttachment))
+        motels = db.scalar(select(func.count()).select_from(MotelMaster).where(MotelMaster.motel_name.like("Race Inn%")))
+
+    print(f"{args.workers} workers × {args.reports} reports on {engine.url.get_backend_name()}")
+    print(f"results: {dict(statuses)}")
+    print(f"rows: {len(rows)} reports, {motels} motels, {rooms} rooms, {incidents} incidents, {ledger} ledger entries")
+    checks = {
+        "one report row per (motel, date)": len(rows) == args.reports and all(n == 1 for *_, n in rows),
+        "stored once per report": statuses["stored"] == args.reports,
+        "everything else a duplicate": statuses["duplicate"] == args.reports * (args.workers - 1),
+        "duplicates point at the stored id": mismatched == 0,
+        "child rows written once": rooms == args.reports * ROOMS and incidents == args.reports * INCIDENTS,
+        "one motel per property": motels == 4,
+        "one ledger entry per attachment": ledger == args.reports,
+        "no errors": not errors,
+    }
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+    for e in Counter(errors).most_common(5):
+        print(f"   {e[1]}× {e[0][:200]}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Check the Gmail batch-get path (``_get_messages_batched``) against
+``googleapiclient.http.HttpMockSequence``, so the real BatchHttpRequest
+serialization and multipart response parsing run without a network.
+
+The first batch answers one message with a 503; the check passes when
+that id is retried alone in a second batch and every message comes back.
+A message that fails on every attempt must be absent from the result, and
+``_iter_messages`` must report it through ``on_fail``. Exits 1 on failure.
+
+    python -m app.scripts.check_gmail_batch
+"""
+import json
+import sys
+
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpMockSequence
+
+from app.utils import gmail_client
+
+BOUNDARY = "batch_check"
+
+
+class _RecordingHttp(HttpMockSequence):
+    """HttpMockSequence that remembers the body of every request it answered."""
+
+    def __init__(self, iterable):
+        super().__init__(iterable)
+        self.bodies = []
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=1, connection_type=None):
+        self.bodies.append(body.decode() if isinstance(body, bytes) else body or "")
+        return super().request(uri, method, body, headers, redirections, connection_type)
+
+
+def _message(msg_id: str) -> dict:
+    return {
+        "id": msg_id,
+        "payload": {"headers": [{"name": "Subject", "value": f"Daily report {msg_id}"}]},
+    }
+
+
+def _batch_response(parts) -> tuple:
+    """A multipart/mixed batch reply; ``parts`` are (msg_id, status) in request order."""
+    body = []
+    for msg_id, status in parts:
+        payload = json.dumps(_message(msg_id) if status == 200 else {"error": {"code": status, "message": "Backend Error"}})
+        reason = "OK" if status == 200 else "Service Unavailable"
+        body.append(
+            f"--{BOUNDARY}\r\nContent-Type: application/http\r\nContent-ID: <response-check + {msg_id}>\r\n\r\n"
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n\r\n{payload}\r\n"
+        )
+    body.append(f"--{BOUNDARY}--\r\n")
+    return {"status": "200", "content-type": f'multipart/mixed; boundary="{BOUNDARY}"'}, "".join(body)
+
+
+def _service(http):
+    return build("gmail", "v1", http=http, static_discovery=True, cache_discovery=False)
+
+
+def main():
+    gmail_client.MSG_RETRIES = 2
+    checks = {}
+
+    # m2 fails once, then succeeds in a batch of its own
+    http = _RecordingHttp([
+        _batch_response([("m1", 200), ("m2", 503), ("m3", 200)]),
+        _batch_response([("m2", 200)]),
+    ])
+    got = gmail_client._get_messages_batched(_service(http), ["m1", "m2", "m3"])
+    checks["every message fetched after the retry"] = sorted(got) == ["m1", "m2", "m3"]
+    checks["two batch round trips"] = len(http.bodies) == 2
+    checks["only the failed id is retried"] = (
+        len(http.bodies) == 2 and "/messages/m2" in http.bodies[1]
+        and "/messages/m1" not in http.bodies[1] and "/messages/m3" not in http.bodies[1]
+    )
+    checks["responses matched to their ids"] = all(got.get(m, {}).get("id") == m for m in ("m1", "m2", "m3"))
+
+    # m2 fails on every attempt
+    http = _RecordingHttp([
+        _batch_response([("m1", 200), ("m2", 503)]),
+        _batch_response([("m2", 503)]),
+    ])
+    got = gmail_client._get_messages_batched(_service(http), ["m1", "m2"])
+    checks["a message that never succeeds is absent"] = sorted(got) == ["m1"]
+
+    http = _RecordingHttp([
+        _batch_response([("m1", 200), ("m2", 503)]),
+        _batch_response([("m2", 503)]),
+    ])
+    service = _service(http)
+    failed, skipped = [], []
+    emails = list(gmail_client._iter_messages(
+        lambda: service, [{"id": "m1"}, {"id": "m2"}], concurrency=1, batch=True,
+        on_skip=lambda msg_id, reason: skipped.append(msg_id), on_fail=failed.append,
+    ))
+    checks["_iter_messages reports the failed id"] = failed == ["m2"]
+    checks["_iter_messages still handles the rest"] = len(emails) + len(skipped) == 1
+
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
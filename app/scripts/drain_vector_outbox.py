@@ -0,0 +1,35 @@
+"""
+Drain the vector outbox locally: embed and upsert every report that was
+stored but not yet indexed (see app/services/vector_outbox.py).
+
+    python -m app.scripts.drain_vector_outbox                # until nothing is due
+    python -m app.scripts.drain_vector_outbox --watch 30     # keep polling every 30 s
+    python -m app.scripts.drain_vector_outbox --requeue-dead # retry dead-lettered rows first
+"""
+import argparse
+import json
+import time
+
+from app.services import vector_outbox
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch-size", type=int, default=vector_outbox.VECTOR_OUTBOX_BATCH_SIZE)
+    ap.add_argument("--max-batches", type=int, default=None)
+    ap.add_argument("--watch", type=float, default=None, help="poll interval in seconds; runs until interrupted")
+    ap.add_argument("--requeue-dead", action="store_true")
+    args = ap.parse_args()
+
+    if args.requeue_dead:
+        print(f"🔁 Requeued {vector_outbox.requeue_dead()} dead-lettered rows")
+    while True:
+        vector_outbox.drain(max_batches=args.max_batches, batch_size=args.batch_size)
+        if args.watch is None:
+            break
+        time.sleep(args.watch)
+    print(json.dumps(vector_outbox.stats(), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
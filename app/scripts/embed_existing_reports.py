@@ -1,149 +1,255 @@
-import os
+"""
+Backfill vectors (Pinecone, or the local store) for reports already in the database.
+
+Reports are streamed in id order (``yield_per``, child rows loaded per
+chunk), so memory stays flat however large the table is, and indexed in
+batches on a pool of worker threads. Every embeddings request goes through
+the shared rate limiter in pinecone_client (EMBED_RPM / EMBED_TPM, or
+--rpm / --tpm). Reports whose live vector is unchanged cost no API call,
+and text seen before comes from the embedding cache.
+
+The highest report id below which every batch has finished is checkpointed
+in embed_backfill_checkpoint, per index and filter set, so an interrupted
+run resumes where it stopped. A run that finishes without failures clears
+its checkpoint; the next one re-checks everything (cheaply) from the
+start. --restart ignores the checkpoint.
+
+    python -m app.scripts.embed_existing_reports --workers 8
+    python -m app.scripts.embed_existing_reports --since 2025-01-01 --motel "Monticello Inn"
+"""
+import argparse
+import threading
 import time
-from openai import OpenAI
-from pinecone import Pinecone
-from sqlalchemy.orm import joinedload
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
 
-from app.repositories.session import get_session
-from app.db.models import ReportMaster, MotelMaster, TokenUsage
-from app.utils.token_costs import estimate_cost
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
 
-# --- Load API keys ---
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX = os.getenv("PINECONE_INDEX")
+from app.repositories.session import get_session
+from app.db.models import EmbedBackfillCheckpoint, MotelMaster, ReportMaster
+from app.services.motel_resolver import MotelRef
+from app.services.report_service import _embedding_payload
+from app.utils import embedding_cache
+from app.utils.rate_limiter import RateLimiter
+from app.vectorstore import pinecone_client
+from app.vectorstore.pinecone_client import upsert_report_embeddings
 
-client = OpenAI(api_key=OPENAI_API_KEY)
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX)
+PROGRESS_EVERY = 5.0  # seconds between progress lines
 
 
 # -----------------------------------------------
 # 🧩 Helper Functions
 # -----------------------------------------------
 
-def build_text(report):
-    """Convert a report object into a text block for embedding."""
-    motel_name = getattr(report.motel_master, "motel_name", "Unknown Motel")
-    location = getattr(report.motel_master, "location", "")
-    return f"""
-    Motel: {motel_name}
-    Location: {location}
-    Department: {report.department}
-    Auditor: {report.auditor}
-    Revenue: {report.revenue}
-    Occupancy: {report.occupancy}
-    Vacant Clean: {report.vacant_clean}
-    Vacant Dirty: {report.vacant_dirty}
-    Report Date: {report.report_date}
-    ADR: {report.adr}
-    Out Of Order/Storage rooms: {report.out_of_order_storage_rooms}
-    """
+def list_existing_vector_ids() -> set:
+    """Vector IDs recorded as live in the configured vector store (report_vector table)."""
+    try:
+        existing_ids = embedding_cache.live_vector_ids(pinecone_client.store.name)
+        print(f"📊 Vectors recorded in {pinecone_client.store.name}: {len(existing_ids)}")
+        return existing_ids
+    except Exception as e:
+        print(f"⚠️ Could not read live vector IDs: {e}")
+        return set()
 
 
-def generate_embedding(text: str):
-    """Generate an embedding and log cost usage to DB."""
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
-    )
-    embedding = response.data[0].embedding
-    usage = response.usage
+def _filtered(q, since: Optional[date], motel: Optional[str]):
+    if since:
+        q = q.filter(ReportMaster.report_date >= since)
+    if motel:
+        if motel.isdigit():
+            q = q.filter(ReportMaster.motel_id == int(motel))
+        else:
+            q = q.join(MotelMaster, MotelMaster.id == ReportMaster.motel_id).filter(
+                MotelMaster.motel_name.ilike(f"%{motel}%")
+            )
+    return q
 
-    cost = estimate_cost("text-embedding-3-small", usage.prompt_tokens)
-    with get_session() as db:
-        db.add(TokenUsage(
-            model="text-embedding-3-small",
-            operation="embedding",
-            prompt_tokens=usage.prompt_tokens,
-            completion_tokens=0,
-            total_tokens=usage.prompt_tokens,
-            cost_usd=cost
-        ))
-        db.commit()
 
-    return embedding
+def _checkpoint_name(since: Optional[date], motel: Optional[str]) -> str:
+    return f"{pinecone_client.store.name}|since={since or ''}|motel={motel or ''}"
 
 
-def upsert_embedding(report_id: int, text: str, metadata: dict):
-    """Upsert an embedding into Pinecone."""
-    vector = generate_embedding(text)
-    index.upsert(vectors=[{
-        "id": f"report-{report_id}",
-        "values": vector,
-        "metadata": metadata
-    }])
-    print(f"✅ Embedded report {report_id}")
+def _load_checkpoint(name: str) -> int:
+    with get_session() as db:
+        row = db.get(EmbedBackfillCheckpoint, name)
+        return row.last_report_id if row else 0
 
 
-def list_existing_vector_ids() -> set:
-    """Fetch all vector IDs currently in Pinecone."""
-    existing_ids = set()
-    try:
-        # Use pagination to list all IDs
-        stats = index.describe_index_stats()
-        total = stats.get("total_vector_count", 0)
-        print(f"📊 Existing vectors in Pinecone: {total}")
+def _save_checkpoint(name: str, last_report_id: int, done: int):
+    with get_session() as db:
+        db.merge(EmbedBackfillCheckpoint(name=name, last_report_id=last_report_id, reports_done=done,
+                                         updated_at=datetime.utcnow()))
+        db.commit()
 
-        # You can query small batches to confirm
-        if total > 0:
-            # Optional: retrieve a few vector IDs (not all — depends on Pinecone plan)
-            # If your plan doesn't support listing IDs, we’ll use metadata match later.
-            pass
 
-    except Exception as e:
-        print(f"⚠️ Could not fetch Pinecone index stats: {e}")
-    return existing_ids
+def _clear_checkpoint(name: str):
+    with get_session() as db:
+        db.query(EmbedBackfillCheckpoint).filter(EmbedBackfillCheckpoint.name == name).delete()
+        db.commit()
 
 
-# -----------------------------------------------
-# 🚀 Main Embedding Process (Incremental)
-# -----------------------------------------------
+class _Progress:
+    """Thread-safe counters plus a throttled progress / ETA line."""
 
-def embed_all_reports(batch_size: int = 10, delay_sec: float = 1.0):
-    with get_session() as db:
-        reports = (
-            db.query(ReportMaster)
-            .options(joinedload(ReportMaster.motel_master))
-            .all()
-        )
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.counts = Counter()
+        self.started = time.monotonic()
+        self._printed = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, n: int, summary: Dict[str, int]):
+        with self._lock:
+            self.done += n
+            self.counts.update(summary)
 
-        # Gather all IDs already in Pinecone
-        existing_ids = list_existing_vector_ids()
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        left = (self.total - self.done) / rate if rate > 0 else 0.0
+        pct = 100 * self.done / self.total if self.total else 100.0
+        return (f"⏩ {self.done}/{self.total} ({pct:.1f}%) · {rate:.1f} reports/s · "
+                f"elapsed {_clock(elapsed)} · ETA {_clock(left)} · embedded {self.counts['embedded']}, "
+                f"cached {self.counts['cached']}, unchanged {self.counts['unchanged']}, failed {self.counts['failed']}")
 
-        print(f"📦 Found {len(reports)} reports in database.")
-        processed = 0
+    def maybe_print(self, force: bool = False):
+        now = time.monotonic()
+        if force or now - self._printed >= PROGRESS_EVERY:
+            self._printed = now
+            print(self.line(), flush=True)
 
-        for rpt in reports:
-            vector_id = f"report-{rpt.id}"
-            if vector_id in existing_ids:
-                print(f"⏭ Skipping already-embedded report {rpt.id}")
-                continue
 
-            text = build_text(rpt)
-            metadata = {
-                "motel_name": (getattr(rpt.motel_master, "motel_name", "") or ""),
-                "location": (getattr(rpt.motel_master, "location", "") or ""),
-                "department": (rpt.department or ""),
-                "auditor": (rpt.auditor or ""),
-                "report_date": str(rpt.report_date) if rpt.report_date else "",
-                "content": text[:4000]
-            }
+def _limits() -> str:
+    limiter = pinecone_client.limiter
+    rpm = f"{limiter.requests.rate * 60:.0f} RPM" if limiter.requests else "no RPM limit"
+    tpm = f"{limiter.tokens.rate * 60:.0f} TPM" if limiter.tokens else "no TPM limit"
+    return f"{rpm}, {tpm}"
 
 
-            try:
-                upsert_embedding(rpt.id, text, metadata)
-                time.sleep(1)
-                processed += 1
-            except Exception as e:
-                print(f"❌ Failed on report {rpt.id}: {e}")
+def _clock(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
 
-            if processed % batch_size == 0:
-                print(f"⏸ Processed {processed} new embeddings, sleeping {delay_sec}s")
-                time.sleep(delay_sec)
 
-        print(f"✅ Completed embedding. {processed} new vectors added.")
+# -----------------------------------------------
+# 🚀 Main Embedding Process (Incremental)
+# -----------------------------------------------
+
+def embed_all_reports(batch_size: int = 100, workers: int = 4, since: Optional[date] = None,
+                      motel: Optional[str] = None, force: bool = False, restart: bool = False) -> Dict[str, Any]:
+    """
+    Embed every report (matching ``since`` / ``motel``) whose text or
+    metadata changed since it was last upserted, resuming from the
+    checkpoint left by an interrupted run.
+    """
+    name = _checkpoint_name(since, motel)
+    start_id = 0 if restart else _load_checkpoint(name)
+    with get_session() as db:
+        total = _filtered(db.query(func.count(ReportMaster.id)), since, motel).filter(ReportMaster.id > start_id).scalar()
+    if start_id:
+        print(f"🔖 Resuming after report {start_id}")
+    print(f"📦 {total} reports to check with {workers} workers, batches of {batch_size} ({_limits()})")
+
+    progress = _Progress(total)
+    in_flight = deque()  # (last report id of the batch, future), in submission order
+    state = {"watermark": start_id, "blocked": False}
+
+    def run_batch(items: List[tuple]) -> Dict[str, int]:
+        summary = upsert_report_embeddings(items, force=force)
+        progress.add(len(items), summary)
+        return summary
+
+    def settle():
+        """Advance the checkpoint over the finished batches at the head of the queue."""
+        moved = False
+        while in_flight and in_flight[0][1].done() and not in_flight[0][1].cancelled():
+            last_id, future = in_flight.popleft()
+            if future.result()["failed"]:
+                state["blocked"] = True  # the next run must redo this batch
+            if not state["blocked"]:
+                state["watermark"] = last_id
+                moved = True
+        if moved:
+            _save_checkpoint(name, state["watermark"], progress.done)
+        progress.maybe_print()
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="embed")
+    interrupted = False
+    try:
+        with get_session() as db:
+            q = (
+                db.query(ReportMaster)
+                .options(
+                    joinedload(ReportMaster.motel_master),
+                    selectinload(ReportMaster.vacant_dirty_rooms),
+                    selectinload(ReportMaster.out_of_order_rooms),
+                    selectinload(ReportMaster.comp_room_records),
+                    selectinload(ReportMaster.incident_records),
+                )
+                .filter(ReportMaster.id > start_id)
+                .order_by(ReportMaster.id)
+            )
+            batch: List[tuple] = []
+            for rpt in _filtered(q, since, motel).yield_per(batch_size):
+                m = rpt.motel_master
+                batch.append(_embedding_payload(MotelRef(m.id, m.motel_name, m.location), rpt))
+                if len(batch) < batch_size:
+                    continue
+                # keep at most two batches per worker queued, so memory stays bounded
+                while len(in_flight) >= 2 * max(1, workers):
+                    wait([in_flight[0][1]])  # the oldest batch gates both the bound and the checkpoint
+                    settle()
+                in_flight.append((batch[-1][0], pool.submit(run_batch, batch)))
+                batch = []
+            if batch:
+                in_flight.append((batch[-1][0], pool.submit(run_batch, batch)))
+        while in_flight:
+            wait([in_flight[0][1]])
+            settle()
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\n🛑 Interrupted; finishing the batches already running…")
+        pool.shutdown(wait=True, cancel_futures=True)
+        settle()
+    finally:
+        pool.shutdown(wait=True)
+
+    progress.maybe_print(force=True)
+    if interrupted or state["blocked"]:
+        print(f"🔖 Checkpoint at report {state['watermark']}; run again with the same filters to resume")
+    else:
+        _clear_checkpoint(name)
+    totals = {**progress.counts, "checked": progress.done, "checkpoint": state["watermark"],
+              "seconds": round(time.monotonic() - progress.started, 3), "complete": not (interrupted or state["blocked"])}
+    print(f"{'✅ Completed embedding.' if totals['complete'] else '⏸ Embedding stopped.'} {totals}")
+    return totals
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--since", type=date.fromisoformat, default=None, help="only reports dated on/after YYYY-MM-DD")
+    ap.add_argument("--motel", default=None, help="motel id, or part of its name")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--batch-size", type=int, default=100)
+    ap.add_argument("--rpm", type=int, default=None, help="embeddings requests per minute (default EMBED_RPM)")
+    ap.add_argument("--tpm", type=int, default=None, help="embeddings tokens per minute (default EMBED_TPM)")
+    ap.add_argument("--force", action="store_true", help="re-embed and re-upsert even unchanged reports")
+    ap.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first report")
+    args = ap.parse_args()
+
+    if args.rpm is not None or args.tpm is not None:
+        pinecone_client.limiter = RateLimiter(
+            rpm=pinecone_client.EMBED_RPM if args.rpm is None else args.rpm,
+            tpm=pinecone_client.EMBED_TPM if args.tpm is None else args.tpm,
+        )
+    list_existing_vector_ids()
+    embed_all_reports(batch_size=args.batch_size, workers=args.workers, since=args.since, motel=args.motel,
+                      force=args.force, restart=args.restart)
 
 
 if __name__ == "__main__":
-    embed_all_reports()
+    main()
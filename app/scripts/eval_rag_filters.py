@@ -0,0 +1,243 @@
+"""
+Evaluate metadata-filtered retrieval for the RAG chat path
+(app/services/rag_filters.py).
+
+Seeds a year of daily reports for a handful of motels into a throwaway
+SQLite database, indexes them into a local vector store (VECTOR_STORE=local)
+with a deterministic bag-of-words embedder standing in for OpenAI, then
+asks generated questions that name a motel, a location, a department
+and/or a date range. For each question it compares retrieval without a
+filter (as before) and with the filter extracted from the question:
+
+  * precision@k: share of the top k reports that satisfy the question's
+    constraints;
+  * k needed: how many unfiltered results it takes to collect k such
+    reports (what callers raised top_k to), and the context it puts in the
+    prompt;
+  * whether the extracted constraints are exactly the intended ones.
+
+    python -m app.scripts.eval_rag_filters --days 365 --questions 200
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:////tmp/eval_rag_{uuid.uuid4().hex[:8]}.db")
+os.environ.setdefault("OPENAI_API_KEY", "unused-by-this-eval")
+os.environ["VECTOR_STORE"] = "local"
+os.environ.setdefault("VECTOR_STORE_PATH", tempfile.mkdtemp(prefix="eval_rag_store_"))
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.db.init_db import init_db
+from app.db.models import MotelMaster, ReportIncident, ReportMaster
+from app.repositories.session import get_session
+from app.services import rag_filters
+from app.services.motel_resolver import MotelRef
+from app.services.report_service import _embedding_payload
+from app.vectorstore import pinecone_client
+
+MOTELS = [("Monticello Inn", "Framingham"), ("Lakeside Motel", "Natick"), ("Harbor View Inn", "Plymouth"),
+          ("Pine Ridge Lodge", "Worcester"), ("Cedar Suites", "Framingham"), ("Bayside Motel", "Quincy")]
+DEPARTMENTS = ["Front Office", "Housekeeping", "Maintenance"]
+INCIDENTS = ["Noise complaint in room {r}", "Guest locked out of room {r}", "Water leak reported in room {r}",
+             "Broken AC unit in room {r}", "Lost key card for room {r}", "Late checkout dispute room {r}"]
+DIM = 1536
+
+
+class _HashingEmbedder:
+    """OpenAI stand-in: feature-hashed bag of words, so similar text gets similar vectors."""
+
+    def __init__(self):
+        self.embeddings = SimpleNamespace(create=self._create)
+
+    @staticmethod
+    def _vector(text: str) -> list:
+        v = np.zeros(DIM, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+            v[h % DIM] += 1.0 if (h >> 32) & 1 else -1.0
+        return (v / (np.linalg.norm(v) or 1)).tolist()
+
+    def _create(self, model, input):
+        inputs = [input] if isinstance(input, str) else input
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=self._vector(t)) for i, t in enumerate(inputs)],
+            usage=SimpleNamespace(prompt_tokens=sum(len(t) // 4 for t in inputs)),
+        )
+
+
+def seed(days: int, end: date, rng: random.Random) -> list:
+    rows = []
+    with get_session() as db:
+        motels = [
+            MotelRef(db.execute(insert(MotelMaster).values(motel_name=name, location=loc).returning(MotelMaster.id)).scalar(), name, loc)
+            for name, loc in MOTELS
+        ]
+        for i in range(days):
+            day = end - timedelta(days=i)
+            for k, motel in enumerate(motels):
+                rows.append({"motel_id": motel.id, "property_name": motel.motel_name, "report_date": day,
+                             "department": DEPARTMENTS[(i + k) % len(DEPARTMENTS)], "auditor": "J. Smith",
+                             "revenue": round(rng.uniform(3000, 20000), 2), "adr": 120.0,
+                             "occupancy": rng.randint(40, 100)})
+        ids = db.scalars(insert(ReportMaster).returning(ReportMaster.id), rows).all()
+        db.execute(insert(ReportIncident), [
+            {"report_id": rid, "description": rng.choice(INCIDENTS).format(r=rng.randint(100, 330))} for rid in ids
+        ])
+        db.commit()
+    return motels
+
+
+def index_all():
+    with get_session() as db:
+        reports = (
+            db.query(ReportMaster)
+            .options(joinedload(ReportMaster.motel_master), selectinload(ReportMaster.vacant_dirty_rooms),
+                     selectinload(ReportMaster.out_of_order_rooms), selectinload(ReportMaster.comp_room_records),
+                     selectinload(ReportMaster.incident_records))
+            .all()
+        )
+        items = [_embedding_payload(MotelRef(r.motel_master.id, r.motel_master.motel_name, r.motel_master.location), r)
+                 for r in reports]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(0, len(items), 500):
+            pinecone_client.index_report_embeddings(items[i:i + 500])
+    return {report_id: meta for report_id, _, meta in items}
+
+
+def question(rng: random.Random, motels: list, today: date) -> tuple:
+    """(question, expected constraints) naming a motel or a location, maybe a department, and a period."""
+    expected = {"motels": [], "locations": [], "departments": [], "date_from": None, "date_to": None}
+    monday = today - timedelta(days=today.weekday())
+    periods = [
+        ("last week", monday - timedelta(days=7), monday - timedelta(days=1)),
+        ("yesterday", today - timedelta(days=1), today - timedelta(days=1)),
+        ("in the past 10 days", today - timedelta(days=9), today),
+        (f"on {today - timedelta(days=20):%B %d, %Y}".replace(" 0", " "), today - timedelta(days=20), today - timedelta(days=20)),
+        (f"in {today - timedelta(days=70):%B %Y}", None, None),
+        ("", None, None),
+    ]
+    period, lo, hi = rng.choice(periods)
+    if period.startswith("in ") and period[3:4].isupper():
+        month = today - timedelta(days=70)
+        lo, hi = rag_filters._month_range(month.year, month.month)
+    expected["date_from"], expected["date_to"] = lo, hi
+
+    if rng.random() < 0.7:
+        motel = rng.choice(motels)
+        # the full name, or the name without "Inn", "Motel", ...
+        short = " ".join(w for w in motel.motel_name.split() if w.lower() not in rag_filters._GENERIC_WORDS)
+        subject = f"at {short if rng.random() < 0.5 else motel.motel_name}"
+        expected["motels"] = [motel.motel_name]
+    else:
+        location = rng.choice(sorted({m.location for m in motels}))
+        subject = f"in {location}"
+        expected["locations"] = [location]
+    dept = ""
+    if rng.random() < 0.4:
+        department = rng.choice(DEPARTMENTS)
+        dept = f" for {department}"
+        expected["departments"] = [department]
+    text = rng.choice(["What incidents were reported {s}{d} {p}?", "Summarize the guest complaints {s}{d} {p}",
+                       "Were there any room issues {s}{d} {p}?"]).format(s=subject, d=dept, p=period)
+    return re.sub(r"\s+", " ", text).replace(" ?", "?").strip(), expected
+
+
+def _keep(meta: dict, c: dict) -> bool:
+    ts = meta.get("report_date_ts")
+    return ((not c["motels"] or meta["motel_name"] in c["motels"])
+            and (not c["locations"] or meta["location"] in c["locations"])
+            and (not c["departments"] or meta["department"] in c["departments"])
+            and (not c["date_from"] or ts >= rag_filters.date_epoch(c["date_from"]))
+            and (not c["date_to"] or ts <= rag_filters.date_epoch(c["date_to"])))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--questions", type=int, default=200)
+    ap.add_argument("--top-k", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = random.Random(11)
+    today = date(2025, 10, 17)
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db()
+    motels = seed(args.days, today - timedelta(days=1), rng)
+    t = time.perf_counter()
+    pinecone_client.client = _HashingEmbedder()
+    meta_by_id = index_all()
+    store = pinecone_client.store
+    print(f"{len(meta_by_id)} reports ({len(motels)} motels × {args.days} days) indexed into {store.name} "
+          f"in {time.perf_counter() - t:.1f}s")
+
+    k = args.top_k
+    stats = {"exact": 0, "plain_p": [], "filt_p": [], "k_needed": [], "plain_chars": [], "filt_chars": [],
+             "extract_ms": [], "plain_ms": [], "filt_ms": [], "empty": 0, "none": 0}
+    for _ in range(args.questions):
+        text, expected = question(rng, motels, today)
+        vector = pinecone_client.client.embeddings.create(model="", input=text).data[0].embedding
+
+        s = time.perf_counter()
+        constraints = rag_filters.extract_constraints(text, today=today)
+        flt = rag_filters.vector_filter(constraints)
+        stats["extract_ms"].append((time.perf_counter() - s) * 1000)
+        stats["exact"] += constraints == expected
+
+        s = time.perf_counter()
+        plain = store.query(vector, top_k=k)
+        stats["plain_ms"].append((time.perf_counter() - s) * 1000)
+        s = time.perf_counter()
+        filtered = store.query(vector, top_k=k, filter=flt)
+        stats["filt_ms"].append((time.perf_counter() - s) * 1000)
+
+        relevant = sum(_keep(meta_by_id[int(m["id"].split("-")[1])], expected) for m in store.query(vector, top_k=len(meta_by_id)))
+        want = min(k, relevant)
+        if not relevant:
+            stats["none"] += 1  # nothing in the corpus matches; a filtered query rightly finds nothing
+            stats["empty"] += bool(filtered)
+            continue
+        stats["empty"] += not filtered
+        stats["plain_p"].append(sum(_keep(m["metadata"], expected) for m in plain) / k)
+        stats["filt_p"].append(sum(_keep(m["metadata"], expected) for m in filtered) / max(1, len(filtered)))
+
+        # how deep the unfiltered ranking must go to collect the same number of matching reports
+        ranked, hits, needed = store.query(vector, top_k=len(meta_by_id)), 0, 0
+        for needed, m in enumerate(ranked, 1):
+            hits += _keep(m["metadata"], expected)
+            if hits >= want:
+                break
+        stats["k_needed"].append(needed)
+        stats["plain_chars"].append(sum(len(m["metadata"]["content"]) for m in ranked[:needed]))
+        stats["filt_chars"].append(sum(len(m["metadata"]["content"]) for m in filtered))
+
+    n = args.questions
+    mean = lambda xs: sum(xs) / len(xs)
+    print(f"{n} questions, top_k={k}")
+    print(f"  constraints extracted exactly: {stats['exact']}/{n}; {stats['none']} ask about reports that do not exist; "
+          f"wrong empty / non-empty filtered results: {stats['empty']}")
+    print(f"  precision@{k}: unfiltered {mean(stats['plain_p']):.2f} → filtered {mean(stats['filt_p']):.2f}")
+    print(f"  top_k needed unfiltered for {k} matching reports: mean {mean(stats['k_needed']):.0f}, "
+          f"max {max(stats['k_needed'])}")
+    print(f"  context chars for {k} matching reports: unfiltered {mean(stats['plain_chars']):,.0f} → "
+          f"filtered {mean(stats['filt_chars']):,.0f}")
+    print(f"  ms per question: extract {mean(stats['extract_ms']):.2f}, query unfiltered "
+          f"{mean(stats['plain_ms']):.2f}, filtered {mean(stats['filt_ms']):.2f}")
+    shutil.rmtree(os.environ["VECTOR_STORE_PATH"], ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Evaluate the LLM input compactor (app/parsers/text_compactor.py).
+
+Builds multi-page sample reports that look like real extracted text: a
+header and footer repeated on every page, "Page i of n" lines, whitespace
+runs, ruled and piped tables, and (for some documents) pages of free-text
+notes that push them over the token budget. For every document it reports
+the tokens saved and checks that:
+
+  * every ground-truth value (figures, room numbers, reasons, actions,
+    incidents) is still present in the compacted text;
+  * the deterministic parser (TemplateReportParser) gives the same fields
+    on raw and compacted text. A document whose changed fields are all
+    wrong on raw text and right on compacted text counts as a fix; any
+    other change is a regression.
+
+With --llm (needs OPENAI_API_KEY) the first --llm-docs documents are also
+parsed by the LLM with and without compaction, and the JSON is compared.
+
+    python -m app.scripts.eval_text_compaction --docs 60
+"""
+import argparse
+import json
+import os
+import random
+
+os.environ.setdefault("OPENAI_API_KEY", "unused-unless---llm")
+
+from app.parsers.template_parser import TemplateReportParser
+from app.parsers.text_compactor import LLM_INPUT_TOKEN_BUDGET, compact_report_text
+from app.scripts.bench_template_parser import _truth
+
+FIELDS = ["report_date", "department", "auditor", "revenue", "adr", "occupancy", "vacant_clean",
+          "vacant_dirty", "out_of_order_rooms_storage", "vacant_dirty_rooms", "out_of_order_rooms", "incidents"]
+RULE = "-" * 78
+
+
+def _header(t: dict, page: int, pages: int, piped: bool) -> list:
+    name = "Monticello Inn, Framingham" if not piped else "Lakeside Motel, Natick"
+    return [f"{name}          DAILY REPORT   {t['report_date']}          Page {page} of {pages}", ""]
+
+
+def _footer(page: int, pages: int) -> list:
+    return ["", "", "Confidential - generated by RoomKey PMS, do not distribute",
+            f"Printed on 10/29/2025 06:{page:02d} AM by NIGHTAUDIT"]
+
+
+def _row(r: dict, piped: bool) -> str:
+    if piped:
+        return f"| {r['room_number']:<6}| {r['reason']:<18}| {r['days']} days   | {r['action']:<20}|"
+    return f"{r['room_number']}     {r['reason']}        {r['days']} days      {r['action']}"
+
+
+def build_report(t: dict, rng: random.Random, piped: bool, notes_pages: int) -> str:
+    summary = [
+        f"Department:      {t['department']}",
+        f"Night Auditor:   {t['auditor']}",
+        f"Revenue:         ${t['revenue']:,.2f}",
+        f"ADR:             {t['adr']:.2f}",
+        f"Occupancy:       {t['occupancy']}%",
+        f"Vacant Clean:    {t['vacant_clean']}",
+        f"Vacant Dirty:    {t['vacant_dirty']}",
+        f"Out of Order/Storage Rooms:   {t['out_of_order_rooms_storage']}",
+        "_" * 60,
+    ]
+    body = []
+    for title, key in (("VACANT DIRTY ROOMS", "vacant_dirty_rooms"), ("OUT OF ORDER ROOMS", "out_of_order_rooms")):
+        body += ["", title, ("+" + "-" * 76 + "+") if piped else RULE, "Room    Reason    Days    Action"]
+        rows = t[key] or []
+        for r in rows:
+            body.append(_row(r, piped))
+            body.append(("+" + "-" * 76 + "+") if piped else RULE)
+        if not rows:
+            body.append("None")
+    body += ["", "INCIDENTS"] + ([i["description"] for i in t["incidents"]] or ["None"])
+
+    # summary page, optional pages of shift notes, then the sections split
+    # over pages of ~12 lines so tables continue across page breaks
+    notes = [
+        [f"Shift note {n}.{k}: guest services log entry, nothing actionable, routine walk-through completed."
+         for k in range(30)]
+        for n in range(notes_pages)
+    ]
+    pages = [summary] + notes + [body[i:i + 12] for i in range(0, len(body), 12)]
+    out = []
+    for i, lines in enumerate(pages, start=1):
+        page = _header(t, i, len(pages), piped) + [ln + " " * rng.randint(0, 6) for ln in lines] + _footer(i, len(pages))
+        out.append("\n".join(page))
+    return "\f".join(out)
+
+
+def _atoms(t: dict) -> list:
+    atoms = [f"{t['revenue']:,.2f}", f"{t['adr']:.2f}", t["auditor"], t["report_date"]]
+    for key in ("vacant_dirty_rooms", "out_of_order_rooms"):
+        for r in t[key]:
+            atoms += [r["room_number"], r["reason"], r["action"]]
+    atoms += [i["description"] for i in t["incidents"]]
+    return atoms
+
+
+def _fields(parsed: dict) -> dict:
+    return {k: parsed.get(k) for k in FIELDS}
+
+
+def _correct(parsed: dict, t: dict, k: str) -> bool:
+    if k in ("revenue", "adr"):
+        return parsed.get(k) is not None and abs(parsed[k] - t[k]) < 0.005
+    return parsed.get(k) == t[k]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=60)
+    ap.add_argument("--budget", type=int, default=None, help="token budget (default LLM_INPUT_TOKEN_BUDGET)")
+    ap.add_argument("--seed", type=int, default=11)
+    ap.add_argument("--llm", action="store_true", help="also compare real LLM parses")
+    ap.add_argument("--llm-docs", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    budget = LLM_INPUT_TOKEN_BUDGET if args.budget is None else args.budget
+    parser = TemplateReportParser()
+    before = after = 0
+    missing, same, fixed, regressed, over_budget = 0, 0, 0, 0, 0
+    docs = []
+
+    for i in range(args.docs):
+        t = _truth(rng, i)
+        piped = i % 4 == 3
+        notes_pages = 12 if i % 5 == 4 else 0
+        raw = build_report(t, rng, piped, notes_pages)
+        compacted, st = compact_report_text(raw, args.budget)
+        docs.append((raw, compacted))
+        before += st["tokens_before"]
+        after += st["tokens_after"]
+        over_budget += 0 < budget < st["tokens_before"]
+
+        lost = [a for a in _atoms(t) if a not in compacted]
+        missing += bool(lost)
+        if lost:
+            print(f"doc {i}: lost {lost}")
+
+        if not piped:
+            p_raw, p_cmp = parser.parse(raw), parser.parse(compacted)
+            changed = [k for k in FIELDS if p_raw.get(k) != p_cmp.get(k)]
+            if not changed:
+                same += 1
+            elif all(_correct(p_cmp, t, k) and not _correct(p_raw, t, k) for k in changed):
+                fixed += 1
+            else:
+                regressed += 1
+                print(f"doc {i}: template parse changed {changed}\n  raw: {_fields(p_raw)}\n  cmp: {_fields(p_cmp)}")
+
+    templated = sum(1 for i in range(args.docs) if i % 4 != 3)
+    print(f"documents: {args.docs} ({over_budget} over the {budget}-token budget before compaction)")
+    print(f"tokens: {before} → {after} (saved {before - after}, {100 * (before - after) / before:.1f}%)")
+    print(f"documents missing a ground-truth value after compaction: {missing}")
+    print(f"template parse on raw vs compacted ({templated} docs): identical {same}, "
+          f"fixed by compaction {fixed}, regressions {regressed}")
+
+    if args.llm:
+        from app.parsers import openai_parser
+        from app.utils import parse_cache
+
+        parse_cache.PARSE_CACHE_ENABLED = False
+        llm = openai_parser.OpenAIReportParser()
+        agree = 0
+        for raw, compacted in docs[: args.llm_docs]:
+            openai_parser.TEXT_COMPACTION = False
+            a = llm.parse(raw)
+            b = llm.parse(compacted)
+            agree += json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+        print(f"LLM parse identical on raw vs compacted: {agree}/{min(args.llm_docs, len(docs))}")
+
+
+if __name__ == "__main__":
+    main()
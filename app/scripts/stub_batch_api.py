@@ -0,0 +1,186 @@
+"""
+Local stand-in for the OpenAI Files and Batch endpoints used by
+app/scripts/backfill_reports.py, so the backfill can be run end to end
+without an API key or batch pricing.
+
+Batches move validating -> in_progress -> completed over a few status
+polls. Chat requests are answered with the template parser's reading of the
+report text in the prompt, and embedding requests with a deterministic
+pseudo-random vector. ``--fail-every N`` makes every Nth request fail so
+error handling can be checked.
+
+    python -m app.scripts.stub_batch_api --port 8765
+    python -m app.scripts.backfill_reports run --from-dir ./sample_reports \\
+        --base-url http://127.0.0.1:8765/v1 --poll 1 --no-upsert
+"""
+import argparse
+import email.policy
+import hashlib
+import json
+import random
+import time
+import uuid
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.parsers.template_parser import TemplateReportParser
+
+FILES: dict = {}
+BATCHES: dict = {}
+POLLS_PER_STATE = 2
+FAIL_EVERY = 0
+
+
+def _file_obj(file_id: str) -> dict:
+    f = FILES[file_id]
+    return {"id": file_id, "object": "file", "bytes": len(f["data"]), "created_at": f["created_at"],
+            "filename": f["filename"], "purpose": f["purpose"], "status": "processed"}
+
+
+def _store_file(data: bytes, filename: str, purpose: str) -> str:
+    file_id = f"file-{uuid.uuid4().hex[:24]}"
+    FILES[file_id] = {"data": data, "filename": filename, "purpose": purpose, "created_at": int(time.time())}
+    return file_id
+
+
+def _chat_body(body: dict) -> dict:
+    prompt = body["messages"][-1]["content"]
+    text = prompt.split("\n\n", 1)[-1]
+    parsed = TemplateReportParser().parse(text)
+    parsed.pop("_confidence", None)
+    prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+    content = json.dumps(parsed)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                  "total_tokens": prompt_tokens + len(content) // 4},
+    }
+
+
+def _embedding_body(body: dict) -> dict:
+    rng = random.Random(hashlib.sha256(body["input"].encode("utf-8")).digest())
+    tokens = len(body["input"]) // 4
+    return {
+        "object": "list", "model": body.get("model"),
+        "data": [{"object": "embedding", "index": 0, "embedding": [rng.uniform(-1, 1) for _ in range(1536)]}],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+def _run_batch(batch: dict):
+    lines = FILES[batch["input_file_id"]]["data"].decode("utf-8").splitlines()
+    out, errors = [], []
+    for n, line in enumerate(filter(None, lines), start=1):
+        req = json.loads(line)
+        if FAIL_EVERY and n % FAIL_EVERY == 0:
+            errors.append({"id": f"batch_req_{n}", "custom_id": req["custom_id"], "response": None,
+                           "error": {"code": "server_error", "message": "simulated failure"}})
+            continue
+        body = _chat_body(req["body"]) if req["url"] == "/v1/chat/completions" else _embedding_body(req["body"])
+        out.append({"id": f"batch_req_{n}", "custom_id": req["custom_id"],
+                    "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": body}, "error": None})
+
+    def jsonl(rows):
+        return "".join(json.dumps(r) + "\n" for r in rows).encode("utf-8")
+
+    batch["output_file_id"] = _store_file(jsonl(out), f"{batch['id']}_output.jsonl", "batch_output")
+    if errors:
+        batch["error_file_id"] = _store_file(jsonl(errors), f"{batch['id']}_errors.jsonl", "batch_output")
+    batch["request_counts"] = {"total": len(out) + len(errors), "completed": len(out), "failed": len(errors)}
+
+
+def _create_batch(req: dict) -> dict:
+    batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+    BATCHES[batch_id] = {
+        "id": batch_id, "object": "batch", "endpoint": req["endpoint"], "errors": None,
+        "input_file_id": req["input_file_id"], "completion_window": req.get("completion_window", "24h"),
+        "status": "validating", "output_file_id": None, "error_file_id": None,
+        "created_at": int(time.time()), "metadata": req.get("metadata"),
+        "request_counts": {"total": 0, "completed": 0, "failed": 0}, "_polls": 0,
+    }
+    return BATCHES[batch_id]
+
+
+def _poll_batch(batch: dict) -> dict:
+    batch["_polls"] += 1
+    if batch["status"] == "validating" and batch["_polls"] >= POLLS_PER_STATE:
+        batch["status"] = "in_progress"
+    elif batch["status"] == "in_progress" and batch["_polls"] >= 2 * POLLS_PER_STATE:
+        _run_batch(batch)
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+    return batch
+
+
+def _multipart(content_type: str, body: bytes) -> dict:
+    msg = BytesParser(policy=email.policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+    )
+    parts = {}
+    for part in msg.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        parts[name] = (part.get_filename(), part.get_payload(decode=True))
+    return parts
+
+
+class Handler(BaseHTTPRequestHandler):
+    def _send(self, status: int, payload, content_type: str = "application/json"):
+        if isinstance(payload, dict):
+            payload = json.dumps({k: v for k, v in payload.items() if not k.startswith("_")})
+        data = payload.encode("utf-8") if isinstance(payload, str) else payload
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self, what: str):
+        self._send(404, {"error": {"message": f"No such {what}", "type": "invalid_request_error"}})
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_POST(self):
+        if self.path == "/v1/files":
+            parts = _multipart(self.headers["Content-Type"], self._body())
+            filename, data = parts["file"]
+            purpose = parts.get("purpose", (None, b"batch"))[1].decode("utf-8")
+            return self._send(200, _file_obj(_store_file(data, filename or "upload.jsonl", purpose)))
+        if self.path == "/v1/batches":
+            req = json.loads(self._body() or b"{}")
+            if req.get("input_file_id") not in FILES:
+                return self._not_found("input file")
+            return self._send(200, _create_batch(req))
+        self._not_found("endpoint")
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 4 and parts[:2] == ["v1", "files"] and parts[3] == "content":
+            f = FILES.get(parts[2])
+            return self._send(200, f["data"], "application/octet-stream") if f else self._not_found("file")
+        if len(parts) == 3 and parts[:2] == ["v1", "batches"]:
+            batch = BATCHES.get(parts[2])
+            return self._send(200, _poll_batch(batch)) if batch else self._not_found("batch")
+        self._not_found("endpoint")
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def main():
+    global FAIL_EVERY, POLLS_PER_STATE
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--fail-every", type=int, default=0, help="fail every Nth request (0 = never)")
+    ap.add_argument("--polls", type=int, default=2, help="status polls spent in each state")
+    args = ap.parse_args()
+    FAIL_EVERY, POLLS_PER_STATE = args.fail_every, args.polls
+    print(f"🧪 Batch API stand-in on http://{args.host}:{args.port}/v1")
+    ThreadingHTTPServer((args.host, args.port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
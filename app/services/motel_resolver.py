@@ -0,0 +1,217 @@
+# app/services/motel_resolver.py
+"""
+Resolves a report's property name to a motel_master row.
+
+There are only a dozen or so motels, so every id is kept in an in-process
+cache keyed by the normalized (name, location). The cache is loaded with a
+single SELECT and reloaded after MOTEL_CACHE_TTL seconds or invalidate().
+A miss inserts the motel with ``INSERT ... ON CONFLICT DO NOTHING RETURNING``
+(Postgres and SQLite), so two ingest Lambdas racing on a new property both
+end up with the same row instead of one failing on the unique motel_name.
+
+Ids of motels inserted in a transaction only reach the cache once that
+transaction commits, and are forgotten if it (or the savepoint they were
+resolved in) rolls back. A cache hit costs no query at all.
+"""
+import os
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.models import MotelMaster
+
+MOTEL_CACHE_TTL = float(os.getenv("MOTEL_CACHE_TTL", "300"))  # seconds; other Lambdas may add motels
+
+_PUNCT_RX = re.compile(r"[^\w\s]+")
+_SPACES_RX = re.compile(r"\s+")
+# "Monticello Inn - Framingham", "Monticello Inn (Framingham)"
+_TRAILING_CITY_RX = re.compile(r"^(?P<name>.+?)\s+(?:[-–—|]\s*(?P<city>[^-–—|()]+)|\((?P<pcity>[^()]+)\))\s*$")
+
+
+class MotelRef(NamedTuple):
+    id: int
+    motel_name: str
+    location: Optional[str]
+
+
+_lock = threading.Lock()
+_by_key: Dict[Tuple[str, str], MotelRef] = {}
+_by_name: Dict[str, MotelRef] = {}
+_loaded_at = 0.0
+_stats = {"hits": 0, "misses": 0, "inserted": 0, "loads": 0}
+
+
+def _norm(s: Optional[str]) -> str:
+    s = (s or "").lower().replace("&", " and ")
+    return _SPACES_RX.sub(" ", _PUNCT_RX.sub(" ", s)).strip()
+
+
+def split_property(property_name: str) -> Tuple[str, Optional[str]]:
+    """
+    Split a property name into (motel name, location): "Monticello Inn,
+    Framingham", "Monticello Inn - Framingham", "Monticello Inn (Framingham)",
+    or "Monticello Inn Framingham" when Framingham is a known location.
+    """
+    text = _SPACES_RX.sub(" ", (property_name or "").strip())
+    with _lock:
+        # a motel stored under its full name, e.g. "Lakeside Inn - Natick", stays that motel
+        if _norm(text) in _by_name:
+            return text, None
+        locations = {ref.location for ref in _by_name.values() if ref.location}
+    parts = [p.strip() for p in text.split(",")]
+    if len(parts) > 1 and parts[0]:
+        return parts[0], parts[1] or None
+    m = _TRAILING_CITY_RX.match(text)
+    if m:
+        return m.group("name").strip(), (m.group("city") or m.group("pcity")).strip()
+    words = text.split(" ")
+    for location in locations:
+        n = len(_norm(location).split())
+        if len(words) > n and _norm(" ".join(words[-n:])) == _norm(location):
+            return " ".join(words[:-n]).rstrip(" ,-"), location
+    return text, None
+
+
+def _remember(ref: MotelRef):
+    _by_key[(_norm(ref.motel_name), _norm(ref.location))] = ref
+    _by_name[_norm(ref.motel_name)] = ref
+
+
+def _load(db) -> None:
+    global _loaded_at
+    rows = db.execute(select(MotelMaster.id, MotelMaster.motel_name, MotelMaster.location)).all()
+    uncommitted = {ref.id for ref, _ in db.info.get("motels_pending", {}).values()}
+    with _lock:
+        _by_key.clear()
+        _by_name.clear()
+        for row in rows:
+            if row.id not in uncommitted:
+                _remember(MotelRef(*row))
+        _loaded_at = time.monotonic()
+        _stats["loads"] += 1
+
+
+def _count(field: str):
+    with _lock:
+        _stats[field] += 1
+
+
+def _lookup(name: str, location: Optional[str]) -> Optional[MotelRef]:
+    with _lock:
+        # motel_name is unique, so the name alone identifies the row
+        return _by_key.get((_norm(name), _norm(location))) or _by_name.get(_norm(name))
+
+
+def _insert_ignore(db, name: str, location: Optional[str]) -> Optional[int]:
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING id; None when the motel already existed."""
+    dialect = db.get_bind().dialect.name
+    values = {"motel_name": name, "location": location}
+    if dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(MotelMaster)
+        stmt = stmt.values(**values).on_conflict_do_nothing(index_elements=["motel_name"]).returning(MotelMaster.id)
+        return db.execute(stmt).scalar()
+    try:
+        with db.begin_nested():
+            return db.execute(insert(MotelMaster).values(**values).returning(MotelMaster.id)).scalar()
+    except IntegrityError:
+        return None  # (the savepoint keeps the caller's transaction usable)
+
+
+def _find(db, name: str) -> Optional[MotelRef]:
+    row = db.execute(
+        select(MotelMaster.id, MotelMaster.motel_name, MotelMaster.location).where(MotelMaster.motel_name == name)
+    ).first()
+    return MotelRef(*row) if row else None
+
+
+def resolve_motel(db, property_name: str) -> MotelRef:
+    """Return the motel for ``property_name``, creating it when it is new."""
+    if MOTEL_CACHE_TTL <= 0 or time.monotonic() - _loaded_at > MOTEL_CACHE_TTL:
+        _load(db)
+    name, location = split_property(property_name)
+
+    pending = db.info.setdefault("motels_pending", {})
+    key = (_norm(name), _norm(location))
+    ref = _lookup(name, location) or pending.get(key, (None,))[0]
+    _count("hits" if ref is not None else "misses")
+    if ref is not None:
+        return ref
+
+    # another process may have added it (possibly spelled differently) since the last load
+    _load(db)
+    name, location = split_property(property_name)  # with the locations just loaded
+    key = (_norm(name), _norm(location))
+    ref = _lookup(name, location)
+    if ref is None:
+        with db.begin_nested():  # a failure here must not abort the caller's transaction
+            new_id = _insert_ignore(db, name, location)
+            if new_id is not None:
+                _count("inserted")
+                print(f"🏨 New motel: {name}" + (f" ({location})" if location else ""))
+                ref = MotelRef(new_id, name, location)
+            else:
+                ref = _find(db, name)  # inserted concurrently by another writer
+    if ref is None:
+        raise RuntimeError(f"Could not resolve motel {property_name!r}")
+    # only cached once the caller's transaction commits; dropped if the
+    # transaction (or the savepoint the caller resolved in) rolls back
+    pending[key] = (ref, db.get_nested_transaction() or db.get_transaction())
+    return ref
+
+
+@event.listens_for(Session, "after_commit")
+def _promote_pending(session):
+    if session.in_nested_transaction():
+        return  # a released savepoint, not the real commit
+    pending = session.info.pop("motels_pending", None)
+    if pending:
+        with _lock:
+            for ref, _ in pending.values():
+                _remember(ref)
+
+
+def _within(scope, transaction) -> bool:
+    while scope is not None:
+        if scope is transaction:
+            return True
+        scope = scope.parent
+    return False
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending(session, previous_transaction):
+    # also fires for a savepoint rollback: forget only the motels resolved inside it
+    pending = session.info.get("motels_pending")
+    if not pending:
+        return
+    for key, (_, scope) in list(pending.items()):
+        if _within(scope, previous_transaction):
+            del pending[key]
+
+
+def known_motels(db) -> List[MotelRef]:
+    """Every motel, from the cache (reloaded when stale)."""
+    if MOTEL_CACHE_TTL <= 0 or time.monotonic() - _loaded_at > MOTEL_CACHE_TTL:
+        _load(db)
+    with _lock:
+        return list(_by_name.values())
+
+
+def invalidate():
+    """Forget every cached motel; the next resolve reloads them."""
+    global _loaded_at
+    with _lock:
+        _by_key.clear()
+        _by_name.clear()
+        _loaded_at = 0.0
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return {**_stats, "cached": len(_by_name)}
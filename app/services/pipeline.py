@@ -0,0 +1,195 @@
+# app/services/pipeline.py
+"""
+Small staged pipeline: each stage has its own worker pool and reads from a
+bounded queue, so a slow stage pushes back on the ones before it instead
+of letting work pile up in memory.
+
+A stage function takes an item and returns the item for the next stage,
+or None to drop it. CPU-bound stages can run their function in a process
+pool (the function and item must then be picklable); when a process pool
+cannot be created (e.g. no /dev/shm in Lambda) the stage runs in-thread.
+
+A stage with ``batch > 1`` receives a list of up to ``batch`` items (waiting
+at most ``batch_wait`` seconds to fill it) and returns a list of the same
+length, one result or None per item.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+    processes: bool = False
+    on_error: Optional[Callable[[Any, Exception], None]] = None
+    batch: int = 1
+    batch_wait: float = 0.5
+
+
+class _StageStats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.mode = "thread"
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.max_depth = 0
+        self._depth_sum = 0
+        self._depth_samples = 0
+        self._lock = threading.Lock()
+
+    def record(self, depth: int, busy: float, outcome: str):
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_sum += depth
+            self._depth_samples += 1
+            self.busy += busy
+            if outcome == "ok":
+                self.processed += 1
+            elif outcome == "dropped":
+                self.dropped += 1
+            else:
+                self.errors += 1
+
+    def as_dict(self, wall: float) -> Dict[str, Any]:
+        handled = self.processed + self.dropped + self.errors
+        return {
+            "workers": self.workers,
+            "mode": self.mode,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "busy_s": round(self.busy, 3),
+            "throughput_per_s": round(handled / wall, 3) if wall > 0 else 0.0,
+            "utilization": round(self.busy / (wall * self.workers), 3) if wall > 0 else 0.0,
+            "avg_queue_depth": round(self._depth_sum / self._depth_samples, 2) if self._depth_samples else 0.0,
+            "max_queue_depth": self.max_depth,
+        }
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage], queue_size: int = 8):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+
+    def run(self, source: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """Push every item from ``source`` through the stages; return per-stage stats."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        stats = [_StageStats(s.name, max(1, s.workers)) for s in self.stages]
+        pools: List[Optional[ProcessPoolExecutor]] = [self._open_pool(s, st) for s, st in zip(self.stages, stats)]
+        active = [max(1, s.workers) for s in self.stages]
+        active_lock = threading.Lock()
+
+        def call(i: int, item: Any) -> Any:
+            pool = pools[i]
+            if pool is not None:
+                try:
+                    return pool.submit(self.stages[i].fn, item).result()
+                except BrokenProcessPool:
+                    LOGGER.warning("[Pipeline] %s process pool broke; continuing in-thread", self.stages[i].name)
+                    pools[i] = None
+                    stats[i].mode = "thread (fallback)"
+            return self.stages[i].fn(item)
+
+        def take_batch(stage: Stage, inq: queue.Queue, first: Any) -> tuple:
+            """Fill a batch after ``first``; returns (items, whether _DONE was seen)."""
+            items = [first]
+            deadline = time.monotonic() + stage.batch_wait
+            while len(items) < stage.batch:
+                try:
+                    item = inq.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    return items, True
+                items.append(item)
+            return items, False
+
+        def worker(i: int):
+            stage, inq = self.stages[i], queues[i]
+            outq = queues[i + 1] if i + 1 < len(queues) else None
+            done = False
+            try:
+                while not done:
+                    depth = inq.qsize()
+                    item = inq.get()
+                    if item is _DONE:
+                        break
+                    if stage.batch > 1:
+                        items, done = take_batch(stage, inq, item)
+                    else:
+                        items = [item]
+                    start = time.perf_counter()
+                    try:
+                        results = call(i, items) if stage.batch > 1 else [call(i, item)]
+                        outcomes = ["ok" if r is not None else "dropped" for r in results]
+                    except Exception as e:
+                        LOGGER.exception("[Pipeline] stage %s failed", stage.name)
+                        results, outcomes = [None] * len(items), ["error"] * len(items)
+                        for failed in items if stage.on_error else []:
+                            try:
+                                stage.on_error(failed, e)
+                            except Exception:
+                                LOGGER.exception("[Pipeline] on_error of stage %s failed", stage.name)
+                    busy = (time.perf_counter() - start) / len(items)
+                    for result, outcome in zip(results, outcomes):
+                        stats[i].record(depth, busy, outcome)
+                        if result is not None and outq is not None:
+                            outq.put(result)
+            finally:
+                # however the worker ends, the stage must still shut down so run() can join
+                inq.put(_DONE)  # let sibling workers see it too
+                with active_lock:
+                    active[i] -= 1
+                    last = active[i] == 0
+                if last and outq is not None:
+                    outq.put(_DONE)
+
+        threads = [
+            threading.Thread(target=worker, args=(i,), name=f"{s.name}-{n}", daemon=True)
+            for i, s in enumerate(self.stages)
+            for n in range(max(1, s.workers))
+        ]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        try:
+            for item in source:
+                queues[0].put(item)  # blocks when the first stage is saturated
+        finally:
+            queues[0].put(_DONE)
+            for t in threads:
+                t.join()
+            for pool in pools:
+                if pool is not None:
+                    pool.shutdown()
+
+        wall = time.perf_counter() - started
+        return {st.name: st.as_dict(wall) for st in stats}
+
+    @staticmethod
+    def _open_pool(stage: Stage, stats: _StageStats) -> Optional[ProcessPoolExecutor]:
+        if not stage.processes:
+            return None
+        try:
+            pool = ProcessPoolExecutor(max_workers=max(1, stage.workers))
+            stats.mode = "process"
+            return pool
+        except (OSError, NotImplementedError, ImportError) as e:
+            LOGGER.warning("[Pipeline] no process pool for %s (%s); running in-thread", stage.name, e)
+            stats.mode = "thread (fallback)"
+            return None
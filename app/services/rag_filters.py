@@ -0,0 +1,275 @@
+# app/services/rag_filters.py
+"""
+Structured constraints for RAG retrieval, taken from the question itself.
+
+``extract_constraints`` finds the motels (matched against motel_master; a
+generic word such as "Inn" may be left out unless what remains is an
+ordinary word, as "days" is for Days Inn), locations and departments
+the question names, and the date range it asks about: "on 2025-03-04",
+"10/2/2025", "March 4", "March 2025", "in 2024", "yesterday", "last
+week", "this month", "past 14 days", "since Jan 5", "between March 1 and
+March 15", "in 2024 before June", ... ``vector_filter`` turns them into a
+vector-store metadata filter (dates compare against the numeric
+``report_date_ts`` metadata).
+
+Only known values are matched, with plain string and regex matching, so
+this adds no model call and no noticeable latency to a chat request.
+"""
+import calendar
+import re
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.repositories.session import get_session
+from app.db.models import ReportMaster
+from app.services.motel_resolver import MotelRef, _norm, known_motels
+
+_VOCAB_TTL = 300.0  # seconds between reloads of the department list
+_GENERIC_WORDS = {"inn", "motel", "hotel", "suites", "suite", "lodge", "resort", "the", "and", "by", "at", "of"}
+# a one-word short name that is also an ordinary or date word ("Days Inn" → "days") would match
+# "in the last 7 days", so such motels are only matched by their full name
+_COMMON_WORDS = set(
+    "day days daily week weeks weekly weekend month months monthly year years yearly today night nights "
+    "morning evening time last next past this best better good great plus super comfort quality value "
+    "budget economy express star first home stay rest sleep guest guests room rooms clean dirty town city "
+    "country park garden grand royal national american travel traveler travelers report reports "
+    "revenue occupancy incident incidents front office order".split()
+    + [m.lower() for m in calendar.month_name[1:]] + [d.lower() for d in calendar.day_name]
+)
+
+_MONTH_RX = (r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+             r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?")
+_DAY_RX = r"(\d{1,2})(?:st|nd|rd|th)?"
+_PATTERNS = [
+    ("ymd", re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")),
+    ("mdy", re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})\b")),
+    ("month_day", re.compile(rf"\b{_MONTH_RX}\s+{_DAY_RX}(?:,?\s+(\d{{4}}))?\b")),
+    ("day_month", re.compile(rf"\b{_DAY_RX}\s+(?:of\s+)?{_MONTH_RX}(?:,?\s+(\d{{4}}))?\b")),
+    ("month_year", re.compile(rf"\b{_MONTH_RX},?\s+(\d{{4}})\b")),
+    ("relative", re.compile(r"\b(today|yesterday|(?:this|last|previous|past) (?:week|month|year))\b")),
+    ("last_n", re.compile(r"\b(?:last|past|previous) (\d{1,3}) (days?|weeks?|months?)\b")),
+    ("years", re.compile(r"\b(?:in|during|for|between|from) (20\d{2}) ?(?:and|to|through|-|–|vs\.?|versus) ?(20\d{2})\b")),
+    ("year", re.compile(r"\b(?:in|during|for|since|from|until|before|after|of) (20\d{2})\b")),
+    ("month", re.compile(rf"\b{_MONTH_RX}(?!\w)")),
+]
+# a keyword right before a single date turns it into an open range
+_FROM_RX = re.compile(r"\b(since|after|from|starting(?: on| from)?)\s+(?:the\s+)?$")
+_TO_RX = re.compile(r"\b(before|until|till|through|up to|by)\s+(?:the\s+)?$")
+_MONTH_CONTEXT_RX = re.compile(r"\b(in|during|for|of|since|from|until|before|after|through)\s+$")
+# two dates that together make one range: "between A and B", "from A to B", "A vs B"
+_RANGE_START_RX = re.compile(r"\b(between|from)\s+(?:the\s+)?$")
+_RANGE_JOIN_RX = re.compile(r"^\s*(and|to|through|until|till|-|–)\s+(?:the\s+)?$")
+_COMPARE_RX = re.compile(r"^\s*(vs\.?|versus|compared (?:to|with))\s+(?:the\s+)?$")
+# the group holding an explicit year, per pattern
+_YEAR_GROUP = {"ymd": (1,), "month_day": (3,), "day_month": (3,), "month_year": (2,), "year": (1,)}
+
+_vocab_lock = threading.Lock()
+_departments: List[str] = []
+_departments_at = 0.0
+
+
+def date_epoch(d: date) -> int:
+    """Seconds since the epoch at midnight UTC of ``d`` (the report_date_ts metadata)."""
+    return calendar.timegm(d.timetuple())
+
+
+def _month(token: str) -> int:
+    token = token.rstrip(".")[:3]
+    return [m[:3].lower() for m in calendar.month_name].index(token)
+
+
+def _month_range(year: int, month: int) -> Tuple[date, date]:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _recent_year(month: int, day: int, today: date) -> int:
+    """The year of the latest (month, day) not after today."""
+    return today.year if (month, day) <= (today.month, today.day) else today.year - 1
+
+
+def _mention(kind: str, m: re.Match, q: str, today: date, year: Optional[int]) -> Optional[Tuple[date, date]]:
+    """The dates one match covers; ``year`` is the year the question names, for "June" or "March 4"."""
+    g = m.groups()
+    if kind == "ymd":
+        d = date(int(g[0]), int(g[1]), int(g[2]))
+        return d, d
+    if kind == "mdy":
+        year = int(g[2]) + (2000 if len(g[2]) == 2 else 0)
+        d = date(year, int(g[0]), int(g[1]))
+        return d, d
+    if kind in ("month_day", "day_month"):
+        month, day = (_month(g[0]), int(g[1])) if kind == "month_day" else (_month(g[1]), int(g[0]))
+        d = date(int(g[2]) if g[2] else year or _recent_year(month, day, today), month, day)
+        return d, d
+    if kind == "month_year":
+        return _month_range(int(g[1]), _month(g[0]))
+    if kind == "relative":
+        phrase = g[0].replace("previous", "last").replace("past", "last")
+        if phrase == "today":
+            return today, today
+        if phrase == "yesterday":
+            return today - timedelta(days=1), today - timedelta(days=1)
+        monday = today - timedelta(days=today.weekday())
+        first = today.replace(day=1)
+        return {
+            "this week": (monday, today),
+            "last week": (monday - timedelta(days=7), monday - timedelta(days=1)),
+            "this month": (first, today),
+            "last month": _month_range((first - timedelta(days=1)).year, (first - timedelta(days=1)).month),
+            "this year": (date(today.year, 1, 1), today),
+            "last year": (date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)),
+        }[phrase]
+    if kind == "last_n":
+        n, unit = int(g[0]), g[1].rstrip("s")
+        days = n * {"day": 1, "week": 7, "month": 30}[unit]
+        return today - timedelta(days=days - 1), today
+    if kind == "years":
+        return date(min(int(g[0]), int(g[1])), 1, 1), date(max(int(g[0]), int(g[1])), 12, 31)
+    if kind == "year":
+        return date(int(g[0]), 1, 1), date(int(g[0]), 12, 31)
+    if kind == "month":
+        # a bare month name; "may" and "mar" only count after "in", "during", ...
+        if g[0] in ("may", "mar") and not _MONTH_CONTEXT_RX.search(q[:m.start()]):
+            return None
+        month = _month(g[0])
+        return _month_range(year or (today.year if month <= today.month else today.year - 1), month)
+    return None
+
+
+def _open_ended(q: str, start: int, lo: date, hi: date) -> Tuple[Optional[date], Optional[date]]:
+    """Apply a "since", "after", "before", "until" ... right before the mention."""
+    opens, closes = _FROM_RX.search(q[:start]), _TO_RX.search(q[:start])
+    if opens:
+        return (hi + timedelta(days=1) if opens.group(1) == "after" else lo), None
+    if closes:
+        return None, (lo - timedelta(days=1) if closes.group(1) == "before" else hi)
+    return lo, hi
+
+
+def extract_date_range(question: str, today: Optional[date] = None) -> Tuple[Optional[date], Optional[date]]:
+    """
+    The (first, last) report date the question asks about; either end may be
+    open (None). Two dates joined as "between A and B", "from A to B" or
+    "A vs B" make one range; other mentions must all hold ("in 2024 before
+    June"), and when they cannot, no date constraint is returned.
+    """
+    today = today or date.today()
+    q = question.lower()
+    taken: List[Tuple[int, int]] = []
+    found: List[Tuple[str, re.Match]] = []
+    for kind, rx in _PATTERNS:
+        for m in rx.finditer(q):
+            if not any(m.start() < end and start < m.end() for start, end in taken):
+                taken.append((m.start(), m.end()))
+                found.append((kind, m))
+    # "June" or "March 4" in a question that names one year ("in 2024", "March 15, 2024") means that year's
+    years = {int(m.group(i)) for kind, m in found for i in _YEAR_GROUP.get(kind, ()) if m.group(i)}
+    year = years.pop() if len(years) == 1 else None
+
+    mentions: List[Tuple[int, int, date, date]] = []
+    for kind, m in found:
+        try:
+            dates = _mention(kind, m, q, today, year)
+        except ValueError:  # e.g. February 30
+            dates = None
+        if dates:
+            # "in 2024" matches with its keyword; the year itself is the mention
+            mentions.append((m.start(1) if kind == "year" else m.start(), m.end(), *dates))
+    if not mentions:
+        return None, None
+    mentions.sort()
+
+    ranges: List[Tuple[Optional[date], Optional[date]]] = []
+    i = 0
+    while i < len(mentions):
+        start, end, lo, hi = mentions[i]
+        if i + 1 < len(mentions):
+            between = q[end:mentions[i + 1][0]]
+            if _COMPARE_RX.match(between) or (_RANGE_JOIN_RX.match(between) and _RANGE_START_RX.search(q[:start])):
+                ranges.append((min(lo, mentions[i + 1][2]), max(hi, mentions[i + 1][3])))
+                i += 2
+                continue
+        ranges.append(_open_ended(q, start, lo, hi))
+        i += 1
+
+    los = [lo for lo, _ in ranges if lo]
+    his = [hi for _, hi in ranges if hi]
+    lo, hi = max(los) if los else None, min(his) if his else None
+    if lo and hi and lo > hi:
+        return None, None  # contradictory ("in 2023 after 2024"); don't guess
+    return lo, hi
+
+
+def _known_departments() -> List[str]:
+    global _departments, _departments_at
+    with _vocab_lock:
+        if time.monotonic() - _departments_at > _VOCAB_TTL:
+            with get_session() as db:
+                rows = db.query(ReportMaster.department).filter(ReportMaster.department.isnot(None)).distinct().all()
+            _departments = sorted({d for (d,) in rows if d and d.strip()})
+            _departments_at = time.monotonic()
+        return list(_departments)
+
+
+def _mentions(question: str, phrase: str) -> bool:
+    return bool(phrase) and re.search(rf"\b{re.escape(phrase)}\b", question) is not None
+
+
+def _motel_phrases(motel: MotelRef) -> List[str]:
+    full = _norm(motel.motel_name)
+    short = " ".join(w for w in full.split() if w not in _GENERIC_WORDS)
+    if len(short) < 4 or short == full or short in _COMMON_WORDS:
+        return [full]
+    return [full, short]
+
+
+def extract_constraints(question: str, today: Optional[date] = None) -> Dict[str, Any]:
+    """Motels, locations, departments and date range named in ``question``."""
+    q = _norm(question)
+    with get_session() as db:
+        motels = known_motels(db)
+    matched = [m for m in motels if any(_mentions(q, p) for p in _motel_phrases(m))]
+    locations = sorted({m.location for m in motels if m.location and _mentions(q, _norm(m.location))})
+    departments = [d for d in _known_departments() if _mentions(q, _norm(d))]
+    date_from, date_to = extract_date_range(question, today)
+    return {
+        "motels": sorted({m.motel_name for m in matched}),
+        # a named motel already pins the location
+        "locations": [] if matched else locations,
+        "departments": departments,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+
+
+def vector_filter(constraints: Dict[str, Any]) -> Optional[dict]:
+    """A metadata filter for VectorStore.query, or None when nothing was constrained."""
+    parts = []
+    if constraints.get("motels"):
+        parts.append({"motel_name": {"$in": constraints["motels"]}})
+    if constraints.get("locations"):
+        parts.append({"location": {"$in": constraints["locations"]}})
+    if constraints.get("departments"):
+        parts.append({"department": {"$in": constraints["departments"]}})
+    if constraints.get("date_from"):
+        parts.append({"report_date_ts": {"$gte": date_epoch(constraints["date_from"])}})
+    if constraints.get("date_to"):
+        parts.append({"report_date_ts": {"$lte": date_epoch(constraints["date_to"])}})
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else {"$and": parts}
+
+
+def describe(constraints: Dict[str, Any]) -> str:
+    """Human-readable summary, e.g. "Monticello Inn, Housekeeping, 2025-03-01 to 2025-03-07"."""
+    bits = [", ".join(constraints.get(k) or []) for k in ("motels", "locations", "departments")]
+    lo, hi = constraints.get("date_from"), constraints.get("date_to")
+    if lo and hi:
+        bits.append(str(lo) if lo == hi else f"{lo} to {hi}")
+    elif lo:
+        bits.append(f"since {lo}")
+    elif hi:
+        bits.append(f"until {hi}")
+    return ", ".join(b for b in bits if b)
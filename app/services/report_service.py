@@ -1,28 +1,46 @@
+import os
 import re
 import uuid
+import hashlib
+import threading
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
 
-from app.utils.gmail_client import fetch_all_emails, fetch_recent_emails
+from app.utils.gmail_client import iter_all_emails, iter_recent_emails, iter_new_emails
 from app.utils.whitelist_manager import is_whitelisted
 from app.parsers.pdf_text import extract_text_from_pdf
 from app.parsers.docx_text import extract_text_from_docx
-from app.parsers.openai_parser import OpenAIReportParser
+from app.parsers import openai_parser
+from app.parsers.openai_parser import OpenAIReportParser, LLM_MAX_CONCURRENCY
+from app.parsers.template_parser import TemplateReportParser
 
-from app.vectorstore.pinecone_client import upsert_report_embedding
+from app.services.pipeline import Pipeline, Stage
+from app.services.motel_resolver import MotelRef, resolve_motel
+from app.services.rag_filters import date_epoch
+from app.services import vector_outbox
+from app.utils import text_cache, embedding_cache
 
-from app.repositories.session import get_session
+from sqlalchemy import insert, inspect as sa_inspect
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.repositories.session import get_session, write_transaction
 from app.db.models import (
-    MotelMaster,
     ReportMaster,
     ReportVacantDirtyRoom,
     ReportOutOfOrderRoom,
     ReportCompRoom,
     ReportIncident,
+    GmailSyncState,
+    ProcessedMessage,
+    ProcessedAttachment,
 )
 
 DATE_RX = re.compile(r"(\d{2}[-/]\d{2}[-/]\d{2,4})")
 
+# Reports whose template parse scores at least this skip the LLM entirely
+TEMPLATE_CONFIDENCE_THRESHOLD = float(os.getenv("TEMPLATE_CONFIDENCE_THRESHOLD", "0.9"))
+
 
 def _normalize_date(s: str | None) -> Optional[datetime.date]:
     if not s:
@@ -52,84 +70,137 @@ def _first_nonempty(*vals):
     return None
 
 
-# def _split_property(property_name: str) -> tuple[str, Optional[str]]:
-#     """Split 'Monticello Inn, Framingham' → ('Monticello Inn', 'Framingham')."""
-#     parts = [p.strip() for p in property_name.split(",")]
-#     motel = parts[0] if parts else property_name.strip()
-#     location = parts[1] if len(parts) > 1 else None
-#     return motel, location
+def _room_row(report_id: int, item: dict) -> dict:
+    return {
+        "report_id": report_id,
+        "room_number": str(item.get("room_number") or "").strip(),
+        "reason": (item.get("reason") or None),
+        "days": int(item.get("days") or 0),
+        "action": (item.get("action") or None),
+    }
 
 
-def _split_property(property_name: str):
-    """Split property_name into motel_name and location if comma-separated."""
-    parts = [p.strip() for p in (property_name or "").split(",")]
-    motel_name = parts[0] if parts else property_name
-    location = parts[1] if len(parts) > 1 else None
-    return motel_name, location
+def _child_rows(report_id: int, parsed: dict) -> Dict[type, List[dict]]:
+    """Child rows of one report as plain mappings, per model."""
+    return {
+        ReportVacantDirtyRoom: [_room_row(report_id, item) for item in parsed.get("vacant_dirty_rooms") or []],
+        ReportOutOfOrderRoom: [_room_row(report_id, item) for item in parsed.get("out_of_order_rooms") or []],
+        ReportCompRoom: [
+            {"report_id": report_id, "room_number": str(item.get("room_number") or "").strip(), "notes": (item.get("notes") or None)}
+            for item in parsed.get("comp_rooms") or []
+        ],
+        ReportIncident: [
+            {"report_id": report_id, "description": item.get("description")}
+            for item in parsed.get("incidents") or []
+            if item.get("description")
+        ],
+    }
 
 
-def _ensure_motel(db, property_name: str) -> MotelMaster:
-    """
-    Ensures a motel record exists. If not, creates one.
-    Uses auto-increment integer primary key instead of UUID.
-    """
-    motel_name, location = _split_property(property_name)
+def _insert_children(db, report_id: int, parsed: dict):
+    # one executemany per child table instead of one INSERT per row
+    for model, rows in _child_rows(report_id, parsed).items():
+        if rows:
+            db.execute(insert(model), rows)
+
+
+def _load_history_id(mailbox: str = "me") -> Optional[str]:
+    with get_session() as db:
+        state = db.query(GmailSyncState).filter(GmailSyncState.mailbox == mailbox).first()
+        return state.history_id if state else None
+
+
+def _save_history_id(history_id: Optional[str], mailbox: str = "me") -> None:
+    if not history_id:
+        return
+    with get_session() as db:
+        state = db.query(GmailSyncState).filter(GmailSyncState.mailbox == mailbox).first()
+        if not state:
+            state = GmailSyncState(mailbox=mailbox)
+            db.add(state)
+        state.history_id = history_id
+        state.updated_at = datetime.utcnow()
+        db.commit()
+
+
+def _processed_message_ids(msg_ids: List[str]) -> set:
+    """Return the subset of ``msg_ids`` already recorded in the ledger."""
+    done = set()
+    with get_session() as db:
+        for i in range(0, len(msg_ids), 500):
+            chunk = msg_ids[i:i + 500]
+            rows = (
+                db.query(ProcessedMessage.gmail_message_id)
+                .filter(ProcessedMessage.gmail_message_id.in_(chunk))
+                .all()
+            )
+            done.update(r[0] for r in rows)
+    return done
 
-    # ✅ Search by motel_name and location (instead of UUID)
-    query = db.query(MotelMaster).filter(MotelMaster.motel_name == motel_name)
-    if location:
-        query = query.filter(MotelMaster.location == location)
 
-    m = query.first()
-    if m:
-        return m
+def _find_processed_attachment(sha256: str) -> Optional[ProcessedAttachment]:
+    with get_session() as db:
+        row = db.get(ProcessedAttachment, sha256)
+        if row:
+            db.expunge(row)
+        return row
 
-    # ✅ Create new motel entry (id is auto-generated by DB)
-    m = MotelMaster(
-        motel_name=motel_name,
-        location=location
+
+def _dialect_insert(db):
+    """The Postgres/SQLite insert() with ON CONFLICT support, or None on other backends."""
+    return {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(db.get_bind().dialect.name)
+
+
+def _record_attachment(db, sha256: str, msg_id: str | None, filename: str, report_id: int | None, status: str) -> None:
+    """Add the attachment to the ledger within the caller's transaction."""
+    values = {
+        "gmail_message_id": msg_id,
+        "filename": filename,
+        "report_id": report_id,
+        "status": status,
+        "processed_at": datetime.utcnow(),
+    }
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is None:
+        db.merge(ProcessedAttachment(sha256=sha256, **values))
+        return
+    # upsert in one statement; two workers may record the same attachment at once
+    db.execute(
+        dialect_insert(ProcessedAttachment)
+        .values(sha256=sha256, **values)
+        .on_conflict_do_update(index_elements=["sha256"], set_=values)
     )
-    db.add(m)
-    db.flush()  # ensures m.id is available immediately
-    return m
 
 
-def _insert_children(db, report_id: int, parsed: dict):
-    for item in parsed.get("vacant_dirty_rooms") or []:
-        db.add(
-            ReportVacantDirtyRoom(
-                report_id=report_id,
-                room_number=str(item.get("room_number") or "").strip(),
-                reason=(item.get("reason") or None),
-                days=int(item.get("days") or 0),
-                action=(item.get("action") or None),
-            )
-        )
-    for item in parsed.get("out_of_order_rooms") or []:
-        db.add(
-            ReportOutOfOrderRoom(
-                report_id=report_id,
-                room_number=str(item.get("room_number") or "").strip(),
-                reason=(item.get("reason") or None),
-                days=int(item.get("days") or 0),
-                action=(item.get("action") or None),
-            )
-        )
-    for item in parsed.get("comp_rooms") or []:
-        db.add(
-            ReportCompRoom(
-                report_id=report_id,
-                room_number=str(item.get("room_number") or "").strip(),
-                notes=(item.get("notes") or None),
+def _record_message(msg_id: str | None) -> None:
+    if not msg_id:
+        return
+    with get_session() as db:
+        db.merge(ProcessedMessage(gmail_message_id=msg_id, processed_at=datetime.utcnow(), status="processed"))
+        db.commit()
+
+
+def _record_skipped_messages(skipped: List[Tuple[str, str]]) -> None:
+    """Record checked messages that hold no report as (msg_id, reason), in one transaction."""
+    if not skipped:
+        return
+    now = datetime.utcnow()
+    with get_session() as db:
+        dialect_insert = _dialect_insert(db)
+        for msg_id, reason in skipped:
+            values = {"processed_at": now, "status": reason}
+            if dialect_insert is None:
+                db.merge(ProcessedMessage(gmail_message_id=msg_id, **values))
+                continue
+            db.execute(
+                dialect_insert(ProcessedMessage)
+                .values(gmail_message_id=msg_id, **values)
+                .on_conflict_do_update(index_elements=["gmail_message_id"], set_=values)
             )
-        )
-    for item in parsed.get("incidents") or []:
-        desc = item.get("description") or None
-        if desc:
-            db.add(ReportIncident(report_id=report_id, description=desc))
+        db.commit()
 
 
-def parse_report_text(text: str) -> dict:
+def _rough_parse(text: str) -> dict:
     lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
     prop = None
     for ln in lines[:5]:
@@ -141,7 +212,7 @@ def parse_report_text(text: str) -> dict:
     if m:
         date_str = m.group(1)
 
-    rough = {
+    return {
         "property_name": prop,
         "report_date": date_str,
         "department": None,
@@ -158,8 +229,21 @@ def parse_report_text(text: str) -> dict:
         "incidents": [],
     }
 
-    ai = OpenAIReportParser().parse(text, metadata=None) or {}
-    parsed = {
+
+def template_parse(text: str) -> tuple[Optional[dict], dict]:
+    """Template fast path: (parsed, confidence) — parsed is None when the LLM is needed."""
+    fast = TemplateReportParser().parse(text, metadata=None)
+    confidence = fast.pop("_confidence")
+    if confidence["overall"] >= TEMPLATE_CONFIDENCE_THRESHOLD:
+        print(f"⚡ Template '{confidence['template']}' parse (confidence {confidence['overall']}) — skipping LLM")
+        return fast, confidence
+    return None, confidence
+
+
+def merge_parsed(text: str, ai: dict, parsed_by: str, confidence: float) -> dict:
+    """Combine a template/LLM result with the rough regex fallback."""
+    rough = _rough_parse(text)
+    return {
         "property_name": _first_nonempty(ai.get("property_name"), rough["property_name"]),
         "report_date": _first_nonempty(ai.get("report_date"), rough["report_date"]),
         "department": ai.get("department"),
@@ -174,8 +258,323 @@ def parse_report_text(text: str) -> dict:
         "out_of_order_rooms": ai.get("out_of_order_rooms") or [],
         "comp_rooms": ai.get("comp_rooms") or [],
         "incidents": ai.get("incidents") or [],
+        "parsed_by": parsed_by,
+        "confidence": confidence,
+    }
+
+
+def parse_report_text(text: str) -> dict:
+    fast, confidence = template_parse(text)
+    if fast is not None:
+        ai, parsed_by = fast, f"template:{confidence['template']}"
+    else:
+        # an LLMParseError propagates: the parse stage fails, so nothing is stored and the ledger does not advance
+        ai, parsed_by = OpenAIReportParser().parse(text, metadata=None) or {}, "llm"
+    return merge_parsed(text, ai, parsed_by, confidence["overall"])
+
+
+def _rows_text(rows, *fields) -> str:
+    """Child rows as "101, Late checkout, 1, Clean AM; 102, ..." in insertion order."""
+    lines = [
+        ", ".join(str(getattr(r, f)) for f in fields if getattr(r, f) not in (None, ""))
+        for r in sorted(rows, key=lambda r: r.id)
+    ]
+    return "; ".join(lines) or "None"
+
+
+def _embedding_payload(motel: MotelRef, master: ReportMaster) -> tuple:
+    """(report id, text to embed, metadata) for a stored report."""
+    # Prepare text to embed; rendered the same way every time so the embedding cache can match it
+    text_for_embedding = f"""
+            Motel: {motel.motel_name}
+            Report Date: {master.report_date}
+            Location: {motel.location}
+            Department: {master.department}
+            Auditor: {master.auditor}
+            Revenue: {master.revenue}
+            ADR: {master.adr}
+            Occupancy: {master.occupancy}
+            Vacant Clean: {master.vacant_clean}
+            Vacant Dirty: {master.vacant_dirty}
+            Out Of Order/Storage rooms: {master.out_of_order_storage_rooms}
+            Complimentary Rooms: {_rows_text(master.comp_room_records, "room_number", "notes")}
+            Incidents: {_rows_text(master.incident_records, "description")}
+            Vacant/Dirty Rooms: {_rows_text(master.vacant_dirty_rooms, "room_number", "reason", "days", "action")}
+            Out Of Order Rooms: {_rows_text(master.out_of_order_rooms, "room_number", "reason", "days", "action")}
+            """
+    text_for_embedding = embedding_cache.canonical_text(text_for_embedding)
+
+    # Create metadata to store with the vector
+    metadata = {
+        "motel_name": motel.motel_name,
+        "location": motel.location or "",
+        "department": master.department or "",
+        "auditor": master.auditor or "",
+        "report_date": str(master.report_date) if master.report_date else "",
+        "content": text_for_embedding[:4000]
+    }
+    if master.report_date:
+        # numeric, so retrieval can filter on a date range (rag_filters.vector_filter)
+        metadata["report_date_ts"] = date_epoch(master.report_date)
+    return (master.id, text_for_embedding, metadata)
+
+
+def _property_name(parsed: dict, subject: str) -> str:
+    return parsed.get("property_name") or subject.strip() or "Unknown Property"
+
+
+def _number(parsed: dict, key: str, cast):
+    return cast(parsed.get(key)) if parsed.get(key) not in (None, "") else cast(0)
+
+
+def _report_values(motel: MotelRef, parsed: dict, report_dt) -> Dict[str, Any]:
+    return {
+        "motel_id": motel.id,
+        "property_name": motel.motel_name,
+        "report_date": report_dt,
+        "department": parsed.get("department"),
+        "auditor": parsed.get("auditor"),
+        "revenue": _number(parsed, "revenue", float),
+        "adr": _number(parsed, "adr", float),
+        "occupancy": _number(parsed, "occupancy", int),
+        "vacant_clean": _number(parsed, "vacant_clean", int),
+        "vacant_dirty": _number(parsed, "vacant_dirty", int),
+        "out_of_order_storage_rooms": _number(parsed, "out_of_order_rooms_storage", int),
+        "created_at": datetime.utcnow(),
     }
-    return parsed
+
+
+_upsert_ready: Optional[bool] = None
+
+
+def _can_upsert(db) -> bool:
+    """ON CONFLICT needs Postgres/SQLite and the (motel_id, report_date) unique index."""
+    global _upsert_ready
+    if _upsert_ready is None:
+        _upsert_ready = _dialect_insert(db) is not None and any(
+            ix["name"] == "uq_report_motel_date" for ix in sa_inspect(db.connection()).get_indexes(ReportMaster.__tablename__)
+        )
+        if not _upsert_ready:
+            print("⚠️ No unique (motel_id, report_date) index; checking for duplicate reports before insert")
+    return _upsert_ready
+
+
+def _insert_master(db, values: Dict[str, Any]) -> Optional[ReportMaster]:
+    """
+    Insert the report row unless one exists for that motel and date, in a
+    single statement. Returns the new ReportMaster, or None for a duplicate.
+    """
+    if _can_upsert(db):
+        stmt = (
+            _dialect_insert(db)(ReportMaster)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=["motel_id", "report_date"])
+            .returning(ReportMaster)
+        )
+        return db.scalars(stmt).first()
+
+    existing = (
+        db.query(ReportMaster.id)
+        .filter(ReportMaster.motel_id == values["motel_id"])
+        .filter(ReportMaster.report_date == values["report_date"])
+        .first()
+    )
+    if existing:
+        return None
+    master = ReportMaster(**values)
+    db.add(master)
+    db.flush()
+    return master
+
+
+def _store_report(db, motel: MotelRef, parsed: dict, filename: str, sha256: str, msg_id: Optional[str]) -> tuple:
+    """Insert one report in the caller's transaction; returns (result item, motel, master or None)."""
+    fn = filename
+    report_dt = _normalize_date(parsed.get("report_date") or "") or datetime.utcnow().date()
+
+    master = _insert_master(db, _report_values(motel, parsed, report_dt))
+    if master is None:
+        # only duplicates pay for the lookup of the stored report's id
+        existing_id = (
+            db.query(ReportMaster.id)
+            .filter(ReportMaster.motel_id == motel.id)
+            .filter(ReportMaster.report_date == report_dt)
+            .scalar()
+        )
+        _record_attachment(db, sha256, msg_id, fn, existing_id, "duplicate")
+        return {
+            "file": fn,
+            "motel": motel.motel_name,
+            "report_date": str(report_dt),
+            "status": "duplicate",
+            "id": existing_id,
+        }, motel, None
+
+    _insert_children(db, master.id, parsed)
+    _record_attachment(db, sha256, msg_id, fn, master.id, "stored")
+    vector_outbox.enqueue(db, [master.id])  # indexed by the outbox drain, committed with the report
+    return {
+        "file": fn,
+        "motel": motel.motel_name,
+        "motel_id": motel.id,
+        "location": motel.location,
+        "report_date": str(report_dt),
+        "status": "stored",
+        "id": master.id,
+        "parsed_by": parsed.get("parsed_by"),
+    }, motel, master
+
+
+def store_parsed_reports(reports: List[tuple], payloads: bool = True) -> List[Any]:
+    """
+    Insert many parsed reports, each given as (parsed, subject, filename,
+    sha256, msg_id), in one transaction. Every report runs in its own
+    savepoint, so a failing report is rolled back alone, and each stored
+    report is queued in the vector outbox with it. Returns, in input order,
+    (result item, embedding payload) per report — the payload is None for
+    duplicates, or for every report when ``payloads`` is False — or the
+    exception that report raised.
+    """
+    outcomes: List[Any] = []
+    with get_session() as db:
+        write_transaction(db)
+        for parsed, subject, filename, sha256, msg_id in reports:
+            try:
+                # resolved outside the report's savepoint: a new motel stays even if the report fails
+                motel = resolve_motel(db, _property_name(parsed, subject))
+                with db.begin_nested():
+                    outcomes.append(_store_report(db, motel, parsed, filename, sha256, msg_id))
+            except Exception as e:
+                print(f"❌ Could not store {filename}: {e}")
+                outcomes.append(e)
+        db.commit()
+
+        # the embedding text reads the committed master and child rows
+        return [
+            o if isinstance(o, Exception)
+            else (o[0], _embedding_payload(o[1], o[2]) if payloads and o[2] is not None else None)
+            for o in outcomes
+        ]
+
+
+def store_parsed_report(parsed: dict, subject: str, filename: str, sha256: str, msg_id: Optional[str]) -> tuple[Dict[str, Any], Optional[tuple]]:
+    """
+    Insert one parsed report (master row, children, attachment ledger) in a
+    single transaction. Returns (result item, embedding payload); the
+    payload is None when a report for that motel and date already exists.
+    """
+    outcome = store_parsed_reports([(parsed, subject, filename, sha256, msg_id)])[0]
+    if isinstance(outcome, Exception):
+        raise outcome
+    return outcome
+
+
+# ---------- Ingestion pipeline ----------
+# Gmail download → extract → parse (LLM) → store (DB + vector outbox),
+# each stage with its own worker count and a bounded queue in front of it.
+# Embedding and the Pinecone upsert happen in the outbox drain (vector_outbox.py).
+
+STAGE_WORKERS = {
+    "extract": int(os.getenv("INGEST_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    # parse threads mostly wait on the shared LLM loop, which enforces the real limits
+    "parse": int(os.getenv("INGEST_PARSE_WORKERS", str(LLM_MAX_CONCURRENCY))),
+    "store": int(os.getenv("INGEST_STORE_WORKERS", "1")),
+}
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+# reports committed per store transaction, and how long a store worker waits to fill a batch
+STORE_BATCH_SIZE = int(os.getenv("INGEST_STORE_BATCH_SIZE", "25"))
+STORE_BATCH_WAIT = float(os.getenv("INGEST_STORE_BATCH_WAIT", "0.5"))
+
+
+@dataclass
+class IngestItem:
+    """One report attachment moving through the pipeline."""
+    msg_id: Optional[str]
+    subject: str
+    filename: str
+    sha256: str
+    data: Optional[bytes] = None
+    text: Optional[str] = None
+    parsed: Optional[dict] = None
+
+
+class _IngestRun:
+    """Thread-safe tallies for one ingest run, plus per-message completion tracking."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stored = 0
+        self.skipped = 0
+        self.ledger_skipped = {"messages": 0, "attachments": 0}
+        self.items: List[Dict[str, Any]] = []
+        self.filtered: List[Tuple[str, str]] = []  # (msg_id, reason) of messages with no report
+        self.incomplete: Set[Optional[str]] = set()  # messages left for the next run
+        self._messages: Dict[str, Dict[str, Any]] = {}
+
+    def skip_message(self, msg_id: Optional[str], reason: str):
+        if msg_id:
+            with self.lock:
+                self.filtered.append((msg_id, reason))
+
+    def fail_message(self, msg_id: Optional[str]):
+        """The message could not be fetched or fully downloaded."""
+        with self.lock:
+            self.incomplete.add(msg_id)
+
+    def add_item(self, item: Dict[str, Any], counter: Optional[str] = None):
+        with self.lock:
+            self.items.append(item)
+            if counter:
+                setattr(self, counter, getattr(self, counter) + 1)
+
+    def open_message(self, msg_id: Optional[str]):
+        with self.lock:
+            self._messages[msg_id] = {"pending": 0, "queued": False, "complete": True}
+
+    def add_attachment(self, msg_id: Optional[str]):
+        with self.lock:
+            self._messages[msg_id]["pending"] += 1
+
+    def close_message(self, msg_id: Optional[str], complete: bool = True):
+        """All attachments of the message have been queued (or skipped)."""
+        with self.lock:
+            state = self._messages[msg_id]
+            state["queued"] = True
+            state["complete"] &= complete
+        self._settle(msg_id)
+
+    def finish(self, msg_id: Optional[str], complete: bool = True):
+        """One queued attachment reached a final state."""
+        with self.lock:
+            state = self._messages.get(msg_id)
+            if state is None:
+                return  # already settled, e.g. the ledger write failed after the store
+            state["pending"] -= 1
+            state["complete"] &= complete
+        self._settle(msg_id)
+
+    def _settle(self, msg_id: Optional[str]):
+        # the message is only recorded once every attachment reached a final state
+        with self.lock:
+            state = self._messages.get(msg_id)
+            if not state or not state["queued"] or state["pending"] > 0:
+                return
+            del self._messages[msg_id]
+            if not state["complete"]:
+                self.incomplete.add(msg_id)
+        if state["complete"]:
+            _record_message(msg_id)
+
+
+def _extract_stage(item: IngestItem) -> IngestItem:
+    """Text extraction; the CPU-bound PDF work runs in the pdf_text process pool."""
+    if item.filename.endswith(".pdf"):
+        item.text = extract_text_from_pdf(item.data)
+        print(f"📄 DEBUG: Extracted text length from {item.filename}: {len(item.text) if item.text else 0}")
+    else:
+        item.text = extract_text_from_docx(item.data)
+    item.data = None
+    return item
 
 
 def ingest_reports_from_gmail(
@@ -184,7 +583,27 @@ def ingest_reports_from_gmail(
     pages: int | None = None,
     after: str | None = None,
     before: str | None = None,
+    batch: bool | None = None,
+    force: bool = False,
+    workers: Dict[str, int] | None = None,
 ) -> Dict[str, Any]:
+    """
+    Fetch report emails and store every new report.
+    Messages and attachment contents already in the processed ledger are
+    skipped before download / text extraction / LLM parsing unless
+    ``force`` is set. Messages dropped by the subject or sender filter, or
+    without attachments, are recorded as skipped so they are not downloaded
+    again. ``workers`` overrides STAGE_WORKERS per stage.
+    """
+    run = _IngestRun()
+
+    def exclude_processed(msg_ids: List[str]) -> set:
+        done = _processed_message_ids(msg_ids)
+        run.ledger_skipped["messages"] += len(done)
+        return done
+
+    exclude = None if force else exclude_processed
+
     q_parts = ["has:attachment"]
     if after:
         q_parts.append(f"after:{after}")
@@ -192,133 +611,133 @@ def ingest_reports_from_gmail(
         q_parts.append(f"before:{before}")
     gmail_query = " ".join(q_parts)
 
-    emails = (
-        fetch_recent_emails(limit, gmail_query)
-        if mode == "recent"
-        else fetch_all_emails(pages, gmail_query)
-    )
-
-    stored = 0
-    skipped = 0
-    items: List[Dict[str, Any]] = []
-
-    for email in emails:
-        attachments = email.get("attachments") or []
-        if not attachments:
-            print(f"⚠️ No attachments found in email: {email['subject']}")
-            continue
-
-        for att in attachments:
-            fn = (att.get("filename") or "").lower()
-            print(f"📎 Processing attachment: {fn}")
-            if not (fn.endswith(".pdf") or fn.endswith(".docx")):
-                print(f"⏩ Skipping non-report file: {fn}")
-                continue
-
-            pdf_bytes = att.get("data")
-            if not pdf_bytes:
-                print(f"⚠️ Empty data for attachment: {fn}")
-                continue
-
-            if fn.endswith(".pdf"):
-                text = extract_text_from_pdf(pdf_bytes)
-                print(f"📄 DEBUG: Extracted text length from {fn}: {len(text) if text else 0}")
-            else:
-                text = extract_text_from_docx(pdf_bytes)
-
-            if not text:
-                print(f"⚠️ Skipping {fn} because no text was extracted")
+    new_history_id = None
+    if mode == "incremental":
+        emails, new_history_id = iter_new_emails(
+            _load_history_id(), gmail_query, pages, batch=batch, exclude=exclude,
+            on_skip=run.skip_message, on_fail=run.fail_message,
+        )
+    elif mode == "recent":
+        emails = iter_recent_emails(limit, gmail_query, exclude=exclude,
+                                    on_skip=run.skip_message, on_fail=run.fail_message)
+    else:
+        emails = iter_all_emails(pages, gmail_query, batch=batch, exclude=exclude,
+                                 on_skip=run.skip_message, on_fail=run.fail_message)
+
+    def work_items():
+        for email in emails:
+            msg_id = email.get("gmail_message_id")
+            attachments = email.get("attachments") or []
+            # an attachment that failed to download leaves the message incomplete: it is not
+            # recorded and holds back the incremental checkpoint, so the next run checks it again
+            missing = email.get("missing_attachments") or []
+            if not attachments:
+                print(f"⚠️ No attachments found in email: {email['subject']}")
+                if missing:
+                    run.fail_message(msg_id)
+                else:
+                    run.skip_message(msg_id, "skipped_empty")
                 continue
 
-            parsed = parse_report_text(text)
-            property_name = parsed.get("property_name") or (email.get("subject") or "").strip() or "Unknown Property"
-            report_dt = _normalize_date(parsed.get("report_date") or "") or datetime.utcnow().date()
+            run.open_message(msg_id)
+            for att in attachments:
+                fn = (att.get("filename") or "").lower()
+                print(f"📎 Processing attachment: {fn}")
+                if not (fn.endswith(".pdf") or fn.endswith(".docx")):
+                    print(f"⏩ Skipping non-report file: {fn}")
+                    continue
 
-            with get_session() as db:
-                motel = _ensure_motel(db, property_name)
+                # take ownership of the buffer so it is freed as soon as it is extracted
+                pdf_bytes = att.pop("data", None)
+                if not pdf_bytes:
+                    print(f"⚠️ Empty data for attachment: {fn}")
+                    continue
 
-                existing = (
-                    db.query(ReportMaster)
-                    .filter(ReportMaster.motel_id == motel.id)
-                    .filter(ReportMaster.report_date == report_dt)
-                    .first()
-                )
-                if existing:
-                    skipped += 1
-                    items.append(
-                        {
-                            "file": fn,
-                            "motel": motel.motel_name,
-                            "report_date": str(report_dt),
-                            "status": "duplicate",
-                            "id": existing.id,
-                        }
-                    )
+                sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+                seen = None if force else _find_processed_attachment(sha256)
+                if seen:
+                    with run.lock:
+                        run.ledger_skipped["attachments"] += 1
+                    print(f"⏩ Already processed (sha256={sha256[:12]}…): {fn}")
+                    run.add_item({"file": fn, "status": "already_processed", "id": seen.report_id})
                     continue
 
-                master = ReportMaster(
-                    motel_id=motel.id,
-                    property_name=motel.motel_name,
-                    report_date=report_dt,
-                    department=parsed.get("department"),
-                    auditor=parsed.get("auditor"),
-                    revenue=float(parsed.get("revenue")) if parsed.get("revenue") not in (None, "") else 0.0,
-                    adr=float(parsed.get("adr")) if parsed.get("adr") not in (None, "") else 0.0,
-                    occupancy=int(parsed.get("occupancy")) if parsed.get("occupancy") not in (None, "") else 0,
-                    vacant_clean=int(parsed.get("vacant_clean")) if parsed.get("vacant_clean") not in (None, "") else 0,
-                    vacant_dirty=int(parsed.get("vacant_dirty")) if parsed.get("vacant_dirty") not in (None, "") else 0,
-                    out_of_order_storage_rooms=int(parsed.get("out_of_order_rooms_storage")) if parsed.get("out_of_order_rooms_storage") not in (None, "") else 0,
-                    created_at=datetime.utcnow()
+                run.add_attachment(msg_id)
+                yield IngestItem(
+                    msg_id=msg_id,
+                    subject=(email.get("subject") or ""),
+                    filename=fn,
+                    sha256=sha256,
+                    data=pdf_bytes,
                 )
-                db.add(master)
-                db.flush()
-
-                _insert_children(db, master.id, parsed)
-                db.commit()
-
-                # Prepare text to embed
-                text_for_embedding = f"""
-                Motel: {motel.motel_name}
-                Report Date: {master.report_date}
-                Location: {motel.location}
-                Department: {master.department}
-                Auditor: {master.auditor}
-                Revenue: {master.revenue}
-                ADR: {master.adr}
-                Occupancy: {master.occupancy}
-                Vacant Clean: {master.vacant_clean}
-                Vacant Dirty: {master.vacant_dirty}
-                Out Of Order/Storage rooms: {master.out_of_order_storage_rooms}
-                Complimentary Rooms: {master.comp_room_records}
-                Incidents: {master.incident_records}
-                Vacant/Dirty Rooms: {master.vacant_dirty_rooms}
-                Out Of Order Rooms: {master.out_of_order_rooms}
-                """
-
-                # Create metadata to store with the vector
-                metadata = {
-                    "motel_name": motel.motel_name,
-                    "location": motel.location,
-                    "department": master.department or "",
-                    "auditor": master.auditor or "",
-                    "content": text_for_embedding[:4000]
-                }
-
-                # 🔥 Generate and insert vector into Pinecone
-                upsert_report_embedding(motel.id, text_for_embedding, metadata)
-
-                stored += 1
-                items.append(
-                    {
-                        "file": fn,
-                        "motel": motel.motel_name,
-                        "motel_id": motel.id,
-                        "location": motel.location,
-                        "report_date": str(report_dt),
-                        "status": "stored",
-                        "id": master.id,
-                    }
-                )
-
-    print(f"✅ Stored: {stored} | ⏩ Skipped: {skipped}")
-    return {"stored": stored, "skipped": skipped, "items": items}
+                pdf_bytes = None
+            run.close_message(msg_id, complete=not missing)
+
+    def parse_stage(item: IngestItem) -> Optional[IngestItem]:
+        if not item.text:
+            print(f"⚠️ Skipping {item.filename} because no text was extracted")
+            run.finish(item.msg_id, complete=False)
+            return None
+        item.parsed = parse_report_text(item.text)
+        item.text = None
+        return item
+
+    def store_stage(items: List[IngestItem]) -> List[Optional[IngestItem]]:
+        outcomes = store_parsed_reports(
+            [(item.parsed, item.subject, item.filename, item.sha256, item.msg_id) for item in items],
+            payloads=False,
+        )
+        out: List[Optional[IngestItem]] = []
+        for item, outcome in zip(items, outcomes):
+            if isinstance(outcome, Exception):
+                run.finish(item.msg_id, complete=False)
+                out.append(None)
+                continue
+            result, _ = outcome
+            stored = result["status"] == "stored"
+            run.add_item(result, counter="stored" if stored else "skipped")
+            run.finish(item.msg_id)
+            out.append(item if stored else None)
+        return out
+
+    def failed(item: IngestItem, e: Exception):
+        run.finish(item.msg_id, complete=False)
+
+    n = {**STAGE_WORKERS, **(workers or {})}
+    pipeline = Pipeline(
+        [
+            Stage("extract", _extract_stage, n["extract"], on_error=failed),
+            Stage("parse", parse_stage, n["parse"], on_error=failed),
+            Stage("store", store_stage, n["store"], on_error=failed,
+                  batch=STORE_BATCH_SIZE, batch_wait=STORE_BATCH_WAIT),
+        ],
+        queue_size=QUEUE_SIZE,
+    )
+    stage_stats = pipeline.run(work_items())
+    _record_skipped_messages(run.filtered)
+
+    # only advance the checkpoint once every message has been handled; a message that failed
+    # anywhere (Gmail get, download, extraction, parse, store) is replayed from the old one
+    if run.incomplete or any(st["errors"] for st in stage_stats.values()):
+        if new_history_id:
+            print(f"⏸️ Keeping the Gmail checkpoint: {len(run.incomplete)} message(s) incomplete")
+    else:
+        _save_history_id(new_history_id)
+
+    # 🔥 vectors are indexed off the ingest path; start a drain for what was just queued
+    outbox = vector_outbox.kick() if run.stored else "idle"
+
+    print(f"✅ Stored: {run.stored} | ⏩ Skipped: {run.skipped} | 🚫 Filtered: {len(run.filtered)} "
+          f"| ⚠️ Incomplete: {len(run.incomplete)} | 🧾 Ledger skipped: {run.ledger_skipped}")
+    return {
+        "stored": run.stored,
+        "skipped": run.skipped,
+        "filtered": len(run.filtered),
+        "incomplete": len(run.incomplete),
+        "ledger_skipped": run.ledger_skipped,
+        "items": run.items,
+        "pipeline": stage_stats,
+        "vector_outbox": outbox,
+        "text_cache": text_cache.stats(),
+        "llm": openai_parser.stats(),
+    }
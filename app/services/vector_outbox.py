@@ -0,0 +1,287 @@
+# app/services/vector_outbox.py
+"""
+Transactional outbox for vector indexing.
+
+Storing a report adds a vector_outbox row in the same transaction, so a
+committed report always has its indexing queued and ingest never waits on
+OpenAI or Pinecone. ``drain`` claims pending rows (a lease in
+locked_until, ``FOR UPDATE SKIP LOCKED`` on Postgres, so several workers
+can drain at once), builds each report's embedding payload from the DB and
+indexes them in batches. A failed batch is retried row by row so one bad
+report cannot hold back the rest; failed rows back off exponentially and
+are dead-lettered after VECTOR_OUTBOX_MAX_ATTEMPTS. Done rows are deleted
+by ``drain`` once they are VECTOR_OUTBOX_DONE_RETENTION seconds old, so the
+table only holds recent and unfinished work. Every timestamp in the table
+comes from the app's UTC clock (datetime.utcnow), never the DB server's.
+
+Run it from Lambda with ``{"action": "drain_vector_outbox"}`` (ingest
+kicks one off when it stored something; schedule it too, so rows waiting
+on a retry are picked up without a later ingest) or locally with
+``python -m app.scripts.drain_vector_outbox``.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.repositories.session import get_session, write_transaction
+from app.db.models import ReportMaster, VectorOutbox
+
+VECTOR_OUTBOX_BATCH_SIZE = int(os.getenv("VECTOR_OUTBOX_BATCH_SIZE", "100"))
+VECTOR_OUTBOX_MAX_ATTEMPTS = int(os.getenv("VECTOR_OUTBOX_MAX_ATTEMPTS", "6"))
+VECTOR_OUTBOX_RETRY_BASE = float(os.getenv("VECTOR_OUTBOX_RETRY_BASE", "30"))  # seconds, doubled per attempt
+VECTOR_OUTBOX_LEASE = float(os.getenv("VECTOR_OUTBOX_LEASE", "300"))  # seconds a claimed row stays claimed
+VECTOR_OUTBOX_DONE_RETENTION = float(os.getenv("VECTOR_OUTBOX_DONE_RETENTION", "86400"))  # seconds done rows are kept
+# after ingest: "async" (Lambda self-invoke, or a background thread locally), "inline" or "off"
+VECTOR_OUTBOX_KICK = os.getenv("VECTOR_OUTBOX_KICK", "async").lower()
+
+_RETRY_MAX = 3600.0
+_kick_lock = threading.Lock()
+_kicked: Optional[threading.Thread] = None
+
+
+def enqueue(db, report_ids: Sequence[int]):
+    """Queue reports for indexing in the caller's transaction."""
+    if report_ids:
+        db.execute(insert(VectorOutbox), [{"report_id": rid} for rid in report_ids])
+
+
+def _claim(limit: int) -> List[Tuple[int, int, int]]:
+    """Lease up to ``limit`` due rows; returns (outbox id, report id, attempts)."""
+    now = datetime.utcnow()
+    with get_session() as db:
+        write_transaction(db)
+        q = (
+            db.query(VectorOutbox)
+            .filter(VectorOutbox.status == "pending")
+            .filter(VectorOutbox.next_attempt_at <= now)
+            .filter((VectorOutbox.locked_until.is_(None)) | (VectorOutbox.locked_until < now))
+            .order_by(VectorOutbox.id)
+            .limit(limit)
+        )
+        if db.get_bind().dialect.name == "postgresql":
+            q = q.with_for_update(skip_locked=True)
+        rows = q.all()
+        for row in rows:
+            row.locked_until = now + timedelta(seconds=VECTOR_OUTBOX_LEASE)
+        claimed = [(row.id, row.report_id, row.attempts or 0) for row in rows]
+        db.commit()
+        return claimed
+
+
+def _payloads(report_ids: Sequence[int]) -> Dict[int, tuple]:
+    from app.services.motel_resolver import MotelRef
+    from app.services.report_service import _embedding_payload
+
+    with get_session() as db:
+        reports = (
+            db.query(ReportMaster)
+            .options(
+                joinedload(ReportMaster.motel_master),
+                selectinload(ReportMaster.vacant_dirty_rooms),
+                selectinload(ReportMaster.out_of_order_rooms),
+                selectinload(ReportMaster.comp_room_records),
+                selectinload(ReportMaster.incident_records),
+            )
+            .filter(ReportMaster.id.in_(list(set(report_ids))))
+            .all()
+        )
+        payloads = {}
+        for rpt in reports:
+            m = rpt.motel_master
+            payloads[rpt.id] = _embedding_payload(MotelRef(m.id, m.motel_name, m.location), rpt)
+        return payloads
+
+
+def _finish(done: Sequence[int], failed: Dict[int, str], attempts: Dict[int, int]):
+    now = datetime.utcnow()
+    with get_session() as db:
+        if done:
+            db.query(VectorOutbox).filter(VectorOutbox.id.in_(list(done))).update(
+                {"status": "done", "processed_at": now, "locked_until": None, "last_error": None},
+                synchronize_session=False,
+            )
+        for outbox_id, error in failed.items():
+            tries = attempts[outbox_id] + 1
+            dead = tries >= VECTOR_OUTBOX_MAX_ATTEMPTS
+            db.query(VectorOutbox).filter(VectorOutbox.id == outbox_id).update(
+                {
+                    "status": "dead" if dead else "pending",
+                    "attempts": tries,
+                    "last_error": error[:2000],
+                    "locked_until": None,
+                    "next_attempt_at": now + timedelta(seconds=min(_RETRY_MAX, VECTOR_OUTBOX_RETRY_BASE * 2 ** (tries - 1))),
+                    "processed_at": now if dead else None,
+                },
+                synchronize_session=False,
+            )
+            if dead:
+                print(f"☠️ Vector outbox row {outbox_id} dead-lettered after {tries} attempts: {error[:200]}")
+        db.commit()
+
+
+def drain_once(batch_size: int = VECTOR_OUTBOX_BATCH_SIZE) -> Dict[str, int]:
+    """Claim and index one batch; returns counts (claimed 0 means nothing was due)."""
+    from app.vectorstore.pinecone_client import index_report_embeddings
+
+    summary = {"claimed": 0, "indexed": 0, "embedded": 0, "unchanged": 0, "retry": 0, "dead": 0}
+    claimed = _claim(batch_size)
+    summary["claimed"] = len(claimed)
+    if not claimed:
+        return summary
+
+    attempts = {outbox_id: tries for outbox_id, _, tries in claimed}
+    failed: Dict[int, str] = {}
+    try:
+        payloads = _payloads([report_id for _, report_id, _ in claimed])
+    except Exception as e:
+        # find the report(s) whose payload cannot be built; each failure counts as an attempt
+        print(f"⚠️ Outbox payloads for {len(claimed)} rows failed ({e}); building them row by row")
+        payloads = {}
+        for outbox_id, report_id, _ in claimed:
+            try:
+                payloads.update(_payloads([report_id]))
+            except Exception as row_error:
+                failed[outbox_id] = f"{type(row_error).__name__}: {row_error}"
+    claimed = [c for c in claimed if c[0] not in failed]
+    # a report deleted since it was queued has nothing to index
+    done = [outbox_id for outbox_id, report_id, _ in claimed if report_id not in payloads]
+    rows = [(outbox_id, payloads[report_id]) for outbox_id, report_id, _ in claimed if report_id in payloads]
+
+    def index(batch: List[Tuple[int, tuple]]):
+        # one report can appear in several rows; index it once
+        items = list({payload[0]: payload for _, payload in batch}.values())
+        result = index_report_embeddings(items)
+        summary["embedded"] += result["embedded"]
+        summary["unchanged"] += result["unchanged"]
+        done.extend(outbox_id for outbox_id, _ in batch)
+
+    try:
+        if rows:
+            index(rows)
+    except Exception as e:
+        if len(rows) > 1:
+            print(f"⚠️ Outbox batch of {len(rows)} failed ({e}); retrying row by row")
+        for row in rows if len(rows) > 1 else []:
+            try:
+                index([row])
+            except Exception as row_error:
+                failed[row[0]] = f"{type(row_error).__name__}: {row_error}"
+        if len(rows) == 1:
+            failed[rows[0][0]] = f"{type(e).__name__}: {e}"
+
+    _finish(done, failed, attempts)
+    summary["indexed"] = len(done)
+    for outbox_id in failed:
+        summary["dead" if attempts[outbox_id] + 1 >= VECTOR_OUTBOX_MAX_ATTEMPTS else "retry"] += 1
+    return summary
+
+
+def purge_done(retention: float = VECTOR_OUTBOX_DONE_RETENTION) -> int:
+    """Delete done rows processed more than ``retention`` seconds ago; returns how many."""
+    cutoff = datetime.utcnow() - timedelta(seconds=max(0.0, retention))
+    with get_session() as db:
+        n = (
+            db.query(VectorOutbox)
+            .filter(VectorOutbox.status == "done")
+            .filter(VectorOutbox.processed_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return n
+
+
+def drain(max_batches: Optional[int] = None, time_budget: Optional[float] = None,
+          batch_size: int = VECTOR_OUTBOX_BATCH_SIZE) -> Dict[str, Any]:
+    """Drain batches until nothing is due, ``max_batches`` ran or ``time_budget`` seconds passed."""
+    started = time.monotonic()
+    totals = {"batches": 0, "claimed": 0, "indexed": 0, "embedded": 0, "unchanged": 0, "retry": 0, "dead": 0}
+    while max_batches is None or totals["batches"] < max_batches:
+        if time_budget is not None and time.monotonic() - started >= time_budget:
+            break
+        result = drain_once(batch_size)
+        if not result["claimed"]:
+            break
+        totals["batches"] += 1
+        for k, v in result.items():
+            totals[k] += v
+    try:
+        totals["purged"] = purge_done()
+    except Exception as e:
+        print(f"⚠️ Could not purge done vector outbox rows: {e}")
+        totals["purged"] = 0
+    totals["seconds"] = round(time.monotonic() - started, 3)
+    print(f"📮 Vector outbox drained: {totals}")
+    return totals
+
+
+def kick() -> str:
+    """Start a drain without waiting for it, per VECTOR_OUTBOX_KICK; returns what was done."""
+    global _kicked
+    if VECTOR_OUTBOX_KICK == "off":
+        return "off"
+    if VECTOR_OUTBOX_KICK == "inline":
+        drain()
+        return "inline"
+    if os.environ.get("AWS_EXECUTION_ENV"):
+        try:
+            import boto3
+
+            boto3.client("lambda", region_name=os.environ["AWS_REGION"]).invoke(
+                FunctionName=os.environ["AWS_LAMBDA_FUNCTION_NAME"],
+                InvocationType="Event",  # async
+                Payload=json.dumps({"action": "drain_vector_outbox"}),
+            )
+            return "invoked"
+        except Exception as e:
+            print(f"⚠️ Could not start vector outbox drain: {e}")
+            return "failed"
+    with _kick_lock:
+        if _kicked is not None and _kicked.is_alive():
+            return "running"
+        _kicked = threading.Thread(target=drain, name="vector-outbox-drain", daemon=True)
+        _kicked.start()
+        return "thread"
+
+
+def requeue_dead(ids: Optional[Sequence[int]] = None) -> int:
+    """Give dead-lettered rows (all, or just ``ids``) a fresh set of attempts."""
+    with get_session() as db:
+        q = db.query(VectorOutbox).filter(VectorOutbox.status == "dead")
+        if ids:
+            q = q.filter(VectorOutbox.id.in_(list(ids)))
+        n = q.update(
+            {"status": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow(), "processed_at": None},
+            synchronize_session=False,
+        )
+        db.commit()
+        return n
+
+
+def stats() -> Dict[str, Any]:
+    with get_session() as db:
+        counts = dict(db.query(VectorOutbox.status, func.count()).group_by(VectorOutbox.status).all())
+        oldest = (
+            db.query(func.min(VectorOutbox.created_at)).filter(VectorOutbox.status == "pending").scalar()
+        )
+        dead = (
+            db.query(VectorOutbox.id, VectorOutbox.report_id, VectorOutbox.attempts, VectorOutbox.last_error)
+            .filter(VectorOutbox.status == "dead")
+            .order_by(VectorOutbox.id.desc())
+            .limit(20)
+            .all()
+        )
+        return {
+            "pending": counts.get("pending", 0),
+            "done": counts.get("done", 0),
+            "dead": counts.get("dead", 0),
+            "oldest_pending": oldest.isoformat() if oldest else None,
+            "recent_dead": [
+                {"id": r.id, "report_id": r.report_id, "attempts": r.attempts, "error": r.last_error} for r in dead
+            ],
+        }
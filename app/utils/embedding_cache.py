@@ -0,0 +1,200 @@
+# app/utils/embedding_cache.py
+"""
+Persistent cache of report embeddings, plus a record of what is live in
+the vector index.
+
+Vectors are keyed by SHA-256 of the model name and the canonical embedding
+text (whitespace collapsed per line, blank lines dropped) and stored as
+little-endian float32 bytes, 6 KB for a 1536-dim vector. report_vector
+keeps, per report, the vector id last upserted and the content and
+metadata hashes it was built from; a report whose hashes match needs
+neither an embeddings call nor an upsert.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+
+from app.repositories.session import get_session
+from app.db.models import EmbeddingCache, ReportVector
+
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "50000"))
+
+_WS_RX = re.compile(r"\s+")
+_IN_CHUNK = 500  # keys per IN (...) query
+
+
+def canonical_text(text: str) -> str:
+    lines = (_WS_RX.sub(" ", line).strip() for line in (text or "").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def content_hash(text: str, model: str) -> str:
+    h = hashlib.sha256()
+    for part in (model, canonical_text(text)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def metadata_hash(metadata: dict) -> str:
+    return hashlib.sha256(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def pack(vector: Sequence[float]) -> bytes:
+    a = array("f", vector)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a.tobytes()
+
+
+def unpack(data: bytes) -> List[float]:
+    a = array("f")
+    a.frombytes(data)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a.tolist()
+
+
+def _chunks(keys: Sequence) -> Iterable[Sequence]:
+    for i in range(0, len(keys), _IN_CHUNK):
+        yield keys[i:i + _IN_CHUNK]
+
+
+def get_many(hashes: Sequence[str]) -> Dict[str, List[float]]:
+    """Cached vectors for the given content hashes (missing ones are left out)."""
+    if not EMBED_CACHE_ENABLED or not hashes:
+        return {}
+    found: Dict[str, List[float]] = {}
+    try:
+        with get_session() as db:
+            now = datetime.utcnow()
+            for chunk in _chunks(list(set(hashes))):
+                for row in db.query(EmbeddingCache).filter(EmbeddingCache.content_hash.in_(chunk)):
+                    found[row.content_hash] = unpack(row.vector)
+                    row.hits = (row.hits or 0) + 1
+                    row.last_used_at = now
+            db.commit()
+    except Exception as e:
+        print(f"⚠️ Embedding cache read failed: {e}")
+    return found
+
+
+def put_many(entries: Sequence[Tuple[str, str, Sequence[float]]]):
+    """Store (content_hash, model, vector) entries."""
+    if not EMBED_CACHE_ENABLED or not entries:
+        return
+    try:
+        with get_session() as db:
+            now = datetime.utcnow()
+            for key, model, vector in entries:
+                db.merge(EmbeddingCache(
+                    content_hash=key,
+                    model=model,
+                    dims=len(vector),
+                    vector=pack(vector),
+                    hits=0,
+                    created_at=now,
+                    last_used_at=now,
+                ))
+            db.flush()
+            _evict(db)
+            db.commit()
+    except Exception as e:
+        print(f"⚠️ Embedding cache write failed: {e}")
+
+
+def _evict(db):
+    count = db.query(func.count(EmbeddingCache.content_hash)).scalar() or 0
+    if count > EMBED_CACHE_MAX_ENTRIES:
+        stale = (
+            db.query(EmbeddingCache.content_hash)
+            .order_by(EmbeddingCache.last_used_at.asc())
+            .limit(count - EMBED_CACHE_MAX_ENTRIES)
+            .all()
+        )
+        db.query(EmbeddingCache).filter(
+            EmbeddingCache.content_hash.in_([k for (k,) in stale])
+        ).delete(synchronize_session=False)
+
+
+def live_hashes(report_ids: Sequence[int], index_name: Optional[str] = None) -> Dict[int, Tuple[str, str]]:
+    """report_id -> (content_hash, metadata_hash) of the vector live in ``index_name``."""
+    if not report_ids:
+        return {}
+    live: Dict[int, Tuple[str, str]] = {}
+    try:
+        with get_session() as db:
+            for chunk in _chunks(list(set(report_ids))):
+                q = db.query(ReportVector).filter(ReportVector.report_id.in_(chunk))
+                if index_name is not None:
+                    q = q.filter(ReportVector.index_name == index_name)
+                for row in q:
+                    live[row.report_id] = (row.content_hash, row.metadata_hash)
+    except Exception as e:
+        print(f"⚠️ Live vector lookup failed: {e}")
+    return live
+
+
+def live_vector_ids(index_name: Optional[str] = None) -> set:
+    """Every vector id recorded as upserted (into ``index_name``, when given)."""
+    with get_session() as db:
+        q = db.query(ReportVector.vector_id)
+        if index_name is not None:
+            q = q.filter(ReportVector.index_name == index_name)
+        return {vid for (vid,) in q}
+
+
+def mark_live(rows: Sequence[Tuple[int, str, str, str]], index_name: Optional[str] = None):
+    """Record (report_id, vector_id, content_hash, metadata_hash) as upserted."""
+    if not rows:
+        return
+    try:
+        with get_session() as db:
+            now = datetime.utcnow()
+            for report_id, vector_id, chash, mhash in rows:
+                db.merge(ReportVector(
+                    report_id=report_id,
+                    vector_id=vector_id,
+                    index_name=index_name,
+                    content_hash=chash,
+                    metadata_hash=mhash,
+                    upserted_at=now,
+                ))
+            db.commit()
+    except Exception as e:
+        print(f"⚠️ Could not record live vectors: {e}")
+
+
+def purge(live: bool = False) -> Dict[str, int]:
+    """Drop cached vectors; with ``live`` also forget what is in the index (forces re-upserts)."""
+    with get_session() as db:
+        deleted = {"vectors": db.query(EmbeddingCache).delete(synchronize_session=False)}
+        if live:
+            deleted["live"] = db.query(ReportVector).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+
+def stats() -> Dict[str, int]:
+    with get_session() as db:
+        entries, hits, size = db.query(
+            func.count(EmbeddingCache.content_hash),
+            func.coalesce(func.sum(EmbeddingCache.hits), 0),
+            func.coalesce(func.sum(func.length(EmbeddingCache.vector)), 0),
+        ).one()
+        live = db.query(func.count(ReportVector.report_id)).scalar() or 0
+        return {
+            "entries": entries,
+            "hits": int(hits),
+            "bytes": int(size),
+            "live_vectors": live,
+            "max_entries": EMBED_CACHE_MAX_ENTRIES,
+        }
@@ -5,7 +5,10 @@ import base64
 import logging
 import re
 import shutil
-from typing import List, Optional, Dict, Any
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Any, Set
 
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -23,6 +26,14 @@ MSG_RETRIES = 2
 ATTACH_RETRIES = 2
 MAX_ATTACHMENT_BYTES = 12 * 1024 * 1024  # 12MB cap
 
+# Worker pool sizes for message gets / attachment downloads (1 = sequential)
+FETCH_CONCURRENCY = int(os.getenv("GMAIL_FETCH_CONCURRENCY", "8"))
+ATTACH_CONCURRENCY = int(os.getenv("GMAIL_ATTACH_CONCURRENCY", "4"))
+
+# Gmail batch HTTP: up to 100 message gets per round trip
+BATCH_GETS = os.getenv("GMAIL_BATCH_GETS", "0").lower() in ("1", "true", "yes")
+BATCH_SIZE = min(100, int(os.getenv("GMAIL_BATCH_SIZE", "100")))
+
 # ---------- Auth / Service ----------
 
 # def _credentials_path() -> str:
@@ -88,7 +99,7 @@ def _build_service(creds: Credentials):
 
 #     return _build_service(creds)
 
-def get_gmail_service():
+def _load_credentials() -> Credentials:
     creds = None
     token_file = _credentials_path()
     print("📁 Checking token file path:", token_file)
@@ -126,7 +137,25 @@ def get_gmail_service():
             with open(token_file, "w") as token:
                 token.write(creds.to_json())
 
-    return _build_service(creds)
+    return creds
+
+def get_gmail_service():
+    return _build_service(_load_credentials())
+
+def _thread_local_service(creds: Credentials) -> Callable[[], Any]:
+    """
+    The Gmail client (httplib2) is not thread-safe, so every worker thread
+    lazily builds its own service from the shared credentials.
+    """
+    local = threading.local()
+
+    def get_service():
+        service = getattr(local, "service", None)
+        if service is None:
+            service = local.service = _build_service(creds)
+        return service
+
+    return get_service
 
 
 # ---------- Gmail helpers ----------
@@ -202,6 +231,71 @@ def _list_message_ids(service, query: Optional[str], max_pages: Optional[int]) -
 
     return results
 
+def _get_current_history_id(service) -> Optional[str]:
+    try:
+        return str(service.users().getProfile(userId="me").execute().get("historyId") or "") or None
+    except Exception as e:
+        LOGGER.error("[Gmail Profile] Error: %s", e)
+        return None
+
+class HistoryExpired(Exception):
+    """The stored historyId is older than Gmail keeps history for."""
+
+# query terms the history path honours without a search (see iter_new_emails)
+_HISTORY_QUERY_TERMS = {"has:attachment"}
+
+def _list_history_message_ids(
+    service, start_history_id: str, max_pages: Optional[int] = None
+) -> tuple[List[Dict[str, str]], Optional[str]]:
+    """
+    List messages added since ``start_history_id`` via users.history.list.
+    Returns (ids in mailbox order, latest historyId). With ``max_pages``
+    the listing stops early and the historyId returned is that of the last
+    history record read, so the next run picks up the rest. Raises
+    HistoryExpired when Gmail answers 404 for the checkpoint.
+    """
+    user_id = "me"
+    results: List[Dict[str, str]] = []
+    seen = set()
+    page_token = None
+    latest = start_history_id
+    page_count = 0
+
+    while True:
+        try:
+            resp = service.users().history().list(
+                userId=user_id,
+                startHistoryId=start_history_id,
+                historyTypes=["messageAdded"],
+                pageToken=page_token,
+                maxResults=500,
+            ).execute()
+        except HttpError as e:
+            if getattr(e, "resp", None) is not None and e.resp.status == 404:
+                raise HistoryExpired(start_history_id) from e
+            raise
+
+        history = resp.get("history", []) or []
+        for h in history:
+            for added in h.get("messagesAdded", []) or []:
+                msg = added.get("message") or {}
+                if msg.get("id") and msg["id"] not in seen:
+                    seen.add(msg["id"])
+                    results.append({"id": msg["id"], "threadId": msg.get("threadId")})
+        page_token = resp.get("nextPageToken")
+        page_count += 1
+        if page_token and max_pages and page_count >= max_pages:
+            # records are oldest-first; resume after the last one read
+            latest = str(history[-1].get("id") or latest) if history else latest
+            break
+        latest = str(resp.get("historyId") or latest)
+        if not page_token:
+            break
+
+    # history.list is oldest-first; match messages.list (newest-first)
+    results.reverse()
+    return results, latest
+
 def _get_message_with_retries(service, msg_id: str) -> Optional[Dict[str, Any]]:
     user_id = "me"
     for i in range(MSG_RETRIES):
@@ -214,6 +308,53 @@ def _get_message_with_retries(service, msg_id: str) -> Optional[Dict[str, Any]]:
             time.sleep(0.6 * (i + 1))
     return None
 
+def _get_messages_batched(service, msg_ids: List[str], batch_size: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch full messages through Gmail batch requests (one HTTP round trip
+    per ``batch_size`` ids). Ids that fail are retried in a fresh batch
+    under the same MSG_RETRIES policy as single gets; ids that never
+    succeed are simply absent from the result.
+
+    Works against any service built by googleapiclient, so tests can
+    pass one built on ``googleapiclient.http.HttpMockSequence``.
+    """
+    user_id = "me"
+    size = max(1, min(100, batch_size or BATCH_SIZE))
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = list(dict.fromkeys(msg_ids))
+
+    for i in range(MSG_RETRIES):
+        if not pending:
+            break
+        failed: List[str] = []
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                LOGGER.warning("[Gmail Batch] Error on %s (attempt %d/%d): %s", request_id, i+1, MSG_RETRIES, exception)
+                failed.append(request_id)
+            else:
+                results[request_id] = response
+
+        for start in range(0, len(pending), size):
+            chunk = pending[start:start + size]
+            batch = service.new_batch_http_request(callback=callback)
+            for msg_id in chunk:
+                batch.add(
+                    service.users().messages().get(userId=user_id, id=msg_id, format="full"),
+                    request_id=msg_id,
+                )
+            try:
+                batch.execute()
+            except Exception as e:
+                LOGGER.warning("[Gmail Batch] Batch of %d failed (attempt %d/%d): %s", len(chunk), i+1, MSG_RETRIES, e)
+                failed.extend(m for m in chunk if m not in results and m not in failed)
+
+        pending = failed
+        if pending and i + 1 < MSG_RETRIES:
+            time.sleep(0.6 * (i + 1))
+
+    return results
+
 def _get_attachment_bytes_with_retries(service, message_id: str, attachment_id: str) -> Optional[bytes]:
     user_id = "me"
     for i in range(ATTACH_RETRIES):
@@ -235,11 +376,21 @@ def _get_attachment_bytes_with_retries(service, message_id: str, attachment_id:
             time.sleep(0.8 * (i + 1))
     return None
 
-def _walk_parts_for_attachments(service, msg_id: str, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+def _walk_parts_for_attachments(
+    service,
+    msg_id: str,
+    payload: Dict[str, Any],
+    get_service: Optional[Callable[[], Any]] = None,
+    concurrency: Optional[int] = None,
+    missing: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
     """
     Extract PDF/DOCX attachments into memory.
+    Downloads run on a small worker pool when ``get_service`` is given;
+    the result keeps the order the parts appear in the message. Filenames
+    of attachments that could not be downloaded are appended to ``missing``.
     """
-    attachments: List[Dict[str, Any]] = []
+    parts: List[Dict[str, Any]] = []
 
     def is_supported(fn: str, mt: str) -> bool:
         fn_l = (fn or "").lower()
@@ -252,15 +403,30 @@ def _walk_parts_for_attachments(service, msg_id: str, payload: Dict[str, Any]) -
         body = part.get("body", {}) or {}
 
         if filename and body.get("attachmentId") and is_supported(filename, mime_type):
-            raw = _get_attachment_bytes_with_retries(service, msg_id, body["attachmentId"])
-            if raw is not None:
-                attachments.append({"filename": filename, "mimeType": mime_type, "data": raw})
+            parts.append({"filename": filename, "mimeType": mime_type, "attachmentId": body["attachmentId"]})
 
         for child in (part.get("parts") or []):
             visit(child)
 
     visit(payload)
-    return attachments
+
+    workers = min(max(1, concurrency or ATTACH_CONCURRENCY), len(parts))
+    if get_service is None or workers <= 1:
+        raws = [_get_attachment_bytes_with_retries(service, msg_id, p["attachmentId"]) for p in parts]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gmail-attach") as pool:
+            raws = list(pool.map(
+                lambda p: _get_attachment_bytes_with_retries(get_service(), msg_id, p["attachmentId"]),
+                parts,
+            ))
+
+    if missing is not None:
+        missing.extend(p["filename"] for p, raw in zip(parts, raws) if raw is None)
+    return [
+        {"filename": p["filename"], "mimeType": p["mimeType"], "data": raw}
+        for p, raw in zip(parts, raws)
+        if raw is not None
+    ]
 
 def _to_email_dict(msg_data: Dict[str, Any]) -> Dict[str, Any]:
     payload = msg_data.get("payload", {}) or {}
@@ -279,65 +445,242 @@ def _to_email_dict(msg_data: Dict[str, Any]) -> Dict[str, Any]:
         "snippet": msg_data.get("snippet", "") or "",
     }
 
-def _fetch_one_message(service, msg_id: str) -> Optional[Dict[str, Any]]:
+def _fetch_one_message(
+    service, msg_id: str, get_service: Optional[Callable[[], Any]] = None
+) -> Optional[Dict[str, Any]]:
     data = _get_message_with_retries(service, msg_id)
     if not data:
         return None
+    return _process_message(service, data, get_service)
 
+def _process_message(
+    service, data: Dict[str, Any], get_service: Optional[Callable[[], Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Filter a fetched message by subject/sender and download its attachments.
+    A filtered message comes back as {"gmail_message_id", "skipped": reason}.
+    """
+    msg_id = data.get("id")
     email = _to_email_dict(data)
 
     if not _subject_is_daily_report(email["subject"]):
-        return None
+        return {"gmail_message_id": msg_id, "skipped": "skipped_subject"}
 
     sender_email_only = _extract_email_address(email["from"])
     if not is_whitelisted(sender_email_only):
-        return None
+        return {"gmail_message_id": msg_id, "skipped": "skipped_sender"}
 
-    attachments = _walk_parts_for_attachments(service, msg_id, data.get("payload", {}) or {})
+    missing: List[str] = []
+    attachments = _walk_parts_for_attachments(
+        service, msg_id, data.get("payload", {}) or {}, get_service=get_service, missing=missing
+    )
     print(f"📎 DEBUG: {email['subject']} — Found {len(attachments)} attachments")
     for att in attachments:
         print(f"📁 Attachment: {att['filename']} ({att['mimeType']}) - Size: {len(att['data']) if att.get('data') else 0} bytes")
 
     email["attachments"] = attachments
+    email["missing_attachments"] = missing
     return email
 
 
-# ---------- Public API ----------
+def _imap_ordered(fn: Callable[[Any], Any], items: Iterable[Any], workers: int, name: str) -> Iterator[Any]:
+    """
+    Ordered, lazy pool map. At most ``2 * workers`` results are in flight,
+    so memory stays bounded however many items there are.
+    """
+    if workers <= 1:
+        for x in items:
+            yield fn(x)
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name) as pool:
+        window: deque = deque()
+        for x in items:
+            window.append(pool.submit(fn, x))
+            if len(window) >= 2 * workers:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+def _iter_messages(
+    get_service: Callable[[], Any],
+    ids: List[Dict[str, str]],
+    concurrency: Optional[int] = None,
+    batch: Optional[bool] = None,
+    exclude: Optional[Callable[[List[str]], Set[str]]] = None,
+    on_skip: Optional[Callable[[str, str], None]] = None,
+    on_fail: Optional[Callable[[str], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Fetch and filter messages on a bounded worker pool, yielding them one
+    at a time in the order of ``ids``.
+    With ``batch`` the message gets go out as Gmail batch requests of up
+    to BATCH_SIZE; attachment downloads still use the pool.
+    ``exclude`` receives the listed ids and returns those to drop before
+    anything is downloaded. ``on_skip(msg_id, reason)`` is called for each
+    message the subject or sender filter drops, ``on_fail(msg_id)`` for
+    each message whose get still failed after MSG_RETRIES.
+    """
+    workers = max(1, concurrency or FETCH_CONCURRENCY)
+    use_batch = BATCH_GETS if batch is None else batch
+    msg_ids = [m["id"] for m in ids]
+    if exclude and msg_ids:
+        skip = exclude(msg_ids)
+        msg_ids = [mid for mid in msg_ids if mid not in skip]
+
+    if not use_batch:
+        def work(msg_id: str) -> Optional[Dict[str, Any]]:
+            return _fetch_one_message(get_service(), msg_id, get_service=get_service)
+
+        results = _imap_ordered(work, msg_ids, workers, "gmail-get")
+    else:
+        def batched() -> Iterator[Optional[Dict[str, Any]]]:
+            for start in range(0, len(msg_ids), BATCH_SIZE):
+                chunk = msg_ids[start:start + BATCH_SIZE]
+                fetched = _get_messages_batched(get_service(), chunk)
+                for mid in chunk:
+                    yield fetched.pop(mid, None)
+
+        def process(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            return _process_message(get_service(), data, get_service=get_service) if data else None
+
+        results = _imap_ordered(process, batched(), workers, "gmail-get")
+
+    # results come back in the order of msg_ids
+    for msg_id, e in zip(msg_ids, results):
+        if e is None:
+            LOGGER.error("[Gmail Get] Giving up on %s after %d attempts", msg_id, MSG_RETRIES)
+            if on_fail:
+                on_fail(msg_id)
+        elif e.get("skipped"):
+            if on_skip:
+                on_skip(e["gmail_message_id"], e["skipped"])
+        else:
+            yield e
 
-def fetch_recent_emails(limit: int = 5, query: Optional[str] = None) -> List[Dict[str, Any]]:
-    service = get_gmail_service()
-    ids = _list_message_ids(service, query=query, max_pages=1)
-    ids = ids[: max(0, limit)]
+def _fetch_messages(
+    get_service: Callable[[], Any],
+    ids: List[Dict[str, str]],
+    concurrency: Optional[int] = None,
+    batch: Optional[bool] = None,
+    exclude: Optional[Callable[[List[str]], Set[str]]] = None,
+) -> List[Dict[str, Any]]:
+    return list(_iter_messages(get_service, ids, concurrency, batch=batch, exclude=exclude))
 
-    emails: List[Dict[str, Any]] = []
-    for m in ids:
-        e = _fetch_one_message(service, m["id"])
-        if e:
-            emails.append(e)
-        if len(emails) >= limit:
-            break
 
-    id_order = [m["id"] for m in ids]
-    emails.sort(key=lambda x: id_order.index(x["gmail_message_id"]) if x["gmail_message_id"] in id_order else 9999)
+# ---------- Public API ----------
+# iter_* yield one email (with attachment bytes) at a time so callers can
+# release each buffer before the next message is downloaded; fetch_* keep
+# the old list-returning behaviour.
+
+def iter_recent_emails(
+    limit: int = 5,
+    query: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    exclude: Optional[Callable[[List[str]], Set[str]]] = None,
+    on_skip: Optional[Callable[[str, str], None]] = None,
+    on_fail: Optional[Callable[[str], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    get_service = _thread_local_service(_load_credentials())
+    ids = _list_message_ids(get_service(), query=query, max_pages=1)
+    ids = ids[: max(0, limit)]
+    return _iter_messages(get_service, ids, concurrency, exclude=exclude, on_skip=on_skip, on_fail=on_fail)
+
+def iter_all_emails(
+    max_pages: Optional[int] = None,
+    query: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    batch: Optional[bool] = None,
+    exclude: Optional[Callable[[List[str]], Set[str]]] = None,
+    on_skip: Optional[Callable[[str, str], None]] = None,
+    on_fail: Optional[Callable[[str], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    get_service = _thread_local_service(_load_credentials())
+    ids = _list_message_ids(get_service(), query=query, max_pages=max_pages)
+    print(f"📬 DEBUG: {len(ids)} messages listed from Gmail")
+    return _iter_messages(get_service, ids, concurrency, batch=batch, exclude=exclude, on_skip=on_skip, on_fail=on_fail)
+
+def iter_new_emails(
+    start_history_id: Optional[str],
+    query: Optional[str] = None,
+    max_pages: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    batch: Optional[bool] = None,
+    exclude: Optional[Callable[[List[str]], Set[str]]] = None,
+    on_skip: Optional[Callable[[str, str], None]] = None,
+    on_fail: Optional[Callable[[str], None]] = None,
+) -> tuple[Iterator[Dict[str, Any]], Optional[str]]:
+    """
+    Incremental fetch: only messages added since ``start_history_id``.
+    Falls back to a full list query when there is no checkpoint or it has
+    expired. Returns (email iterator, historyId to store as the next
+    checkpoint once the iterator has been consumed).
+
+    history.list cannot search, so ``query`` may only hold terms the
+    per-message checks already apply (the subject filter always runs, and
+    has:attachment is implied by callers skipping messages without
+    attachments); anything else, e.g. after:/before:, raises ValueError.
+    ``max_pages`` bounds the history pages read the same way it bounds the
+    full list.
+    """
+    unsupported = [t for t in (query or "").split() if t.lower() not in _HISTORY_QUERY_TERMS]
+    if unsupported:
+        raise ValueError(f"Incremental fetch cannot apply query terms {unsupported}; use mode='all' instead")
+    get_service = _thread_local_service(_load_credentials())
+    service = get_service()
+
+    ids: Optional[List[Dict[str, str]]] = None
+    new_history_id: Optional[str] = None
+    if start_history_id:
+        try:
+            ids, new_history_id = _list_history_message_ids(service, start_history_id, max_pages=max_pages)
+            print(f"🔁 DEBUG: {len(ids)} new messages since historyId {start_history_id}")
+        except HistoryExpired:
+            LOGGER.warning("historyId %s expired; falling back to a full list.", start_history_id)
+        except Exception as e:
+            LOGGER.error("[Gmail History] Error: %s; falling back to a full list.", e)
+
+    if ids is None:
+        # read the checkpoint first so mail arriving mid-listing is not lost
+        new_history_id = _get_current_history_id(service)
+        ids = _list_message_ids(service, query=query, max_pages=max_pages)
+
+    return _iter_messages(get_service, ids, concurrency, batch=batch, exclude=exclude, on_skip=on_skip, on_fail=on_fail), new_history_id
+
+def fetch_recent_emails(
+    limit: int = 5,
+    query: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    exclude: Optional[Callable[[List[str]], Set[str]]] = None,
+) -> List[Dict[str, Any]]:
+    emails = list(iter_recent_emails(limit, query, concurrency, exclude=exclude))
     print("📧 DEBUG: Total emails fetched from Gmail:", len(emails))
     for e in emails:
         print("📨 SUBJECT:", e["subject"], "FROM:", e["from"])
     return emails
 
-def fetch_all_emails(max_pages: Optional[int] = None, query: Optional[str] = None) -> List[Dict[str, Any]]:
-    service = get_gmail_service()
-    ids = _list_message_ids(service, query=query, max_pages=max_pages)
-
-    emails: List[Dict[str, Any]] = []
-    for m in ids:
-        e = _fetch_one_message(service, m["id"])
-        if e:
-            emails.append(e)
-
-    id_order = [m["id"] for m in ids]
-    emails.sort(key=lambda x: id_order.index(x["gmail_message_id"]) if x["gmail_message_id"] in id_order else 9999)
+def fetch_all_emails(
+    max_pages: Optional[int] = None,
+    query: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    batch: Optional[bool] = None,
+    exclude: Optional[Callable[[List[str]], Set[str]]] = None,
+) -> List[Dict[str, Any]]:
+    emails = list(iter_all_emails(max_pages, query, concurrency, batch=batch, exclude=exclude))
     print("📧 DEBUG: Total emails fetched from Gmail:", len(emails))
     for e in emails:
         print("📨 SUBJECT:", e["subject"], "FROM:", e["from"])
 
     return emails
+
+def fetch_new_emails(
+    start_history_id: Optional[str],
+    query: Optional[str] = None,
+    max_pages: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    batch: Optional[bool] = None,
+    exclude: Optional[Callable[[List[str]], Set[str]]] = None,
+) -> tuple[List[Dict[str, Any]], Optional[str]]:
+    emails, new_history_id = iter_new_emails(start_history_id, query, max_pages, concurrency, batch=batch, exclude=exclude)
+    emails = list(emails)
+    print("📧 DEBUG: Total emails fetched from Gmail:", len(emails))
+    return emails, new_history_id
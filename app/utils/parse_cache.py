@@ -0,0 +1,138 @@
+# app/utils/parse_cache.py
+"""
+Persistent memo of LLM report parses.
+
+Keyed by SHA-256 of the whitespace-normalized report text, the model name,
+the parser's PROMPT_VERSION, a fingerprint of the prompt text and the text
+preparation settings (compaction and token budget), so any prompt, schema
+or compaction change misses automatically. Each hit records the tokens
+the original call used, which is what the hit saved.
+"""
+import hashlib
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func
+
+from app.repositories.session import get_session
+from app.db.models import ParseCache
+
+PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+PARSE_CACHE_TTL_DAYS = int(os.getenv("PARSE_CACHE_TTL_DAYS", "90"))
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "20000"))
+
+_WS_RX = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WS_RX.sub(" ", text or "").strip()
+
+
+def cache_key(text: str, model: str, prompt_version: str, prompt: str, prep: str = "") -> str:
+    prompt_fp = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+    h = hashlib.sha256()
+    for part in (model, prompt_version, prompt_fp, prep, normalize_text(text)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _expired(row: ParseCache, now: datetime) -> bool:
+    return PARSE_CACHE_TTL_DAYS > 0 and row.created_at is not None and \
+        row.created_at < now - timedelta(days=PARSE_CACHE_TTL_DAYS)
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    if not PARSE_CACHE_ENABLED:
+        return None
+    try:
+        with get_session() as db:
+            row = db.get(ParseCache, key)
+            if not row:
+                return None
+            now = datetime.utcnow()
+            if _expired(row, now):
+                db.delete(row)
+                db.commit()
+                return None
+            row.hits = (row.hits or 0) + 1
+            row.tokens_saved = (row.tokens_saved or 0) + (row.total_tokens or 0)
+            row.last_used_at = now
+            result = row.result
+            db.commit()
+            return result
+    except Exception as e:
+        print(f"⚠️ Parse cache read failed: {e}")
+        return None
+
+
+def put(key: str, model: str, prompt_version: str, result: Dict[str, Any], usage=None):
+    if not PARSE_CACHE_ENABLED:
+        return
+    try:
+        with get_session() as db:
+            now = datetime.utcnow()
+            db.merge(ParseCache(
+                cache_key=key,
+                model=model,
+                prompt_version=prompt_version,
+                result=result,
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                total_tokens=getattr(usage, "total_tokens", 0) or 0,
+                hits=0,
+                tokens_saved=0,
+                created_at=now,
+                last_used_at=now,
+            ))
+            db.flush()
+            _evict(db, now)
+            db.commit()
+    except Exception as e:
+        print(f"⚠️ Parse cache write failed: {e}")
+
+
+def _evict(db, now: datetime):
+    if PARSE_CACHE_TTL_DAYS > 0:
+        db.query(ParseCache).filter(
+            ParseCache.created_at < now - timedelta(days=PARSE_CACHE_TTL_DAYS)
+        ).delete(synchronize_session=False)
+    count = db.query(func.count(ParseCache.cache_key)).scalar() or 0
+    if count > PARSE_CACHE_MAX_ENTRIES:
+        stale = (
+            db.query(ParseCache.cache_key)
+            .order_by(ParseCache.last_used_at.asc())
+            .limit(count - PARSE_CACHE_MAX_ENTRIES)
+            .all()
+        )
+        db.query(ParseCache).filter(
+            ParseCache.cache_key.in_([k for (k,) in stale])
+        ).delete(synchronize_session=False)
+
+
+def purge(expired_only: bool = False) -> int:
+    with get_session() as db:
+        q = db.query(ParseCache)
+        if expired_only:
+            q = q.filter(ParseCache.created_at < datetime.utcnow() - timedelta(days=PARSE_CACHE_TTL_DAYS))
+        deleted = q.delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+
+def stats() -> Dict[str, Any]:
+    with get_session() as db:
+        entries, hits, saved = db.query(
+            func.count(ParseCache.cache_key),
+            func.coalesce(func.sum(ParseCache.hits), 0),
+            func.coalesce(func.sum(ParseCache.tokens_saved), 0),
+        ).one()
+        return {
+            "entries": entries,
+            "hits": int(hits),
+            "tokens_saved": int(saved),
+            "ttl_days": PARSE_CACHE_TTL_DAYS,
+            "max_entries": PARSE_CACHE_MAX_ENTRIES,
+        }
@@ -0,0 +1,85 @@
+# app/utils/rate_limiter.py
+"""
+Token-bucket limiter for OpenAI request (RPM) and token (TPM) budgets.
+
+Callers reserve capacity up front with an *estimated* token count; the
+bucket may go into debt, and the reservation tells the caller how long to
+wait until that debt is paid back. Reservations are served in arrival
+order, so a burst of concurrent calls spreads out instead of all firing at
+once. Once the real usage is known, ``settle`` corrects the estimate.
+
+Thread-safe; ``acquire`` blocks the calling thread, ``acquire_async``
+awaits without blocking the event loop.
+"""
+import asyncio
+import threading
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: float | None = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` now; return seconds to wait before using it."""
+        amount = min(amount, self.capacity)  # an oversized request must still get through
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def adjust(self, delta: float):
+        """Give back (positive) or take (negative) tokens after the fact."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + delta)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets; 0 disables either."""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._lock = threading.Lock()
+        self._waited = 0.0
+        self._acquired = 0
+
+    def reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        with self._lock:
+            self._acquired += 1
+            self._waited += wait
+        return wait
+
+    def acquire(self, tokens: int):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: int):
+        """Correct a reservation once the API reports the real token count."""
+        if self.tokens and actual:
+            self.tokens.adjust(estimated - actual)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"acquired": self._acquired, "waited_s": round(self._waited, 3)}
@@ -0,0 +1,228 @@
+# app/utils/text_cache.py
+"""
+Content-addressed cache for extracted document text.
+
+Keys are the SHA-256 of the attachment bytes plus the extractor kind and
+version, so a re-ingested or forwarded file never goes through pdfplumber,
+PyPDF2, python-docx or GPT OCR twice. Bump the version of an extractor in
+EXTRACTOR_VERSIONS when its output changes to invalidate old entries.
+
+Backends: "disk" (default; /tmp in Lambda), "db" (extracted_text_cache
+table) or "off". Both backends evict least-recently-used entries once the
+stored text exceeds TEXT_CACHE_MAX_BYTES.
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+EXTRACTOR_VERSIONS = {
+    "pdf": "pdfium-layered-3",
+    "docx": "python-docx-1",
+    "ocr": "gpt-4.1-mini-1",
+    "ocr_page": "gpt-4.1-mini-jpeg-1",
+}
+
+TEXT_CACHE_BACKEND = os.getenv("TEXT_CACHE_BACKEND", "disk").lower()
+TEXT_CACHE_DIR = os.getenv(
+    "TEXT_CACHE_DIR",
+    "/tmp/text_cache" if os.environ.get("AWS_EXECUTION_ENV") else os.path.join(os.getcwd(), ".cache", "text"),
+)
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class DiskTextCache:
+    """One UTF-8 file per key; file mtime doubles as the LRU clock."""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.txt")
+
+    def _entries(self):
+        for dirpath, _, files in os.walk(self.root):
+            for fn in files:
+                path = os.path.join(dirpath, fn)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except (FileNotFoundError, OSError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return text
+
+    def put(self, key: str, text: str):
+        path = self._path(key)
+        data = text.encode("utf-8")
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            old = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp, path)
+            self._size += len(data) - old
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
+
+
+class DbTextCache:
+    """Rows in extracted_text_cache; last_used_at is the LRU clock."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        from app.repositories.session import get_session
+        from app.db.models import ExtractedTextCache
+
+        with get_session() as db:
+            row = db.get(ExtractedTextCache, key)
+            if not row:
+                return None
+            row.last_used_at = datetime.utcnow()
+            text = row.text
+            db.commit()
+            return text
+
+    def put(self, key: str, text: str):
+        from sqlalchemy import func
+        from app.repositories.session import get_session
+        from app.db.models import ExtractedTextCache
+
+        with self._lock, get_session() as db:
+            now = datetime.utcnow()
+            db.merge(ExtractedTextCache(
+                cache_key=key, text=text, size_bytes=len(text.encode("utf-8")),
+                created_at=now, last_used_at=now,
+            ))
+            db.flush()
+            total = db.query(func.coalesce(func.sum(ExtractedTextCache.size_bytes), 0)).scalar() or 0
+            if total > self.max_bytes:
+                target = int(self.max_bytes * 0.9)
+                for row in db.query(ExtractedTextCache).order_by(ExtractedTextCache.last_used_at.asc()):
+                    if total <= target:
+                        break
+                    total -= row.size_bytes or 0
+                    db.delete(row)
+            db.commit()
+
+    def clear(self):
+        from app.repositories.session import get_session
+        from app.db.models import ExtractedTextCache
+
+        with get_session() as db:
+            db.query(ExtractedTextCache).delete()
+            db.commit()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def _get_backend():
+    global _backend
+    if TEXT_CACHE_BACKEND == "off":
+        return None
+    with _backend_lock:
+        if _backend is None:
+            if TEXT_CACHE_BACKEND == "db":
+                _backend = DbTextCache(TEXT_CACHE_MAX_BYTES)
+            else:
+                _backend = DiskTextCache(TEXT_CACHE_DIR, TEXT_CACHE_MAX_BYTES)
+        return _backend
+
+
+def _count(kind: str, field: str):
+    with _stats_lock:
+        _stats.setdefault(kind, {"hits": 0, "misses": 0})[field] += 1
+
+
+def cache_key(kind: str, data: bytes) -> str:
+    return f"{hashlib.sha256(data).hexdigest()}-{kind}-{EXTRACTOR_VERSIONS[kind]}"
+
+
+def cached_text(kind: str, data: bytes, extract: Callable[[bytes], str]) -> str:
+    """
+    Return the cached ``kind`` text for ``data`` or run ``extract`` and
+    store its result. Empty results are not stored, so failed OCR calls
+    are retried next time. Cache errors never break extraction.
+    """
+    backend = _get_backend()
+    if backend is None:
+        return extract(data)
+
+    key = cache_key(kind, data)
+    try:
+        text = backend.get(key)
+    except Exception as e:
+        print(f"⚠️ Text cache read failed: {e}")
+        text = None
+    if text is not None:
+        _count(kind, "hits")
+        return text
+
+    _count(kind, "misses")
+    text = extract(data)
+    if text:
+        try:
+            backend.put(key, text)
+        except Exception as e:
+            print(f"⚠️ Text cache write failed: {e}")
+    return text
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counters per extractor kind since process start."""
+    with _stats_lock:
+        return {k: dict(v) for k, v in _stats.items()}
+
+
+def clear():
+    backend = _get_backend()
+    if backend is not None:
+        backend.clear()
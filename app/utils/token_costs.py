@@ -1,6 +1,7 @@
 # Approximate per-1K-token prices in USD (Oct 2025)
 TOKEN_COSTS = {
     "gpt-4o-mini": {"input": 0.00015, "output": 0.0006},
+    "gpt-4.1-mini": {"input": 0.0004, "output": 0.0016},
     "gpt-4o": {"input": 0.005, "output": 0.015},
     "text-embedding-3-small": {"input": 0.00002, "output": 0.0},
 }
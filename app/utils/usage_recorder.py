@@ -0,0 +1,137 @@
+# app/utils/usage_recorder.py
+"""
+Buffered token-usage accounting.
+
+``record`` appends a TokenUsage row to an in-memory buffer instead of
+opening a session per API call; the buffer is written in one bulk INSERT
+once it holds USAGE_FLUSH_SIZE rows or its oldest row is
+USAGE_FLUSH_INTERVAL seconds old (a background thread checks), at process
+exit, and by the Lambda handler at the end of every invocation. Rows keep
+the time they were recorded, so /usage/summary sees exactly what it did
+with one commit per call — it flushes first.
+
+A failed flush keeps the rows for the next one (at most
+USAGE_BUFFER_MAX; older rows are dropped with a warning).
+"""
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.repositories.session import get_session
+from app.db.models import TokenUsage
+from app.utils.token_costs import estimate_cost
+
+USAGE_FLUSH_SIZE = int(os.getenv("USAGE_FLUSH_SIZE", "100"))
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "5"))  # seconds
+USAGE_BUFFER_MAX = int(os.getenv("USAGE_BUFFER_MAX", "10000"))
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()  # one bulk insert at a time, so rows land in order
+_buffer: List[Dict[str, Any]] = []
+_oldest: Optional[float] = None
+_wake = threading.Event()
+_flusher: Optional[threading.Thread] = None
+
+
+def record(model: str, operation: str, prompt_tokens: int, completion_tokens: int = 0,
+           cost_usd: Optional[float] = None):
+    """Queue one usage row; ``cost_usd`` defaults to estimate_cost for the model."""
+    global _oldest
+    row = {
+        "model": model,
+        "operation": operation,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens) if cost_usd is None else cost_usd,
+        "created_at": datetime.utcnow(),
+    }
+    with _lock:
+        _buffer.append(row)
+        if _oldest is None:
+            _oldest = time.monotonic()
+        full = len(_buffer) >= USAGE_FLUSH_SIZE
+    if full:
+        flush()
+    else:
+        _start_flusher()
+
+
+def flush() -> int:
+    """Write every buffered row now; returns how many were written."""
+    global _oldest
+    with _flush_lock:
+        with _lock:
+            rows = _buffer[:]
+            _buffer.clear()
+            _oldest = None
+        if not rows:
+            return 0
+        try:
+            with get_session() as db:
+                db.execute(insert(TokenUsage), rows)
+                db.commit()
+            return len(rows)
+        except Exception as e:
+            with _lock:
+                _buffer[:0] = rows
+                dropped = len(_buffer) - USAGE_BUFFER_MAX
+                if dropped > 0:
+                    del _buffer[:dropped]
+                _oldest = time.monotonic()
+            print(f"⚠️ Could not record token usage ({len(rows)} rows kept for the next flush): {e}")
+            if dropped > 0:
+                print(f"⚠️ Usage buffer full; dropped {dropped} oldest rows")
+            return 0
+
+
+def pending() -> int:
+    with _lock:
+        return len(_buffer)
+
+
+def _due() -> Optional[float]:
+    """Seconds until the buffer is due for a flush (<= 0: now), or None if it is empty."""
+    with _lock:
+        return None if _oldest is None else _oldest + USAGE_FLUSH_INTERVAL - time.monotonic()
+
+
+def _run_flusher():
+    while True:
+        due = _due()
+        if due is None:
+            _wake.wait()
+            _wake.clear()
+        elif due > 0:
+            time.sleep(due)
+        else:
+            flush()
+
+
+def _start_flusher():
+    global _flusher
+    _wake.set()
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_run_flusher, name="usage-flush", daemon=True)
+            _flusher.start()
+
+
+def _after_fork():
+    # a forked worker starts with an empty buffer and no flusher thread
+    global _lock, _flush_lock, _oldest, _flusher
+    _lock, _flush_lock = threading.Lock(), threading.Lock()
+    _buffer.clear()
+    _oldest, _flusher = None, None
+
+
+atexit.register(flush)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
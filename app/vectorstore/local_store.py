@@ -0,0 +1,286 @@
+# app/vectorstore/local_store.py
+"""
+In-process vector store: brute-force cosine search over a memory-mapped
+float32 matrix.
+
+A store is a directory with
+    vectors.f32   rows of ``dim`` float32 values, L2-normalised on write so
+                  cosine similarity is a single matrix-vector product;
+                  grown by doubling
+    index.jsonl   append-only log of {"id", "row", "metadata"} (or
+                  "deleted") entries; replayed on open, last entry wins,
+                  rewritten when mostly superseded
+
+A query scans about a thousand 1536-dim vectors per half millisecond (a
+metadata filter, evaluated on cached per-field columns, narrows the scan
+first), with no network round trip and nothing to run, so this also
+serves tests and offline development. One process writes at a time; other processes
+reading the same directory pick up its writes on their next query.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.vectorstore.store import VectorStore
+
+_INITIAL_ROWS = 1024
+_COMPACT_MIN = 1000  # superseded log entries tolerated before rewriting the log
+
+
+class LocalStore(VectorStore):
+    def __init__(self, path: str, dim: Optional[int] = None):
+        self.path = path
+        self.name = f"local:{os.path.basename(os.path.normpath(path))}"
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._log_path = os.path.join(path, "index.jsonl")
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self.dim = dim
+        self._load()
+
+    # ---------- persistence ----------
+    def _load(self):
+        self._rows: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._metadata: List[Optional[dict]] = []
+        entries = 0
+        if os.path.exists(self._log_path):
+            with open(self._log_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # a torn last line from an interrupted write
+                    entries += 1
+                    if "dim" in entry:
+                        self.dim = entry["dim"]
+                        continue
+                    row = entry["row"]
+                    while len(self._ids) <= row:
+                        self._ids.append(None)
+                        self._metadata.append(None)
+                    if entry.get("deleted"):
+                        self._rows.pop(entry["id"], None)
+                        self._ids[row], self._metadata[row] = None, None
+                    else:
+                        self._rows[entry["id"]] = row
+                        self._ids[row], self._metadata[row] = entry["id"], entry.get("metadata") or {}
+        self._entries = entries
+        self._log_size = os.path.getsize(self._log_path) if os.path.exists(self._log_path) else 0
+        self._reindex()
+        self._open_vectors(len(self._ids))
+
+    def _reindex(self):
+        self._live = np.array([i is not None for i in self._ids], dtype=bool)
+        self._columns = None  # filter columns are rebuilt on the next filtered query
+
+    def _open_vectors(self, rows: int):
+        self._matrix = None
+        if not self.dim:
+            return
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        if size < rows * row_bytes or size == 0:
+            capacity = max(_INITIAL_ROWS, size // row_bytes)
+            while capacity < rows:
+                capacity *= 2
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+            size = capacity * row_bytes
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(size // row_bytes, self.dim))
+
+    def _append_log(self, entries: List[dict]):
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e, separators=(",", ":"), default=str) + "\n" for e in entries))
+        self._entries += len(entries)
+        self._log_size = os.path.getsize(self._log_path)
+
+    def _compact(self):
+        """Rewrite the log with one entry per live vector (rows keep their positions)."""
+        tmp = self._log_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"dim": self.dim}) + "\n")
+            for row, vid in enumerate(self._ids):
+                if vid is not None:
+                    f.write(json.dumps({"id": vid, "row": row, "metadata": self._metadata[row]},
+                                       separators=(",", ":"), default=str) + "\n")
+        os.replace(tmp, self._log_path)
+        self._entries = len(self._rows) + 1
+        self._log_size = os.path.getsize(self._log_path)
+
+    def _refresh(self):
+        """Reload if another process wrote to the store since we last looked."""
+        size = os.path.getsize(self._log_path) if os.path.exists(self._log_path) else 0
+        if size != self._log_size:
+            self._load()
+
+    # ---------- VectorStore ----------
+    def upsert(self, vectors: List[dict]):
+        if not vectors:
+            return
+        with self._lock:
+            self._refresh()
+            values = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+            if self.dim is None:
+                self.dim = values.shape[1]
+                self._append_log([{"dim": self.dim}])
+            if values.shape[1] != self.dim:
+                raise ValueError(f"Vectors have {values.shape[1]} dimensions; {self.name} stores {self.dim}")
+            norms = np.linalg.norm(values, axis=1, keepdims=True)
+            values /= np.where(norms == 0, 1, norms)
+
+            rows, entries = [], []
+            for v in vectors:
+                row = self._rows.get(v["id"])
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(None)
+                    self._metadata.append(None)
+                    self._rows[v["id"]] = row
+                self._ids[row], self._metadata[row] = v["id"], v.get("metadata") or {}
+                rows.append(row)
+                entries.append({"id": v["id"], "row": row, "metadata": self._metadata[row]})
+
+            if self._matrix is None or self._matrix.shape[0] < len(self._ids):
+                if self._matrix is not None:
+                    self._matrix.flush()
+                self._open_vectors(len(self._ids))
+            self._matrix[rows] = values
+            self._matrix.flush()
+            # the vectors are on disk before the log points at them
+            self._append_log(entries)
+            self._reindex()
+            if self._entries - len(self._rows) > max(_COMPACT_MIN, len(self._rows)):
+                self._compact()
+
+    def fetch(self, ids: Sequence[str]) -> Dict[str, dict]:
+        with self._lock:
+            self._refresh()
+            found = {}
+            for vid in ids:
+                row = self._rows.get(vid)
+                if row is not None:
+                    found[vid] = {"id": vid, "values": self._matrix[row].tolist(), "metadata": self._metadata[row]}
+            return found
+
+    def query(self, vector: Sequence[float], top_k: int = 5, filter: Optional[dict] = None,
+              include_metadata: bool = True) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            n = len(self._ids)
+            if not n or self._matrix is None or top_k <= 0:
+                return []
+            q = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(q)
+            if norm:
+                q = q / norm
+            mask = self._live
+            if filter:
+                if self._columns is None:
+                    self._columns = _Columns(self._metadata)
+                mask = mask & _mask(self._columns, filter, n)
+            candidates = np.flatnonzero(mask)
+            if not candidates.size:
+                return []
+            scores = self._matrix[candidates] @ q if candidates.size < n else self._matrix[:n] @ q
+            k = min(top_k, candidates.size)
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [
+                {
+                    "id": self._ids[candidates[i]],
+                    "score": float(scores[i]),
+                    "metadata": self._metadata[candidates[i]] if include_metadata else {},
+                }
+                for i in best
+            ]
+
+    def delete(self, ids: Sequence[str]):
+        with self._lock:
+            self._refresh()
+            entries = []
+            for vid in ids:
+                row = self._rows.pop(vid, None)
+                if row is not None:
+                    self._ids[row], self._metadata[row] = None, None
+                    entries.append({"id": vid, "row": row, "deleted": True})
+            if entries:
+                self._append_log(entries)
+                self._reindex()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+# ---------- metadata filters (the Pinecone operator subset) ----------
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+class _Columns:
+    """Per-field value arrays built from the metadata on first use, so a filter is a few array comparisons."""
+
+    def __init__(self, metadata: List[Optional[dict]]):
+        self.metadata = metadata
+        self._values: Dict[str, np.ndarray] = {}
+        self._numbers: Dict[str, np.ndarray] = {}
+
+    def values(self, key: str) -> np.ndarray:
+        if key not in self._values:
+            col = np.empty(len(self.metadata), dtype=object)
+            col[:] = [None if m is None else m.get(key) for m in self.metadata]
+            self._values[key] = col
+        return self._values[key]
+
+    def numbers(self, key: str) -> np.ndarray:
+        if key not in self._numbers:
+            self._numbers[key] = np.array([v if _is_number(v) else np.nan for v in self.values(key)], dtype=np.float64)
+        return self._numbers[key]
+
+
+def _equals(cols: _Columns, key: str, value: Any) -> np.ndarray:
+    if _is_number(value):
+        return cols.numbers(key) == value
+    return np.asarray(cols.values(key) == value, dtype=bool)
+
+
+_RANGE = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+
+
+def _mask(cols: _Columns, filter: dict, n: int) -> np.ndarray:
+    mask = np.ones(n, dtype=bool)
+    for key, cond in filter.items():
+        if key == "$and":
+            for part in cond:
+                mask &= _mask(cols, part, n)
+        elif key == "$or":
+            any_of = np.zeros(n, dtype=bool)
+            for part in cond:
+                any_of |= _mask(cols, part, n)
+            mask &= any_of
+        elif isinstance(cond, dict):
+            for op, operand in cond.items():
+                if op == "$eq":
+                    mask &= _equals(cols, key, operand)
+                elif op == "$ne":
+                    mask &= ~_equals(cols, key, operand)
+                elif op in ("$in", "$nin"):
+                    hit = np.zeros(n, dtype=bool)
+                    for value in operand:
+                        hit |= _equals(cols, key, value)
+                    mask &= hit if op == "$in" else ~hit
+                elif op in _RANGE:
+                    if not _is_number(operand):
+                        raise ValueError(f"{op} needs a number, got {operand!r}")
+                    with np.errstate(invalid="ignore"):
+                        mask &= _RANGE[op](cols.numbers(key), operand)
+                else:
+                    raise ValueError(f"Unsupported filter operator {op!r}")
+        else:
+            mask &= _equals(cols, key, cond)
+    return mask
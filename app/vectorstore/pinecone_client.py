@@ -1,56 +1,148 @@
+
 import os, time, uuid
+from typing import Dict, Iterator, List, Sequence, Tuple
+
 from openai import OpenAI
-from pinecone import Pinecone
 
-from app.repositories.session import get_session
-from app.db.models import TokenUsage
-from app.utils.token_costs import estimate_cost
+from app.utils import embedding_cache, usage_recorder
+from app.utils.rate_limiter import RateLimiter
+from app.vectorstore.store import get_store
 
 # Read environment variables
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX  = os.getenv("PINECONE_INDEX")
+
+EMBED_MODEL = "text-embedding-3-small"
+# inputs and (estimated) tokens per embeddings request; the API allows 2048 inputs / 300k tokens
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "200000"))
+CHARS_PER_TOKEN = 4  # same rough estimate the rate limiter uses
+# client-side embeddings budgets per minute, shared by every thread (0 disables)
+EMBED_RPM = int(os.getenv("EMBED_RPM", "3000"))
+EMBED_TPM = int(os.getenv("EMBED_TPM", "1000000"))
+# vectors per upsert request (Pinecone caps a request at 2 MB / 1000 vectors)
+PINECONE_UPSERT_CHUNK = int(os.getenv("PINECONE_UPSERT_CHUNK", "100"))
+# fetch upserted ids back until they are readable (or the timeout passes) before returning
+PINECONE_VERIFY_WRITES = os.getenv("PINECONE_VERIFY_WRITES", "0").lower() in ("1", "true", "yes")
+PINECONE_VERIFY_TIMEOUT = float(os.getenv("PINECONE_VERIFY_TIMEOUT", "10"))
 
 # Initialize clients
 client = OpenAI(api_key=OPENAI_API_KEY)
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX)
+store = get_store()  # Pinecone, or the local NumPy store (VECTOR_STORE)
+limiter = RateLimiter(rpm=EMBED_RPM, tpm=EMBED_TPM)
+
+
+def _batches(texts: Sequence[str]) -> Iterator[List[int]]:
+    """Group input positions into requests within EMBED_BATCH_SIZE inputs and EMBED_BATCH_TOKENS tokens."""
+    batch, tokens = [], 0
+    for i, text in enumerate(texts):
+        estimate = len(text) // CHARS_PER_TOKEN + 1
+        if batch and (len(batch) >= EMBED_BATCH_SIZE or tokens + estimate > EMBED_BATCH_TOKENS):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(i)
+        tokens += estimate
+    if batch:
+        yield batch
+
+
+def generate_embeddings(texts: Sequence[str]) -> List[List[float]]:
+    """Generate 1536-dim vectors for many texts, several inputs per embeddings request."""
+    vectors: List[List[float]] = [None] * len(texts)
+    for batch in _batches(texts):
+        estimate = sum(len(texts[i]) // CHARS_PER_TOKEN + 1 for i in batch)
+        limiter.acquire(estimate)
+        response = client.embeddings.create(model=EMBED_MODEL, input=[texts[i] for i in batch])
+        limiter.settle(estimate, response.usage.prompt_tokens)
+        for item in response.data:
+            vectors[batch[item.index]] = item.embedding
+        usage_recorder.record(EMBED_MODEL, "embedding", response.usage.prompt_tokens)
+    return vectors
+
 
 def generate_embedding(text: str):
     """Generate a 1536-dim vector using OpenAI embeddings."""
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
+    return generate_embeddings([text])[0]
+
+
+def upsert_vectors(vectors: List[dict]) -> int:
+    """Upsert vectors in chunks of PINECONE_UPSERT_CHUNK; returns how many were sent."""
+    for i in range(0, len(vectors), PINECONE_UPSERT_CHUNK):
+        store.upsert(vectors[i:i + PINECONE_UPSERT_CHUNK])
+    return len(vectors)
+
+
+def verify_vectors(ids: List[str], timeout: float = PINECONE_VERIFY_TIMEOUT) -> List[str]:
+    """Poll until every id can be fetched back; returns the ids still missing at the timeout."""
+    missing = list(ids)
+    deadline = time.monotonic() + timeout
+    delay = 0.25
+    while missing:
+        found = set()
+        for i in range(0, len(missing), PINECONE_UPSERT_CHUNK):
+            found |= set(store.fetch(missing[i:i + PINECONE_UPSERT_CHUNK]))
+        missing = [vid for vid in missing if vid not in found]
+        if not missing or time.monotonic() >= deadline:
+            break
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, 2.0)
+    return missing
+
+
+def index_report_embeddings(items: List[Tuple[int, str, dict]], verify: bool = PINECONE_VERIFY_WRITES,
+                            force: bool = False) -> Dict[str, int]:
+    """
+    Embed and upsert many (report_id, text, metadata) items: one embeddings
+    request per batch, chunked vector store upserts. Reports whose text and
+    metadata match the vector already live in the index are skipped, and
+    vectors for previously seen text come from the embedding cache
+    (``force`` ignores both). With ``verify``, waits until the vectors are
+    readable instead of sleeping a fixed time. Raises on failure.
+    """
+    summary = {"embedded": 0, "cached": 0, "unchanged": 0, "failed": 0, "unverified": 0}
+    if not items:
+        return summary
+    hashes = [
+        (embedding_cache.content_hash(text, EMBED_MODEL), embedding_cache.metadata_hash(metadata))
+        for _, text, metadata in items
+    ]
+    live = {} if force else embedding_cache.live_hashes([report_id for report_id, _, _ in items], store.name)
+    todo = [i for i, (report_id, _, _) in enumerate(items) if live.get(report_id) != hashes[i]]
+    summary["unchanged"] = len(items) - len(todo)
+
+    cached = {} if force else embedding_cache.get_many([hashes[i][0] for i in todo])
+    missing = [i for i in todo if hashes[i][0] not in cached]
+    fresh = generate_embeddings([embedding_cache.canonical_text(items[i][1]) for i in missing])
+    embedding_cache.put_many([(hashes[i][0], EMBED_MODEL, vector) for i, vector in zip(missing, fresh)])
+    vectors = {**cached, **{hashes[i][0]: vector for i, vector in zip(missing, fresh)}}
+    summary["embedded"], summary["cached"] = len(missing), len(todo) - len(missing)
+
+    upsert_vectors([
+        {"id": f"report-{items[i][0]}", "values": vectors[hashes[i][0]], "metadata": items[i][2]}
+        for i in todo
+    ])
+    if verify and todo:
+        unread = verify_vectors([f"report-{items[i][0]}" for i in todo])
+        summary["unverified"] = len(unread)
+        if unread:
+            print(f"⚠️ {len(unread)} vectors not readable after {PINECONE_VERIFY_TIMEOUT}s: {unread[:5]}")
+    embedding_cache.mark_live(
+        [(items[i][0], f"report-{items[i][0]}", *hashes[i]) for i in todo], store.name
     )
-    data = response.data[0]
-    usage = response.usage
-    cost = estimate_cost("text-embedding-3-small", usage.prompt_tokens)
-
-    # ✅ Log to DB
-    with get_session() as db:
-        db.add(TokenUsage(
-            model="text-embedding-3-small",
-            operation="embedding",
-            prompt_tokens=usage.prompt_tokens,
-            completion_tokens=0,
-            total_tokens=usage.prompt_tokens,
-            cost_usd=cost
-        ))
-        db.commit()
-    return response.data[0].embedding
+    print(f"✅ Embedded {len(todo)} reports into {store.name} "
+          f"({summary['cached']} from cache, {summary['unchanged']} unchanged skipped).")
+    return summary
 
-def upsert_report_embedding(report_id: int, text: str, metadata: dict):
-    """Generate and upsert a report embedding into Pinecone."""
+
+def upsert_report_embeddings(items: List[Tuple[int, str, dict]], verify: bool = PINECONE_VERIFY_WRITES,
+                             force: bool = False) -> Dict[str, int]:
+    """index_report_embeddings, printing a failure instead of raising it."""
     try:
-        vector = generate_embedding(text)
-        index.upsert(vectors=[
-            {
-                "id": f"report-{report_id}",
-                "values": vector,
-                "metadata": metadata
-            }
-        ])
-        time.sleep(2)  # allow for propagation
-        print(f"✅ Embedded report {report_id} into Pinecone.")
+        return index_report_embeddings(items, verify=verify, force=force)
     except Exception as e:
-        print(f"❌ Failed to upsert report embedding: {e}")
+        print(f"❌ Failed to upsert {len(items)} report embeddings: {e}")
+        return {"embedded": 0, "cached": 0, "unchanged": 0, "failed": len(items), "unverified": 0}
+
+
+def upsert_report_embedding(report_id: int, text: str, metadata: dict):
+    """Generate and upsert a report embedding into the vector store."""
+    return upsert_report_embeddings([(report_id, text, metadata)])
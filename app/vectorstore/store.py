@@ -0,0 +1,91 @@
+# app/vectorstore/store.py
+"""
+Vector store backends behind one small interface.
+
+VECTOR_STORE selects the backend: ``pinecone`` (the default; the
+PINECONE_INDEX index) or ``local`` (float32 vectors memory-mapped from
+VECTOR_STORE_PATH, brute-force cosine search in NumPy; see
+local_store.py). ``get_store`` returns one shared instance per process.
+
+Vectors are dicts ``{"id", "values", "metadata"}``; ``query`` returns
+matches ``{"id", "score", "metadata"}`` best first, and takes a
+Pinecone-style metadata filter (``{"motel_name": "X"}``,
+``{"report_date_ts": {"$gte": 1735689600}}``, ``$in``, ``$and`` ...).
+"""
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").lower()
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "./vector_store")
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class VectorStore(ABC):
+    # recorded with each live vector (report_vector.index_name)
+    name: str = ""
+
+    @abstractmethod
+    def upsert(self, vectors: List[dict]): ...
+
+    @abstractmethod
+    def fetch(self, ids: Sequence[str]) -> Dict[str, dict]:
+        """The stored vectors among ``ids``, by id."""
+
+    @abstractmethod
+    def query(self, vector: Sequence[float], top_k: int = 5, filter: Optional[dict] = None,
+              include_metadata: bool = True) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def delete(self, ids: Sequence[str]): ...
+
+
+class PineconeStore(VectorStore):
+    def __init__(self, index_name: Optional[str] = None, api_key: Optional[str] = None):
+        from pinecone import Pinecone
+
+        self.name = index_name or os.getenv("PINECONE_INDEX")
+        self.index = Pinecone(api_key=api_key or os.getenv("PINECONE_API_KEY")).Index(self.name)
+
+    def upsert(self, vectors: List[dict]):
+        self.index.upsert(vectors=vectors)
+
+    def fetch(self, ids: Sequence[str]) -> Dict[str, dict]:
+        return dict(self.index.fetch(ids=list(ids)).vectors)
+
+    def query(self, vector: Sequence[float], top_k: int = 5, filter: Optional[dict] = None,
+              include_metadata: bool = True) -> List[Dict[str, Any]]:
+        kwargs = {"filter": filter} if filter else {}
+        results = self.index.query(vector=list(vector), top_k=top_k, include_metadata=include_metadata, **kwargs)
+        return [
+            {"id": m["id"], "score": m["score"], "metadata": m.get("metadata") or {}}
+            for m in (results.get("matches") or [])
+        ]
+
+    def delete(self, ids: Sequence[str]):
+        self.index.delete(ids=list(ids))
+
+
+def store_name() -> str:
+    """The configured backend's name (report_vector.index_name), without connecting to it."""
+    index = os.getenv("PINECONE_INDEX")
+    return f"local:{index or 'reports'}" if VECTOR_STORE == "local" else index
+
+
+def get_store() -> VectorStore:
+    """The configured backend, created on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if VECTOR_STORE == "local":
+                from app.vectorstore.local_store import LocalStore
+
+                _store = LocalStore(os.path.join(VECTOR_STORE_PATH, os.getenv("PINECONE_INDEX") or "reports"))
+            elif VECTOR_STORE == "pinecone":
+                _store = PineconeStore()
+            else:
+                raise ValueError(f"Unknown VECTOR_STORE {VECTOR_STORE!r} (expected 'pinecone' or 'local')")
+        return _store
@@ -5,7 +5,8 @@ from mangum import Mangum
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.db.init_db import init_db
-from app.api import reports, motels, chat, usage
+from app.api import reports, motels, chat, usage, admin
+from app.utils import usage_recorder
 
 # Setup logger
 logging.basicConfig(level=logging.INFO)
@@ -25,10 +26,15 @@ app.add_middleware(
 def on_startup():
     init_db()
 
+@app.on_event("shutdown")
+def on_shutdown():
+    usage_recorder.flush()
+
 app.include_router(reports.router, prefix="/reports", tags=["reports"])
 app.include_router(motels.router, prefix="/motels", tags=["motels"])
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 app.include_router(usage.router, prefix="/usage", tags=["usage"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
 
 @app.get("/")
 def health():
@@ -39,6 +45,14 @@ mangum_handler = Mangum(app)
 
 def handler(event, context):
     """Main Lambda handler - routes API Gateway and background triggers."""
+    try:
+        return _route(event, context)
+    finally:
+        # Lambda may freeze the process once we return; write buffered usage rows first
+        usage_recorder.flush()
+
+
+def _route(event, context):
     logger.info("🚀 Lambda handler invoked")
     logger.info(f"Event received: {json.dumps(event)[:500]}")  # truncate large events
 
@@ -95,6 +109,23 @@ def handler(event, context):
 
             return {"ok": False, "message": f"Job failed: {e}"}
 
+    # ✅ Vector outbox drain (kicked by ingest, or on a schedule)
+    if isinstance(event, dict) and event.get("action") == "drain_vector_outbox":
+        logger.info("📮 Background job detected: drain_vector_outbox")
+        from app.services import vector_outbox
+
+        # leave a margin so the last batch finishes before the Lambda times out
+        budget = None
+        if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+            remaining = context.get_remaining_time_in_millis() / 1000
+            budget = remaining - min(60.0, 0.2 * remaining)
+        try:
+            result = vector_outbox.drain(max_batches=event.get("max_batches"), time_budget=budget)
+            return {"ok": True, **result}
+        except Exception as e:
+            logger.exception(f"💥 Vector outbox drain failed: {str(e)}")
+            return {"ok": False, "message": f"Drain failed: {e}"}
+
     # ✅ Normal API Gateway Route
     logger.info("🌐 Passing event to Mangum for API Gateway routing")
     return mangum_handler(event, context)